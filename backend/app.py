@@ -1,16 +1,45 @@
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, Request, request, jsonify, send_file, url_for, Response, stream_with_context, g
 from flask_cors import CORS
+from flask_sock import Sock
+from werkzeug.exceptions import HTTPException
 import logging
 import time
 import sys
-import tempfile
 import os
 import base64
-from src import (transcribe_audio_google, transcribe_audio_whisper, transcribe_audio_deepgram_local, translate_text, generate_voice_file_eleven_labs, generate_voice_file_openai,
-                 convert_audio_to_wav, get_last_three_conversations, add_conversation, delete_all_conversations, post_process_using_gpt)
+import io
+import json
+from src import (transcribe_audio_google, transcribe_audio_whisper, transcribe_audio_deepgram_local, transcribe_audio, stt_hedger, stt_registry, synthesize_voice, tts_registry, TTS_PROVIDER_CHOICES, translate_text, generate_voice_file_eleven_labs, generate_voice_file_openai,
+                 convert_audio_to_wav, get_last_three_conversations, add_conversation, delete_all_conversations, post_process_using_gpt, translate_transcription, translation_race,
+                 stream_voice, LiveTranscriber, translate_and_speak,
+                 convert_audio_bytes_to_wav, normalize_audio_bytes, check_speech, get_audio_info, is_audio_too_long, synthesize_voice_openai, synthesize_voice_eleven_labs, translation_cache,
+                 voice_cache, upload_encoding_stats, parse_output_format, output_mimetype, audio_store, multipart_mixed, RESPONSE_MODES, NO_TEXT_MESSAGE, start_warm_up, start_connection_prewarm, is_valid_session_id, DEFAULT_SESSION_ID,
+                 batch_jobs, batch_options, is_valid_job_id, BATCH_MAX_FILES, BATCH_MAX_UPLOAD_BYTES,
+                 translate_texts)
+
+class InMemoryRequest(Request):
+    """Keeps uploaded audio in memory instead of spooling uploads over 500KB to a temp file.
+
+    Batch submissions are the exception: they may be recordings of a whole visit, so they
+    get their own size limit and are spooled to disk as usual.
+    """
+
+    @property
+    def max_content_length(self):
+        if self.endpoint == 'submit_batch_job':
+            return BATCH_MAX_UPLOAD_BYTES
+        return super().max_content_length
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if self.endpoint == 'submit_batch_job':
+            return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+        return io.BytesIO()
 
 app = Flask(__name__)
+app.request_class = InMemoryRequest
+app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('MAX_UPLOAD_BYTES', 25 * 1024 * 1024))
 CORS(app) 
+sock = Sock(app)
 
 # Basic configuration for your application's logger
 logging.basicConfig(stream=sys.stdout, level=logging.INFO, format='%(name)s - %(levelname)s - %(message)s')
@@ -20,16 +49,73 @@ logging.getLogger('google.auth').setLevel(logging.WARNING)
 logging.getLogger('google.auth.transport.requests').setLevel(logging.WARNING)
 logging.getLogger('urllib3').setLevel(logging.WARNING)
 
+# Requests someone is waiting on; batch jobs hold back while these are in flight
+INTERACTIVE_ENDPOINTS = {'process_audio', 'process_audio_stream'}
+
+@app.before_request
+def mark_interactive_request():
+    if request.endpoint in INTERACTIVE_ENDPOINTS:
+        batch_jobs.begin_interactive()
+        g.interactive_request = True
+
+@app.teardown_request
+def unmark_interactive_request(exception=None):
+    if g.pop('interactive_request', False):
+        batch_jobs.end_interactive()
+
 @app.errorhandler(Exception)
 def handle_exception(e):
+    if isinstance(e, HTTPException):
+        # e.g. 413 for an upload over MAX_CONTENT_LENGTH, not an internal error
+        return jsonify({"error": e.description}), e.code
     app.logger.error(f"Unhandled Exception: {e}", exc_info=True)
     return jsonify({"error": "An internal server error occurred"}), 500
 
+def _output_format(values):
+    """The output_format/bitrate/sample_rate the client asked the voice to be delivered in. Raises ValueError."""
+    return parse_output_format(values.get('output_format'), values.get('bitrate'), values.get('sample_rate'))
+
+def _voice_response(data, voice_bytes, mimetype, response_mode):
+    """Returns the text fields in `data` together with the voice, in the requested response mode."""
+    if response_mode == 'multipart':
+        parts, content_type, content_length = multipart_mixed(data, voice_bytes, mimetype)
+        # WSGI wants bytes; cached voices may be memoryviews over mapped files
+        body = (part if isinstance(part, bytes) else bytes(part) for part in parts)
+        return Response(body, content_type=content_type, headers={"Content-Length": str(content_length)})
+    if response_mode == 'resource':
+        audio_id = audio_store.put(voice_bytes, mimetype)
+        return jsonify({**data, "voice_url": url_for('get_audio', audio_id=audio_id), "voice_mimetype": mimetype})
+    return jsonify({**data, "voice_file_base64": base64.b64encode(voice_bytes).decode('utf-8'), "voice_mimetype": mimetype})
+
+@app.route('/audio/<audio_id>', methods=['GET'])
+def get_audio(audio_id):
+    """Serves a voice stored by response_mode=resource, with Range and conditional request support."""
+    entry = audio_store.get(audio_id)
+    if entry is None:
+        return jsonify({"error": "Audio not found or expired"}), 404
+    audio, mimetype = entry
+    return send_file(io.BytesIO(audio), mimetype=mimetype, conditional=True, etag=audio_id, max_age=audio_store.ttl)
+
+def _session_id():
+    """The session_id form field or query arg (one per operatory), or None if it is malformed."""
+    session_id = request.values.get('session_id', DEFAULT_SESSION_ID)
+    return session_id if is_valid_session_id(session_id) else None
+
 @app.route('/start-new-conversation', methods=['GET'])
 def start_new_conversation():
-    delete_all_conversations()
+    session_id = _session_id()
+    if not session_id:
+        return jsonify({"error": "Invalid session_id"}), 400
+    start_connection_prewarm()  # The first utterance shouldn't pay for a TLS handshake
+    delete_all_conversations(session_id)
     return jsonify({"message": "New conversation started. Previous conversations deleted"})
 
+@app.route('/cache-stats', methods=['GET'])
+def cache_stats():
+    return jsonify({"translation": translation_cache.stats(), "voice": voice_cache.stats(), "upload_encoding": upload_encoding_stats(),
+                    "stt": stt_hedger.stats(), "routing": {"stt": stt_registry.stats(), "tts": tts_registry.stats()},
+                    "translation_race": translation_race.stats()})
+
 @app.route('/process-audio', methods=['POST'])
 def process_audio():
     app.logger.info("#" * 100)
@@ -46,60 +132,80 @@ def process_audio():
     output_lang = request.form.get('output_lang', 'es')
     voice_name = request.form.get('voice', 'Jarvis')
     mode = request.form.get('mode', 'patient') # TODO: Change to 'patient' after testing
+    tts_provider = request.form.get('tts_provider', 'auto')  # openai/elevenlabs pin a provider; auto routes
+    if tts_provider not in TTS_PROVIDER_CHOICES:
+        return jsonify({"error": f"Unsupported tts_provider: {tts_provider}"}), 400
+    session_id = _session_id()
+    if not session_id:
+        return jsonify({"error": "Invalid session_id"}), 400
+    try:
+        output_format = _output_format(request.form)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    response_mode = request.form.get('response_mode', 'json')
+    if response_mode not in RESPONSE_MODES:
+        return jsonify({"error": f"Unsupported response_mode: {response_mode}"}), 400
 
 
-    app.logger.info(f"RECEIVED REQUEST: \nInput language: {input_lang}, \nOutput language: {output_lang}, \nVoice: {voice_name}, \nMode: {mode}")
+    app.logger.info(f"RECEIVED REQUEST: \nInput language: {input_lang}, \nOutput language: {output_lang}, \nVoice: {voice_name}, \nMode: {mode}, \nSession: {session_id}")
 
     try:
-        # Save to a temporary file
-        with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as temp_audio:
-            audio_file.save(temp_audio)
-            temp_audio_path = temp_audio.name
+        # Keep the upload in memory; nothing in this request touches the filesystem
+        audio_bytes = audio_file.read()
+        if not audio_bytes:
+            return jsonify({"error": "Empty audio file"}), 400
+        audio_info = get_audio_info(audio_bytes)
+        app.logger.info(f"Audio info: {audio_info}")
+        if is_audio_too_long(audio_info):
+            return jsonify({"error": "Audio is too long"}), 413
 
         # Convert to the proper WAV format
         time_to_convert = time.time()
-        # converted_audio_path = convert_audio_to_wav(temp_audio_path)
-        converted_audio_path = temp_audio_path
-        if not converted_audio_path:
-            os.unlink(temp_audio_path)  # Clean up the original temporary file
+        converted_audio = normalize_audio_bytes(audio_bytes)
+        if not converted_audio:
             return jsonify({"error": "Failed to convert audio file"}), 500
         convert_time = time.time() - time_to_convert
         app.logger.info(f"Audio conversion took {convert_time:.2f} seconds")
 
+        # Silent taps are answered with the pre-rendered sentinel without calling any provider
+        speech_detected, converted_audio = check_speech(converted_audio)
+
         # Get previous messages
-        previous_texts = get_last_three_conversations()
+        previous_texts = get_last_three_conversations(session_id) if speech_detected else []
         
         # if input text is english use whisper, else use google
         # if input_lang == 'en-US':
-        #     transcribed_text = transcribe_audio_whisper(converted_audio_path, previous_texts, mode)
+        #     transcribed_text = transcribe_audio_whisper(converted_audio, previous_texts, mode)
         # else: 
         time_to_transcribe = time.time()
-        transcribed_text = transcribe_audio_deepgram_local(converted_audio_path, input_lang)
+        if speech_detected:
+            transcribed_text = transcribe_audio(converted_audio, input_lang)
+        else:
+            app.logger.info("No speech detected; skipping transcription")
+            transcribed_text = NO_TEXT_MESSAGE
         time_to_transcribe = time.time() - time_to_transcribe
         app.logger.info(f"Transcription took {time_to_transcribe:.2f} seconds")
 
+        if not transcribed_text:
+            return jsonify({"error": "Transcription failed"}), 500
+
         # remove unwanted text
         if "*doctor" in transcribed_text or "*patient" in transcribed_text or "TRANSCRIBE THE FOLLOWING TEXT =>" in transcribed_text:
             transcribed_text = transcribed_text.replace("*doctor", "").replace("*patient", "").replace("TRANSCRIBE THE FOLLOWING TEXT =>", "")
 
-        # add_conversation(transcribed_text, person_type=mode)
-
-
-        if not transcribed_text:
-            os.unlink(converted_audio_path)  # Clean up the converted file
-            return jsonify({"error": "Transcription failed"}), 500
+        if transcribed_text != NO_TEXT_MESSAGE:
+            add_conversation(transcribed_text, person_type=mode, session_id=session_id)  # Written to Firestore in the background
 
         # # Translation
         translation_start_time = time.time()
 
-        if transcribed_text == "No text was provided. Please try again.":
-            translated_text = "No text was provided. Please try again."
+        if transcribed_text == NO_TEXT_MESSAGE:
+            translated_text = NO_TEXT_MESSAGE
         else:
-            translated_text = post_process_using_gpt(transcribed_text, mode, input_lang, output_lang)
+            translated_text = translate_transcription(transcribed_text, mode, input_lang, output_lang, previous_texts=previous_texts)
 
 
         if not translated_text:
-            os.unlink(converted_audio_path)  # Clean up the converted file
             return jsonify({"error": "Translation failed"}), 500
         translate_time = time.time() - translation_start_time
         app.logger.info(f"Translation took {translate_time:.2f} seconds")
@@ -107,13 +213,8 @@ def process_audio():
         # Voice generation
         voice_generation_start_time = time.time()
 
-       
-        voice_file_path = generate_voice_file_openai(translated_text)
-        # voice_file_path = generate_voice_file_eleven_labs(translated_text, voice_name)
-    
-    
-        if not voice_file_path:
-            os.unlink(converted_audio_path)  # Clean up the converted file
+        voice_bytes = synthesize_voice(translated_text, voice_name, output_lang, output_format=output_format, provider=tts_provider)
+        if not voice_bytes:
             return jsonify({"error": "Voice generation failed"}), 500
         voice_time = time.time() - voice_generation_start_time
         app.logger.info(f"Voice generation took {voice_time:.2f} seconds")
@@ -121,31 +222,244 @@ def process_audio():
         overall_time = time.time() - overall_start_time
         app.logger.info(f"OVERALL PROCESSING TIME: {overall_time:.2f} seconds")
 
-        os.unlink(converted_audio_path)  # Clean up the converted file
+        # return both the audio and transcribed text
+        return _voice_response({
+            "transcribed_text": transcribed_text,
+            "translated_text": translated_text,
+            "mode": mode
+        }, voice_bytes, output_mimetype(output_format), response_mode)
+
+    except Exception as e:
+        app.logger.error(f"Unhandled exception: {e}")
+        return jsonify({"error": "An error occurred"}), 500
+
+def _sse_event(event, data):
+    """Formats one server-sent event."""
+    return f"event: {event}\ndata: {data}\n\n"
 
-        if not os.path.exists(voice_file_path):
-            app.logger.error("Generated voice file not found.")
-            return jsonify({"error": "Generated voice file not found"}), 500
+@app.route('/process-audio-stream', methods=['POST'])
+def process_audio_stream():
+    """Same pipeline as /process-audio, but streams the result as server-sent events.
 
-        # Read and encode the audio file
-        with open(voice_file_path, "rb") as audio_file:
-            encoded_audio = base64.b64encode(audio_file.read()).decode('utf-8')
+    The text fields are sent first as a `text` event, followed by `audio` events carrying
+    base64 MP3 chunks as the TTS provider produces them, and a final `done` event.
 
-        os.unlink(voice_file_path)  # Clean up the generated audio file
+    With pipeline=sentence the translation is streamed from GPT and spoken sentence by
+    sentence: `text` only carries the transcription, then one `segment` event per
+    sentence (in order) carries its translated text and base64 MP3, and `done`
+    carries the full translated text.
+    """
+    app.logger.info("#" * 100)
+
+    overall_start_time = time.time()
 
-        # return both the audio as attachment and transcribed text
-        return jsonify({
+    if 'audio' not in request.files:
+        return jsonify({"error": "No audio file part"}), 400
+    audio_file = request.files['audio']
+    if audio_file.filename == '':
+        return jsonify({"error": "No selected file"}), 400
+
+    input_lang = request.form.get('input_lang', 'en-US')
+    output_lang = request.form.get('output_lang', 'es')
+    voice_name = request.form.get('voice', 'Jarvis')
+    mode = request.form.get('mode', 'patient')
+    tts_provider = request.form.get('tts_provider', 'auto')
+    if tts_provider not in TTS_PROVIDER_CHOICES:
+        return jsonify({"error": f"Unsupported tts_provider: {tts_provider}"}), 400
+    if tts_provider == 'auto':
+        tts_provider = tts_registry.best(output_lang)  # Streams cannot fail over mid-way; pick the fastest healthy one up front
+    pipeline = request.form.get('pipeline', 'full')
+
+    app.logger.info(f"RECEIVED STREAMING REQUEST: \nInput language: {input_lang}, \nOutput language: {output_lang}, \nVoice: {voice_name}, \nMode: {mode}, \nTTS provider: {tts_provider}")
+
+    time_to_transcribe = time.time()
+    audio_bytes = audio_file.read()
+    if not audio_bytes:
+        return jsonify({"error": "Empty audio file"}), 400
+    if is_audio_too_long(get_audio_info(audio_bytes)):
+        return jsonify({"error": "Audio is too long"}), 413
+    converted_audio = normalize_audio_bytes(audio_bytes)
+    if not converted_audio:
+        return jsonify({"error": "Failed to convert audio file"}), 500
+    speech_detected, converted_audio = check_speech(converted_audio)
+    if speech_detected:
+        transcribed_text = transcribe_audio(converted_audio, input_lang)
+    else:
+        app.logger.info("No speech detected; skipping transcription")
+        transcribed_text = NO_TEXT_MESSAGE
+    time_to_transcribe = time.time() - time_to_transcribe
+    app.logger.info(f"Transcription took {time_to_transcribe:.2f} seconds")
+
+    if not transcribed_text:
+        return jsonify({"error": "Transcription failed"}), 500
+    transcribed_text = transcribed_text.replace("*doctor", "").replace("*patient", "").replace("TRANSCRIBE THE FOLLOWING TEXT =>", "")
+
+    if pipeline == 'sentence' and transcribed_text != NO_TEXT_MESSAGE:
+        return Response(stream_with_context(_generate_sentence_events(transcribed_text, mode, input_lang, output_lang,
+                                                                      tts_provider, voice_name, overall_start_time)),
+                        mimetype='text/event-stream', headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+    translation_start_time = time.time()
+    if transcribed_text == NO_TEXT_MESSAGE:
+        translated_text = NO_TEXT_MESSAGE
+    else:
+        translated_text = translate_transcription(transcribed_text, mode, input_lang, output_lang)
+    if not translated_text:
+        return jsonify({"error": "Translation failed"}), 500
+    translate_time = time.time() - translation_start_time
+    app.logger.info(f"Translation took {translate_time:.2f} seconds")
+
+    audio_chunks = stream_voice(translated_text, voice_name, tts_provider, output_lang)
+
+    def generate():
+        yield _sse_event("text", json.dumps({
             "transcribed_text": transcribed_text,
             "translated_text": translated_text,
-            "mode": mode,
-            "voice_file_base64": encoded_audio
-        })
+            "mode": mode
+        }))
 
-    except Exception as e:
-        if 'temp_audio_path' in locals():
-            os.unlink(temp_audio_path)  # Ensure cleanup in case of error
-        app.logger.error(f"Unhandled exception: {e}")
-        return jsonify({"error": "An error occurred"}), 500
+        voice_generation_start_time = time.time()
+        audio_bytes = 0
+        for chunk in audio_chunks:
+            if audio_bytes == 0:
+                app.logger.info(f"Time to first audio chunk: {time.time() - overall_start_time:.2f} seconds")
+            audio_bytes += len(chunk)
+            yield _sse_event("audio", base64.b64encode(chunk).decode('utf-8'))
+
+        if audio_bytes == 0:
+            yield _sse_event("error", json.dumps({"error": "Voice generation failed"}))
+            return
+
+        voice_time = time.time() - voice_generation_start_time
+        app.logger.info(f"Voice streaming took {voice_time:.2f} seconds")
+        app.logger.info(f"OVERALL PROCESSING TIME: {time.time() - overall_start_time:.2f} seconds")
+        yield _sse_event("done", json.dumps({"audio_bytes": audio_bytes}))
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+def _generate_sentence_events(transcribed_text, mode, input_lang, output_lang, tts_provider, voice_name, overall_start_time):
+    """Yields the SSE events for /process-audio-stream with pipeline=sentence."""
+    yield _sse_event("text", json.dumps({"transcribed_text": transcribed_text, "mode": mode}))
+
+    synthesize = lambda sentence: b"".join(stream_voice(sentence, voice_name, tts_provider, output_lang))
+
+    translated_sentences = []
+    for index, (sentence, audio) in enumerate(translate_and_speak(transcribed_text, mode, input_lang, output_lang, synthesize)):
+        if index == 0:
+            app.logger.info(f"Time to first audio segment: {time.time() - overall_start_time:.2f} seconds")
+        translated_sentences.append(sentence)
+        yield _sse_event("segment", json.dumps({
+            "index": index,
+            "translated_text": sentence,
+            "voice_file_base64": base64.b64encode(audio).decode('utf-8') if audio else None
+        }))
+
+    if not translated_sentences:
+        yield _sse_event("error", json.dumps({"error": "Translation failed"}))
+        return
+
+    app.logger.info(f"OVERALL PROCESSING TIME: {time.time() - overall_start_time:.2f} seconds")
+    yield _sse_event("done", json.dumps({"translated_text": " ".join(translated_sentences)}))
+
+@app.route('/translate-texts', methods=['POST'])
+def translate_texts_route():
+    """Translates a JSON list of segments (a transcript, a visit summary) in as few Translate calls as possible."""
+    body = request.get_json(silent=True) or {}
+    texts = body.get('texts')
+    if not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+        return jsonify({"error": "texts must be a list of strings"}), 400
+
+    translations = translate_texts(texts, body.get('source_language', 'en-US'), body.get('target_language', 'es'))
+    if translations is None:
+        return jsonify({"error": "Translation failed"}), 500
+    return jsonify({"translations": translations})
+
+@app.route('/batch-jobs', methods=['POST'])
+def submit_batch_job():
+    """Queues recorded audio files (repeated `audio` fields) for background translation. Poll the returned status_url."""
+    audio_files = [audio_file for audio_file in request.files.getlist('audio') if audio_file.filename]
+    if not audio_files:
+        return jsonify({"error": "No audio files"}), 400
+    if len(audio_files) > BATCH_MAX_FILES:
+        return jsonify({"error": f"At most {BATCH_MAX_FILES} files per job"}), 413
+    try:
+        options = batch_options(request.form)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    job = batch_jobs.submit([(audio_file.filename, audio_file.stream) for audio_file in audio_files], options)
+    return jsonify({"job_id": job["id"], "status": job["status"], "status_url": url_for('get_batch_job', job_id=job["id"])}), 202
+
+@app.route('/batch-jobs/<job_id>', methods=['GET'])
+def get_batch_job(job_id):
+    job = batch_jobs.get(job_id) if is_valid_job_id(job_id) else None
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job)
+
+@app.route('/batch-jobs/<job_id>', methods=['DELETE'])
+def delete_batch_job(job_id):
+    if not is_valid_job_id(job_id) or not batch_jobs.delete(job_id):
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify({"message": "Job deleted"})
+
+@app.route('/batch-jobs/<job_id>/items/<int:index>/voice', methods=['GET'])
+def get_batch_job_voice(job_id, index):
+    entry = batch_jobs.voice(job_id, index) if is_valid_job_id(job_id) else None
+    if entry is None:
+        return jsonify({"error": "Voice not found"}), 404
+    audio, mimetype = entry
+    return send_file(io.BytesIO(audio), mimetype=mimetype, conditional=True)
+
+@sock.route('/transcribe-live')
+def transcribe_live(ws):
+    """Transcribes audio frames while the speaker is still talking.
+
+    Query args: input_lang, and encoding/sample_rate for raw PCM frames.
+    The client sends binary audio frames, then {"type": "CloseStream"} as text.
+    The server replies with {"type": "transcript", ...} messages for interim and
+    final results, and a closing {"type": "final", "transcript": ...} message.
+    """
+    input_lang = request.args.get('input_lang', 'en-US')
+    encoding = request.args.get('encoding')
+    sample_rate = request.args.get('sample_rate')
+
+    def on_transcript(result):
+        ws.send(json.dumps({"type": "transcript", **result}))
+
+    transcriber = LiveTranscriber(input_lang, on_transcript, encoding=encoding, sample_rate=sample_rate)
+    if not transcriber.start():
+        ws.send(json.dumps({"type": "error", "error": "Failed to start live transcription"}))
+        return
+
+    try:
+        while True:
+            frame = ws.receive()
+            if frame is None:
+                break
+            if isinstance(frame, str):
+                try:
+                    message = json.loads(frame)
+                except ValueError:
+                    message = None
+                if not isinstance(message, dict):
+                    ws.send(json.dumps({"type": "error", "error": "Text frames must be JSON objects"}))
+                    continue
+                if message.get("type") == "CloseStream":
+                    break
+                continue
+            if not transcriber.send(frame):
+                # Deepgram closed the session; return what was transcribed so far
+                ws.send(json.dumps({"type": "error", "error": "Live transcription session closed"}))
+                break
+    finally:
+        # Also when the client disconnects, so the Deepgram session is never left open
+        transcript = transcriber.finish()
+    app.logger.info(f"Live transcription: {transcript}")
+    ws.send(json.dumps({"type": "final", "transcript": transcript}))
 
 if __name__ == '__main__':
+    start_warm_up()
+    batch_jobs.resume()
     app.run(debug=True, host='0.0.0.0')
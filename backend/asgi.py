@@ -0,0 +1,246 @@
+from quart import Quart, Request, Response, request, jsonify, send_file, url_for, g
+from quart_cors import cors
+from werkzeug.exceptions import HTTPException
+import asyncio
+import logging
+import time
+import sys
+import base64
+import io
+import os
+from src import (transcribe_audio_async, translate_transcription_async, synthesize_voice_async, TTS_PROVIDER_CHOICES, delete_all_conversations_async, add_conversation_async, get_last_three_conversations_async, normalize_audio_bytes, check_speech, parse_output_format, output_mimetype, audio_store, multipart_mixed, RESPONSE_MODES, get_audio_info, is_audio_too_long, NO_TEXT_MESSAGE, start_warm_up,
+                 is_valid_session_id, DEFAULT_SESSION_ID, batch_jobs, batch_options, is_valid_job_id, BATCH_MAX_FILES, BATCH_MAX_UPLOAD_BYTES, BATCH_UPLOAD_TIMEOUT,
+                 translate_texts_async)
+
+# Async twin of app.py. Every provider call awaits instead of blocking a worker,
+# so one process can hold many conversations in flight at once. Run it with:
+#   gunicorn -k uvicorn.workers.UvicornWorker -b 0.0.0.0:8080 asgi:app
+class UploadLimitRequest(Request):
+    """Batch submissions get their own size limit and upload timeout.
+
+    Quart sizes the body before routing, so the request is recognized by its path.
+    Uploaded files over 500KB are spooled to disk while the form is parsed.
+    """
+
+    def __init__(self, method, scheme, path, *args, max_content_length=None, body_timeout=None, **kwargs):
+        if method == 'POST' and path == '/batch-jobs':
+            max_content_length, body_timeout = BATCH_MAX_UPLOAD_BYTES, BATCH_UPLOAD_TIMEOUT
+        super().__init__(method, scheme, path, *args, max_content_length=max_content_length, body_timeout=body_timeout, **kwargs)
+        self.max_content_length = max_content_length  # The form parser reads the limit from here
+
+app = Quart(__name__)
+app.request_class = UploadLimitRequest
+# Same limit as app.py (Quart's default is 16MB)
+app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('MAX_UPLOAD_BYTES', 25 * 1024 * 1024))
+app = cors(app, allow_origin="*")
+
+logging.basicConfig(stream=sys.stdout, level=logging.INFO, format='%(name)s - %(levelname)s - %(message)s')
+
+logging.getLogger('google.auth').setLevel(logging.WARNING)
+logging.getLogger('google.auth.transport.requests').setLevel(logging.WARNING)
+logging.getLogger('urllib3').setLevel(logging.WARNING)
+logging.getLogger('httpx').setLevel(logging.WARNING)
+
+# Requests someone is waiting on; batch jobs hold back while these are in flight
+INTERACTIVE_ENDPOINTS = {'process_audio'}
+
+@app.before_request
+async def mark_interactive_request():
+    if request.endpoint in INTERACTIVE_ENDPOINTS:
+        batch_jobs.begin_interactive()
+        g.interactive_request = True
+
+@app.teardown_request
+async def unmark_interactive_request(exception=None):
+    if g.pop('interactive_request', False):
+        batch_jobs.end_interactive()
+
+@app.errorhandler(Exception)
+async def handle_exception(e):
+    if isinstance(e, HTTPException):
+        # e.g. 413 for an upload over MAX_CONTENT_LENGTH, not an internal error
+        return jsonify({"error": e.description}), e.code
+    app.logger.error(f"Unhandled Exception: {e}", exc_info=True)
+    return jsonify({"error": "An internal server error occurred"}), 500
+
+def _voice_response(data, voice_bytes, mimetype, response_mode):
+    """Returns the text fields in `data` together with the voice, in the requested response mode."""
+    if response_mode == 'multipart':
+        parts, content_type, _ = multipart_mixed(data, voice_bytes, mimetype)
+        return Response(b"".join(parts), content_type=content_type)
+    if response_mode == 'resource':
+        audio_id = audio_store.put(voice_bytes, mimetype)
+        return jsonify({**data, "voice_url": url_for('get_audio', audio_id=audio_id), "voice_mimetype": mimetype})
+    return jsonify({**data, "voice_file_base64": base64.b64encode(voice_bytes).decode('utf-8'), "voice_mimetype": mimetype})
+
+@app.route('/audio/<audio_id>', methods=['GET'])
+async def get_audio(audio_id):
+    """Serves a voice stored by response_mode=resource, with Range and conditional request support."""
+    entry = audio_store.get(audio_id)
+    if entry is None:
+        return jsonify({"error": "Audio not found or expired"}), 404
+    audio, mimetype = entry
+    response = await send_file(io.BytesIO(audio), mimetype=mimetype, add_etags=False, cache_timeout=audio_store.ttl)
+    # The etag has to be on the response before the conditional check, or If-None-Match never matches
+    response.set_etag(audio_id)
+    await response.make_conditional(request, accept_ranges=True, complete_length=len(audio))
+    return response
+
+async def _session_id():
+    """The session_id form field or query arg (one per operatory), or None if it is malformed."""
+    session_id = (await request.values).get('session_id', DEFAULT_SESSION_ID)
+    return session_id if is_valid_session_id(session_id) else None
+
+@app.route('/start-new-conversation', methods=['GET'])
+async def start_new_conversation():
+    session_id = await _session_id()
+    if not session_id:
+        return jsonify({"error": "Invalid session_id"}), 400
+    await delete_all_conversations_async(session_id)
+    return jsonify({"message": "New conversation started. Previous conversations deleted"})
+
+@app.route('/process-audio', methods=['POST'])
+async def process_audio():
+    app.logger.info("#" * 100)
+
+    overall_start_time = time.time()
+
+    files = await request.files
+    form = await request.form
+
+    if 'audio' not in files:
+        return jsonify({"error": "No audio file part"}), 400
+    audio_file = files['audio']
+    if audio_file.filename == '':
+        return jsonify({"error": "No selected file"}), 400
+
+    input_lang = form.get('input_lang', 'en-US')
+    output_lang = form.get('output_lang', 'es')
+    voice_name = form.get('voice', 'Jarvis')
+    mode = form.get('mode', 'patient')
+    tts_provider = form.get('tts_provider', 'auto')  # openai/elevenlabs pin a provider; auto routes
+    if tts_provider not in TTS_PROVIDER_CHOICES:
+        return jsonify({"error": f"Unsupported tts_provider: {tts_provider}"}), 400
+    session_id = await _session_id()
+    if not session_id:
+        return jsonify({"error": "Invalid session_id"}), 400
+    try:
+        output_format = parse_output_format(form.get('output_format'), form.get('bitrate'), form.get('sample_rate'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    response_mode = form.get('response_mode', 'json')
+    if response_mode not in RESPONSE_MODES:
+        return jsonify({"error": f"Unsupported response_mode: {response_mode}"}), 400
+
+    app.logger.info(f"RECEIVED REQUEST: \nInput language: {input_lang}, \nOutput language: {output_lang}, \nVoice: {voice_name}, \nMode: {mode}")
+
+    time_to_transcribe = time.time()
+    audio_bytes = audio_file.read()
+    if not audio_bytes:
+        return jsonify({"error": "Empty audio file"}), 400
+    if is_audio_too_long(get_audio_info(audio_bytes)):
+        return jsonify({"error": "Audio is too long"}), 413
+    # Both may run FFmpeg; keep them off the event loop
+    converted_audio = await asyncio.to_thread(normalize_audio_bytes, audio_bytes)
+    if not converted_audio:
+        return jsonify({"error": "Failed to convert audio file"}), 500
+    speech_detected, converted_audio = await asyncio.to_thread(check_speech, converted_audio)
+    if speech_detected:
+        transcribed_text = await transcribe_audio_async(converted_audio, input_lang)
+    else:
+        # Silent tap: answer with the pre-rendered sentinel without calling any provider
+        app.logger.info("No speech detected; skipping transcription")
+        transcribed_text = NO_TEXT_MESSAGE
+    time_to_transcribe = time.time() - time_to_transcribe
+    app.logger.info(f"Transcription took {time_to_transcribe:.2f} seconds")
+
+    if not transcribed_text:
+        return jsonify({"error": "Transcription failed"}), 500
+    transcribed_text = transcribed_text.replace("*doctor", "").replace("*patient", "").replace("TRANSCRIBE THE FOLLOWING TEXT =>", "")
+    previous_texts = []
+    if transcribed_text != NO_TEXT_MESSAGE:
+        # Read before this turn is added, so the context is what came before it
+        previous_texts = await get_last_three_conversations_async(session_id)
+        await add_conversation_async(transcribed_text, person_type=mode, session_id=session_id)
+
+    translation_start_time = time.time()
+    if transcribed_text == NO_TEXT_MESSAGE:
+        translated_text = NO_TEXT_MESSAGE
+    else:
+        translated_text = await translate_transcription_async(transcribed_text, mode, input_lang, output_lang, previous_texts=previous_texts)
+    if not translated_text:
+        return jsonify({"error": "Translation failed"}), 500
+    translate_time = time.time() - translation_start_time
+    app.logger.info(f"Translation took {translate_time:.2f} seconds")
+
+    voice_generation_start_time = time.time()
+    voice_bytes = await synthesize_voice_async(translated_text, voice_name, output_lang, output_format=output_format, provider=tts_provider)
+    if not voice_bytes:
+        return jsonify({"error": "Voice generation failed"}), 500
+    voice_time = time.time() - voice_generation_start_time
+    app.logger.info(f"Voice generation took {voice_time:.2f} seconds")
+
+    overall_time = time.time() - overall_start_time
+    app.logger.info(f"OVERALL PROCESSING TIME: {overall_time:.2f} seconds")
+
+    return _voice_response({
+        "transcribed_text": transcribed_text,
+        "translated_text": translated_text,
+        "mode": mode
+    }, voice_bytes, output_mimetype(output_format), response_mode)
+
+@app.route('/translate-texts', methods=['POST'])
+async def translate_texts_route():
+    """Translates a JSON list of segments (a transcript, a visit summary) in as few Translate calls as possible."""
+    body = await request.get_json(silent=True) or {}
+    texts = body.get('texts')
+    if not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+        return jsonify({"error": "texts must be a list of strings"}), 400
+
+    translations = await translate_texts_async(texts, body.get('source_language', 'en-US'), body.get('target_language', 'es'))
+    if translations is None:
+        return jsonify({"error": "Translation failed"}), 500
+    return jsonify({"translations": translations})
+
+@app.route('/batch-jobs', methods=['POST'])
+async def submit_batch_job():
+    """Queues recorded audio files (repeated `audio` fields) for background translation. Poll the returned status_url."""
+    files = await request.files
+    audio_files = [audio_file for audio_file in files.getlist('audio') if audio_file.filename]
+    if not audio_files:
+        return jsonify({"error": "No audio files"}), 400
+    if len(audio_files) > BATCH_MAX_FILES:
+        return jsonify({"error": f"At most {BATCH_MAX_FILES} files per job"}), 413
+    try:
+        options = batch_options(await request.form)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    job = await asyncio.to_thread(batch_jobs.submit, [(audio_file.filename, audio_file.stream) for audio_file in audio_files], options)
+    return jsonify({"job_id": job["id"], "status": job["status"], "status_url": url_for('get_batch_job', job_id=job["id"])}), 202
+
+@app.route('/batch-jobs/<job_id>', methods=['GET'])
+async def get_batch_job(job_id):
+    job = await asyncio.to_thread(batch_jobs.get, job_id) if is_valid_job_id(job_id) else None
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job)
+
+@app.route('/batch-jobs/<job_id>', methods=['DELETE'])
+async def delete_batch_job(job_id):
+    if not is_valid_job_id(job_id) or not await asyncio.to_thread(batch_jobs.delete, job_id):
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify({"message": "Job deleted"})
+
+@app.route('/batch-jobs/<job_id>/items/<int:index>/voice', methods=['GET'])
+async def get_batch_job_voice(job_id, index):
+    entry = await asyncio.to_thread(batch_jobs.voice, job_id, index) if is_valid_job_id(job_id) else None
+    if entry is None:
+        return jsonify({"error": "Voice not found"}), 404
+    audio, mimetype = entry
+    return await send_file(io.BytesIO(audio), mimetype=mimetype, conditional=True)
+
+if __name__ == '__main__':
+    start_warm_up()
+    batch_jobs.resume()
+    app.run(debug=True, host='0.0.0.0')
@@ -0,0 +1,2 @@
+# fakes/__init__.py
+# Local stand-ins for the external providers, used to run the backend offline.
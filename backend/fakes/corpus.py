@@ -0,0 +1,37 @@
+"""English/Korean sentence pairs from training/data.tsv.
+
+The fake providers use them as scripted transcripts and translations, and the
+benchmarks (bench/) use them to drive the text stages.
+"""
+import csv
+import itertools
+import os
+import threading
+
+DATA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "training", "data.tsv")
+
+
+def load_sentence_pairs(path=DATA_PATH):
+    """Returns the (english, korean) pairs, skipping malformed rows."""
+    with open(path, newline="", encoding="utf-8") as file:
+        return [(row[0].strip(), row[1].strip()) for row in csv.reader(file, delimiter="\t") if len(row) >= 2 and row[0].strip()]
+
+
+class Corpus:
+    """Looks translations up by source sentence and hands out transcripts in a fixed rotation."""
+
+    def __init__(self, pairs=None):
+        self.pairs = pairs if pairs is not None else load_sentence_pairs()
+        self.translations = {english: korean for english, korean in self.pairs}
+        self._transcripts = itertools.cycle([english for english, _ in self.pairs])
+        self._lock = threading.Lock()
+
+    def next_transcript(self):
+        with self._lock:
+            return next(self._transcripts)
+
+    def translate(self, text, target_language="ko"):
+        translation = self.translations.get(text.strip())
+        if translation is not None and target_language.startswith("ko"):
+            return translation
+        return f"[{target_language}] {text}"
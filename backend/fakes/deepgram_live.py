@@ -0,0 +1,142 @@
+"""Fake Deepgram live (streaming) transcription server.
+
+Speaks enough of the wss://api.deepgram.com/v1/listen protocol for
+src.streaming_transcription.LiveTranscriber: it reveals a scripted transcript
+word by word as audio bytes arrive, sends interim results, and finalizes the
+pending words once no audio has arrived for `endpointing` milliseconds or the
+client sends CloseStream.
+
+Run the server and point the backend at it:
+    python -m fakes.deepgram_live --port 8765
+    DEEPGRAM_LIVE_URL=ws://localhost:8765/v1/listen python app.py
+
+Or check the client against it without any network access:
+    python -m fakes.deepgram_live --selftest
+"""
+import argparse
+import json
+import logging
+import threading
+import time
+import uuid
+from urllib.parse import urlparse, parse_qs
+from websockets.sync.server import serve
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TRANSCRIPT = "Please open wide so I can take a look at that tooth."
+
+
+def _results_message(words, start, duration, is_final, speech_final, request_id):
+    return json.dumps({
+        "type": "Results",
+        "channel_index": [0, 1],
+        "start": start,
+        "duration": duration,
+        "is_final": is_final,
+        "speech_final": speech_final,
+        "channel": {"alternatives": [{"transcript": " ".join(words), "confidence": 0.99}]},
+        "metadata": {"request_id": request_id},
+    })
+
+
+def make_handler(transcript=DEFAULT_TRANSCRIPT, bytes_per_word=8000, latency=0.0):
+    """Builds a connection handler that plays back `transcript` as audio arrives."""
+    script = transcript.split()
+
+    def handler(ws):
+        query = parse_qs(urlparse(ws.request.path).query)
+        endpointing = int(query.get("endpointing", ["300"])[0]) / 1000
+        interim_results = query.get("interim_results", ["false"])[0] == "true"
+        request_id = str(uuid.uuid4())
+
+        received = 0
+        finalized = 0  # words already sent in a final result
+        revealed = 0
+        segment_start = 0.0
+
+        def finalize(speech_final):
+            nonlocal finalized, segment_start
+            if revealed == finalized:
+                return
+            time.sleep(latency)
+            duration = (revealed - finalized) * 0.25
+            ws.send(_results_message(script[finalized:revealed], segment_start, duration, True, speech_final, request_id))
+            segment_start += duration
+            finalized = revealed
+
+        while True:
+            try:
+                message = ws.recv(timeout=endpointing)
+            except TimeoutError:
+                finalize(speech_final=True)  # endpointing: the speaker paused
+                continue
+            except Exception:
+                return
+
+            if isinstance(message, str):
+                if json.loads(message).get("type") == "CloseStream":
+                    revealed = len(script) if received else 0
+                    finalize(speech_final=False)
+                    ws.send(json.dumps({"type": "Metadata", "request_id": request_id, "duration": received / 32000}))
+                    ws.close()
+                    return
+                continue
+
+            received += len(message)
+            now_revealed = min(len(script), received // bytes_per_word)
+            if now_revealed > revealed:
+                revealed = now_revealed
+                if interim_results:
+                    time.sleep(latency)
+                    ws.send(_results_message(script[finalized:revealed], segment_start, 0.25, False, False, request_id))
+
+    return handler
+
+
+def run_server(host="localhost", port=8765, **handler_options):
+    """Starts the fake server in a background thread and returns it."""
+    server = serve(make_handler(**handler_options), host, port)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def selftest(port):
+    """Streams synthetic audio through LiveTranscriber against a local fake server."""
+    from src.streaming_transcription import LiveTranscriber
+
+    server = run_server(port=port)
+    try:
+        transcriber = LiveTranscriber("en-US", on_transcript=print, encoding="linear16", sample_rate=16000,
+                                      api_key="fake", url=f"ws://localhost:{port}/v1/listen")
+        if not transcriber.start():
+            raise SystemExit("Could not connect to the fake server")
+        silence = bytes(3200)  # 100 ms of 16 kHz 16-bit mono
+        for _ in range(20):
+            transcriber.send(silence)
+            time.sleep(0.01)
+        time.sleep(0.5)  # pause long enough to trigger endpointing
+        for _ in range(20):
+            transcriber.send(silence)
+        print("Final transcript:", transcriber.finish())
+    finally:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--transcript", default=DEFAULT_TRANSCRIPT)
+    parser.add_argument("--bytes-per-word", type=int, default=8000)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--selftest", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.selftest:
+        selftest(args.port)
+    else:
+        with serve(make_handler(args.transcript, args.bytes_per_word, args.latency_ms / 1000), args.host, args.port) as server:
+            logger.info(f"Fake Deepgram live server listening on ws://{args.host}:{args.port}/v1/listen")
+            server.serve_forever()
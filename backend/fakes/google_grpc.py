@@ -0,0 +1,205 @@
+"""Fake Google Cloud Translate v3 and Firestore gRPC services.
+
+Serves the RPCs src/ uses, on one plaintext gRPC port:
+- TranslationService.TranslateText, answering from training/data.tsv
+- Firestore.Commit (set and delete writes), RunQuery (one collection, equality
+  and "in" filters, order_by, limit) and ListDocuments, over an in-memory store
+
+Each RPC waits and fails (UNAVAILABLE) according to the "translate" and
+"firestore" FaultProfiles (see fakes/profiles.py).
+
+Run the server and point the backend at it:
+    python -m fakes.google_grpc --port 8767 --profile realistic
+    TRANSLATE_API_ENDPOINT=localhost:8767 FIRESTORE_EMULATOR_HOST=localhost:8767 \\
+        GOOGLE_CLOUD_PROJECT=local LOCAL_SECRETS_FILE=... python app.py
+"""
+import argparse
+import logging
+import threading
+import time
+from concurrent import futures
+import grpc
+from google.cloud.firestore_v1 import types as firestore_types
+from google.cloud.translate_v3 import types as translate_types
+from .corpus import Corpus
+from .profiles import build_profiles, PROFILES
+
+logger = logging.getLogger(__name__)
+
+# Raw protobuf classes; the proto-plus wrappers are not needed to serve requests
+TranslateTextRequest = translate_types.TranslateTextRequest.pb()
+TranslateTextResponse = translate_types.TranslateTextResponse.pb()
+CommitRequest = firestore_types.CommitRequest.pb()
+CommitResponse = firestore_types.CommitResponse.pb()
+RunQueryRequest = firestore_types.RunQueryRequest.pb()
+RunQueryResponse = firestore_types.RunQueryResponse.pb()
+ListDocumentsRequest = firestore_types.ListDocumentsRequest.pb()
+ListDocumentsResponse = firestore_types.ListDocumentsResponse.pb()
+Document = firestore_types.Document.pb()
+StructuredQuery = firestore_types.StructuredQuery.pb()
+
+FieldFilter = StructuredQuery.FieldFilter
+Direction = StructuredQuery.Direction
+
+
+def _value_key(value):
+    """A comparable Python value for a Firestore Value."""
+    kind = value.WhichOneof("value_type")
+    if kind == "timestamp_value":
+        return (value.timestamp_value.seconds, value.timestamp_value.nanos)
+    if kind in (None, "null_value"):
+        return None
+    return getattr(value, kind)
+
+
+def _matches(document, where):
+    if not where.HasField("field_filter"):
+        # Composite AND filters; anything else is not used by src/
+        return all(_matches(document, f) for f in where.composite_filter.filters) if where.HasField("composite_filter") else True
+    field_filter = where.field_filter
+    field = document.fields.get(field_filter.field.field_path)
+    if field is None:
+        return False
+    if field_filter.op == FieldFilter.IN:
+        return _value_key(field) in [_value_key(value) for value in field_filter.value.array_value.values]
+    if field_filter.op == FieldFilter.EQUAL:
+        return _value_key(field) == _value_key(field_filter.value)
+    raise ValueError(f"Unsupported filter operator {field_filter.op}")
+
+
+class FirestoreStore:
+    """Documents by full resource name."""
+
+    def __init__(self):
+        self.documents = {}
+        self._lock = threading.Lock()
+
+    def commit(self, request):
+        now = time.time_ns()
+        with self._lock:
+            for write in request.writes:
+                if write.HasField("update"):
+                    document = Document()
+                    document.CopyFrom(write.update)
+                    document.update_time.FromNanoseconds(now)
+                    self.documents[document.name] = document
+                elif write.delete:
+                    self.documents.pop(write.delete, None)
+        response = CommitResponse()
+        for _ in request.writes:
+            response.write_results.add().update_time.FromNanoseconds(now)
+        response.commit_time.FromNanoseconds(now)
+        return response
+
+    def _collection(self, parent, collection_id):
+        prefix = f"{parent}/{collection_id}/"
+        with self._lock:
+            return [document for name, document in self.documents.items() if name.startswith(prefix) and "/" not in name[len(prefix):]]
+
+    def run_query(self, request):
+        query = request.structured_query
+        documents = []
+        for selector in query.from_:
+            documents.extend(self._collection(request.parent, selector.collection_id))
+        if query.HasField("where"):
+            documents = [document for document in documents if _matches(document, query.where)]
+        for order in reversed(query.order_by):
+            documents.sort(key=lambda document: _value_key(document.fields[order.field.field_path]),
+                           reverse=order.direction == Direction.DESCENDING)
+        if query.HasField("limit"):
+            documents = documents[:query.limit.value]
+
+        read_time = time.time_ns()
+        if not documents:
+            response = RunQueryResponse()
+            response.read_time.FromNanoseconds(read_time)
+            yield response
+        for document in documents:
+            response = RunQueryResponse(document=document)
+            response.read_time.FromNanoseconds(read_time)
+            yield response
+
+    def list_documents(self, request):
+        documents = sorted(self._collection(request.parent, request.collection_id), key=lambda document: document.name)
+        start = int(request.page_token or 0)
+        end = start + (request.page_size or len(documents))
+        response = ListDocumentsResponse(documents=[Document(name=document.name) for document in documents[start:end]])
+        if end < len(documents):
+            response.next_page_token = str(end)
+        return response
+
+
+class GoogleServices:
+    """The Translate and Firestore RPC handlers, each behind its FaultProfile."""
+
+    def __init__(self, corpus=None, profiles=None):
+        self.corpus = corpus or Corpus()
+        self.profiles = profiles or build_profiles()
+        self.store = FirestoreStore()
+
+    def _simulate(self, endpoint, context):
+        profile = self.profiles[endpoint]
+        time.sleep(profile.delay())
+        if profile.should_fail():
+            context.abort(grpc.StatusCode.UNAVAILABLE, f"Simulated {endpoint} failure")
+
+    def translate_text(self, request, context):
+        self._simulate("translate", context)
+        response = TranslateTextResponse()
+        for content in request.contents:
+            response.translations.add(translated_text=self.corpus.translate(content, request.target_language_code))
+        return response
+
+    def commit(self, request, context):
+        self._simulate("firestore", context)
+        return self.store.commit(request)
+
+    def run_query(self, request, context):
+        self._simulate("firestore", context)
+        yield from self.store.run_query(request)
+
+    def list_documents(self, request, context):
+        self._simulate("firestore", context)
+        return self.store.list_documents(request)
+
+    def handlers(self):
+        serialize = lambda message: message.SerializeToString()
+        return [
+            grpc.method_handlers_generic_handler("google.cloud.translation.v3.TranslationService", {
+                "TranslateText": grpc.unary_unary_rpc_method_handler(
+                    self.translate_text, request_deserializer=TranslateTextRequest.FromString, response_serializer=serialize),
+            }),
+            grpc.method_handlers_generic_handler("google.firestore.v1.Firestore", {
+                "Commit": grpc.unary_unary_rpc_method_handler(
+                    self.commit, request_deserializer=CommitRequest.FromString, response_serializer=serialize),
+                "RunQuery": grpc.unary_stream_rpc_method_handler(
+                    self.run_query, request_deserializer=RunQueryRequest.FromString, response_serializer=serialize),
+                "ListDocuments": grpc.unary_unary_rpc_method_handler(
+                    self.list_documents, request_deserializer=ListDocumentsRequest.FromString, response_serializer=serialize),
+            }),
+        ]
+
+
+def run_server(host="localhost", port=0, corpus=None, profiles=None, max_workers=32):
+    """Starts the fake gRPC server and returns (server, port, services); port 0 picks a free one."""
+    services = GoogleServices(corpus, profiles)
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=max_workers))
+    server.add_generic_rpc_handlers(services.handlers())
+    port = server.add_insecure_port(f"{host}:{port}")
+    server.start()
+    return server, port, services
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=8767)
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="instant")
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    server, port, _ = run_server(args.host, args.port, profiles=build_profiles(args.profile, args.failure_rate, args.seed))
+    logger.info(f"Fake Translate and Firestore listening on {args.host}:{port}")
+    server.wait_for_termination()
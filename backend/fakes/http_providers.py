@@ -0,0 +1,201 @@
+"""Fake HTTP providers: Deepgram pre-recorded, OpenAI (chat, speech, Whisper) and Eleven Labs.
+
+One server answers all of them on the same port, speaking just enough of each
+API for src/: Deepgram returns the sentences of training/data.tsv in rotation as
+transcripts, GPT and Translate answer with the matching Korean sentence, and the
+TTS endpoints return synthetic audio sized like real speech. Every endpoint
+waits and fails according to its FaultProfile (see fakes/profiles.py).
+
+Run the server and point the backend at it:
+    python -m fakes.http_providers --port 8766 --profile realistic
+    DEEPGRAM_API_URL=http://localhost:8766/v1/listen OPENAI_BASE_URL=http://localhost:8766/v1 \\
+        ELEVEN_LABS_API_URL=http://localhost:8766/v1 LOCAL_SECRETS_FILE=... python app.py
+"""
+import argparse
+import io
+import json
+import logging
+import re
+import threading
+import time
+import uuid
+import wave
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from .corpus import Corpus
+from .profiles import build_profiles, PROFILES
+
+logger = logging.getLogger(__name__)
+
+TTS_SAMPLE_RATE = 24000
+TTS_SECONDS_PER_CHAR = 0.06
+MP3_BYTES_PER_SECOND = 16000  # 128 kbit/s
+
+PROMPT_LANGUAGES = re.compile(r"Translate from (\S+) to (\S+?)\.")
+
+
+def _speech_seconds(text):
+    return min(30.0, max(0.5, len(text) * TTS_SECONDS_PER_CHAR))
+
+
+def synthetic_audio(text, response_format="mp3"):
+    """(body, content type) of silent audio as long as `text` would take to say."""
+    seconds = _speech_seconds(text)
+    if response_format in ("wav", "pcm") or response_format.startswith("pcm_"):
+        pcm = bytes(int(TTS_SAMPLE_RATE * seconds) * 2)
+        if response_format != "wav":
+            return pcm, "audio/L16"
+        output = io.BytesIO()
+        with wave.open(output, "wb") as wav_file:
+            wav_file.setnchannels(1)
+            wav_file.setsampwidth(2)
+            wav_file.setframerate(TTS_SAMPLE_RATE)
+            wav_file.writeframes(pcm)
+        return output.getvalue(), "audio/wav"
+    # Not decodable MP3, but the right size and leading bytes for anything that only sniffs it
+    return b"ID3" + bytes(int(MP3_BYTES_PER_SECOND * seconds)), "audio/mpeg"
+
+
+def _chat_translation(corpus, messages):
+    system_text = " ".join(message.get("content", "") for message in messages if message.get("role") == "system")
+    languages = PROMPT_LANGUAGES.search(system_text)
+    target_language = languages.group(2) if languages else "ko"
+    text = messages[-1].get("content", "").split("=>", 1)[-1].strip()
+    if text.startswith("*") and ":" in text:
+        text = text.split(":", 1)[1].strip()  # Drop the "*patient:" speaker tag
+    return corpus.translate(text, target_language)
+
+
+def make_handler(corpus, profiles):
+    """Builds the request handler class serving every fake HTTP provider."""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # Keep-alive, like the real providers
+        disable_nagle_algorithm = True  # Headers and body go out in separate writes
+
+        def log_message(self, format, *args):
+            logger.debug(format, *args)
+
+        def _body(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            return self.rfile.read(length) if length else b""
+
+        def _send(self, status, body, content_type="application/json"):
+            if not isinstance(body, bytes):
+                body = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _simulate(self, endpoint):
+            """Waits like `endpoint` would; returns False (after sending a 503) if it should fail this time."""
+            profile = profiles[endpoint]
+            time.sleep(profile.delay())
+            if profile.should_fail():
+                self._send(503, {"error": {"message": f"Simulated {endpoint} failure", "type": "server_error"}})
+                return False
+            return True
+
+        def do_HEAD(self):
+            self._send(200, b"", "text/plain")
+
+        def do_GET(self):
+            if self.path.startswith("/v1/projects"):
+                return self._send(200, {"projects": []})
+            if self.path.startswith("/v1/models/"):
+                return self._send(200, {"id": self.path.rsplit("/", 1)[-1], "object": "model", "created": 0, "owned_by": "fake"})
+            if self.path.startswith("/v1/models"):
+                return self._send(200, [])
+            self._send(404, {"error": "Not found"})
+
+        def do_POST(self):
+            body = self._body()
+            path = self.path.split("?", 1)[0]
+            if path == "/v1/listen":
+                return self._deepgram()
+            if path == "/v1/chat/completions":
+                return self._chat(json.loads(body))
+            if path == "/v1/audio/speech":
+                return self._openai_speech(json.loads(body))
+            if path == "/v1/audio/transcriptions":
+                return self._whisper()
+            if path.startswith("/v1/text-to-speech/"):
+                return self._eleven_labs(json.loads(body))
+            self._send(404, {"error": "Not found"})
+
+        def _deepgram(self):
+            if not self._simulate("deepgram"):
+                return
+            transcript = corpus.next_transcript()
+            self._send(200, {"metadata": {"request_id": str(uuid.uuid4())},
+                             "results": {"channels": [{"alternatives": [{"transcript": transcript, "confidence": 0.99}]}]}})
+
+        def _whisper(self):
+            if self._simulate("whisper"):
+                self._send(200, {"text": corpus.next_transcript()})
+
+        def _chat(self, request):
+            if not self._simulate("openai-chat"):
+                return
+            content = _chat_translation(corpus, request.get("messages", []))
+            completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+            created = int(time.time())
+            if not request.get("stream"):
+                return self._send(200, {
+                    "id": completion_id, "object": "chat.completion", "created": created, "model": request.get("model"),
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                    "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+                })
+
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            pieces = [piece + " " for piece in content.split(" ")]
+            pieces[-1] = pieces[-1].rstrip()
+            for piece, finish_reason in [(piece, None) for piece in pieces] + [(None, "stop")]:
+                chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": request.get("model"),
+                         "choices": [{"index": 0, "delta": {"content": piece} if piece else {}, "finish_reason": finish_reason}]}
+                self._write_chunk(f"data: {json.dumps(chunk)}\n\n".encode())
+            self._write_chunk(b"data: [DONE]\n\n")
+            self._write_chunk(b"")
+
+        def _write_chunk(self, data):
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+
+        def _openai_speech(self, request):
+            if self._simulate("openai-tts"):
+                self._send(200, *synthetic_audio(request.get("input", ""), request.get("response_format", "mp3")))
+
+        def _eleven_labs(self, request):
+            if not self._simulate("elevenlabs"):
+                return
+            output_format = re.search(r"output_format=([a-z0-9_]+)", self.path)
+            self._send(200, *synthetic_audio(request.get("text", ""), output_format.group(1) if output_format else "mp3"))
+
+    return Handler
+
+
+def run_server(host="localhost", port=0, corpus=None, profiles=None):
+    """Starts the fake server in a background thread and returns it; port 0 picks a free one (see server.server_port)."""
+    server = ThreadingHTTPServer((host, port), make_handler(corpus or Corpus(), profiles or build_profiles()))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="instant")
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    server = ThreadingHTTPServer((args.host, args.port),
+                                 make_handler(Corpus(), build_profiles(args.profile, args.failure_rate, args.seed)))
+    logger.info(f"Fake HTTP providers listening on http://{args.host}:{args.port}/v1")
+    server.serve_forever()
@@ -0,0 +1,59 @@
+"""Latency distributions and failure rates of the simulated providers.
+
+Latencies are log-normal: `median_ms` is the median and `sigma` the spread of the
+underlying normal (0.5 puts p99 at about 3.2x the median), which is close to how
+real API latencies are skewed.
+"""
+import math
+import random
+import threading
+
+
+class FaultProfile:
+    """How one simulated endpoint behaves: its latency distribution and how often it fails."""
+
+    def __init__(self, median_ms=0.0, sigma=0.0, failure_rate=0.0, seed=None):
+        self.median_ms = median_ms
+        self.sigma = sigma
+        self.failure_rate = failure_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def delay(self):
+        """Seconds to wait before answering."""
+        if self.median_ms <= 0:
+            return 0.0
+        with self._lock:
+            return self._random.lognormvariate(math.log(self.median_ms / 1000), self.sigma)
+
+    def should_fail(self):
+        if self.failure_rate <= 0:
+            return False
+        with self._lock:
+            return self._random.random() < self.failure_rate
+
+
+# (median_ms, sigma) per endpoint
+PROFILES = {
+    # No added latency: the benchmarks then measure the backend's own overhead
+    "instant": {},
+    # Rough production medians, for end-to-end numbers
+    "realistic": {
+        "deepgram": (300, 0.35),
+        "whisper": (700, 0.4),
+        "openai-chat": (900, 0.5),
+        "openai-tts": (450, 0.4),
+        "elevenlabs": (600, 0.4),
+        "translate": (180, 0.3),
+        "firestore": (25, 0.5),
+    },
+}
+
+ENDPOINTS = ["deepgram", "whisper", "openai-chat", "openai-tts", "elevenlabs", "translate", "firestore"]
+
+
+def build_profiles(name="instant", failure_rate=0.0, seed=0, overrides=None):
+    """A FaultProfile per endpoint from a named profile, with optional {endpoint: (median_ms, sigma)} overrides."""
+    settings = dict(PROFILES[name], **(overrides or {}))
+    return {endpoint: FaultProfile(*settings.get(endpoint, (0.0, 0.0)), failure_rate=failure_rate, seed=seed + index)
+            for index, endpoint in enumerate(ENDPOINTS)}
@@ -0,0 +1,24 @@
+# gunicorn.conf.py
+# Picked up automatically by gunicorn from the working directory.
+import os
+
+# Import the app and the src modules once in the master so workers share them
+# copy-on-write instead of each paying the import time. Safe because nothing
+# opens a network connection at import time; clients are built per worker.
+preload_app = True
+
+# flask-sock keeps a thread busy for as long as a /transcribe-live WebSocket is
+# open; under the default sync worker one live session would block every other
+# request of its worker. gthread workers heartbeat from their main thread, so
+# `timeout` only catches hung workers and a dictation may run longer than it.
+# The async app overrides the worker class with GUNICORN_CMD_ARGS (see the Dockerfile).
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+threads = int(os.environ.get("GUNICORN_THREADS", 16))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 120))
+
+
+def post_fork(server, worker):
+    from src.startup import start_warm_up
+    from src.batch_jobs import batch_jobs
+    start_warm_up()
+    batch_jobs.resume()  # Picks up batch jobs left unfinished by a previous worker
@@ -1,6 +1,25 @@
 # src/__init__.py
-from .audio_processing import convert_audio_to_wav, get_audio_info
-from .transcription import transcribe_audio_whisper, transcribe_audio_google, transcribe_audio_deepgram_local, post_process_using_gpt
-from .translation import translate_text
-from .voice_generation import generate_voice_file_eleven_labs, generate_voice_file_openai
-from .conversation import get_last_three_conversations, add_conversation, delete_all_conversations
+from .secret_manager import get_credentials
+from .audio_headers import sniff_audio
+from .audio_processing import convert_audio_to_wav, convert_audio_bytes_to_wav, normalize_audio_bytes, contains_speech, check_speech, get_audio_info, is_audio_too_long, read_audio_bytes, spooled_audio_file
+from .transcription import (NO_TEXT_MESSAGE, transcribe_audio_whisper, transcribe_audio_google, transcribe_audio_deepgram_local, post_process_using_gpt, stream_post_process_using_gpt,
+                            post_process_using_gpt_async, transcribe_audio_deepgram_async, transcribe_audio_whisper_raw, transcribe_audio_google_raw,
+                            transcribe_audio, transcribe_audio_async, stt_hedger, stt_registry)
+from .translation import translate_text, translate_text_async, translate_texts, translate_texts_async
+from .translation_race import translation_race, race_translation, race_translation_async, translate_transcription, translate_transcription_async
+from .voice_generation import (generate_voice_file_eleven_labs, generate_voice_file_openai, stream_voice_openai, stream_voice_eleven_labs,
+                               synthesize_voice_openai, synthesize_voice_eleven_labs, prewarm_voice_cache,
+                               synthesize_voice_openai_async, synthesize_voice_eleven_labs_async,
+                               synthesize_voice, synthesize_voice_async, stream_voice, tts_registry, TTS_PROVIDER_CHOICES)
+from .conversation import (conversation_buffer, is_valid_session_id, DEFAULT_SESSION_ID, get_last_three_conversations, add_conversation, delete_all_conversations,
+                           get_last_three_conversations_async, add_conversation_async, delete_all_conversations_async)
+from .streaming_transcription import LiveTranscriber
+from .pipeline import split_sentences, translate_and_speak
+from .translation_cache import translation_cache
+from .tts_cache import voice_cache
+from .audio_delivery import audio_store, multipart_mixed, RESPONSE_MODES
+from .output_formats import parse_output_format, output_mimetype
+from .upload_encoding import encode_for_upload, upload_encoding_stats
+from .http_pool import get_http_session, get_httpx_client, get_async_httpx_client, prewarm_connections
+from .batch_jobs import batch_jobs, batch_options, is_valid_job_id, BATCH_MAX_FILES, BATCH_MAX_UPLOAD_BYTES, BATCH_UPLOAD_TIMEOUT
+from .startup import warm_up, start_warm_up, start_connection_prewarm
@@ -0,0 +1,187 @@
+import json
+import logging
+import os
+import re
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# How /process-audio returns the synthesized voice:
+#   json      - base64 inside the JSON body (the original format)
+#   multipart - multipart/mixed with a JSON part followed by the raw audio part
+#   resource  - JSON with a voice_url; the audio is fetched from /audio/<id> (supports Range)
+RESPONSE_MODES = ("json", "multipart", "resource")
+
+AUDIO_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+class AudioStore:
+    """Short-lived audio resources for response_mode=resource.
+
+    Entries expire after `ttl` seconds and the oldest are dropped once `max_bytes`
+    is exceeded. With a `directory` every entry is a file there, so the follow-up
+    fetch can reach any gunicorn worker on the machine; without one the store is
+    in memory and per process. The directory is swept at most every
+    `purge_interval` seconds, or sooner once this process's writes may have
+    taken it over `max_bytes`.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, ttl=120, directory=None, purge_interval=10):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.directory = directory
+        self.purge_interval = purge_interval
+        self._entries = OrderedDict()  # id -> (expires_at, audio, mimetype)
+        self._size = 0
+        self._lock = threading.Lock()
+        # Directory-backed stores: created on the first put, not at import in a preloading master
+        self._directory_ready = False
+        self._last_purge = 0
+        self._purged_size = 0  # Bytes the directory held after the last sweep, plus what this process wrote since
+
+    def put(self, audio, mimetype):
+        """Stores the audio and returns its id."""
+        audio_id = secrets.token_urlsafe(16)
+        if self.directory:
+            self._put_file(audio_id, audio, mimetype)
+            return audio_id
+        with self._lock:
+            self._purge()
+            self._entries[audio_id] = (time.time() + self.ttl, audio, mimetype)
+            self._size += len(audio)
+            while self._size > self.max_bytes and len(self._entries) > 1:
+                _, (_, evicted, _) = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+        return audio_id
+
+    def get(self, audio_id):
+        """Returns (audio, mimetype), or None if the id is unknown or expired."""
+        if self.directory:
+            return self._get_file(audio_id)
+        with self._lock:
+            entry = self._entries.get(audio_id)
+            if entry is None or entry[0] < time.time():
+                return None
+            return entry[1], entry[2]
+
+    def _purge(self):
+        now = time.time()
+        while self._entries:
+            audio_id, (expires_at, audio, _) = next(iter(self._entries.items()))
+            if expires_at >= now:
+                break
+            del self._entries[audio_id]
+            self._size -= len(audio)
+
+    # Directory-backed entries: <id>.audio with an <id>.json holding the mimetype and expiry
+
+    def _path(self, audio_id, extension):
+        return os.path.join(self.directory, f"{audio_id}.{extension}")
+
+    def _put_file(self, audio_id, audio, mimetype):
+        if not self._directory_ready:
+            os.makedirs(self.directory, exist_ok=True)
+            self._directory_ready = True
+        # Written under temporary names and renamed, the metadata last, so readers
+        # in other processes never see a half-written entry
+        metadata = json.dumps({"mimetype": mimetype, "expires_at": time.time() + self.ttl}).encode()
+        for extension, data in (("audio", audio), ("json", metadata)):
+            temporary_path = f"{self._path(audio_id, extension)}.tmp"
+            with open(temporary_path, "wb") as file:
+                file.write(data)
+            os.replace(temporary_path, self._path(audio_id, extension))
+        with self._lock:
+            self._purged_size += len(audio)
+            if self._purged_size <= self.max_bytes and time.time() - self._last_purge < self.purge_interval:
+                return
+            self._last_purge = time.time()
+        self._purge_files()
+
+    def _get_file(self, audio_id):
+        if not AUDIO_ID_PATTERN.match(audio_id or ""):
+            return None
+        try:
+            with open(self._path(audio_id, "json")) as file:
+                metadata = json.load(file)
+            if metadata["expires_at"] < time.time():
+                return None
+            with open(self._path(audio_id, "audio"), "rb") as file:
+                return file.read(), metadata["mimetype"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _remove_files(self, audio_id):
+        for extension in ("json", "audio"):
+            try:
+                os.remove(self._path(audio_id, extension))
+            except OSError:
+                pass  # Already removed by another worker
+
+    def _purge_files(self):
+        """Removes expired entries, then the oldest ones while the directory holds more than max_bytes.
+
+        Every entry lives `ttl` seconds, so its age is read from the metadata file's mtime
+        without opening it.
+        """
+        written_at, sizes = {}, {}
+        try:
+            with os.scandir(self.directory) as directory_entries:
+                for directory_entry in directory_entries:
+                    audio_id, extension = os.path.splitext(directory_entry.name)
+                    try:
+                        if extension == ".json":
+                            written_at[audio_id] = directory_entry.stat().st_mtime
+                        elif extension == ".audio":
+                            sizes[audio_id] = directory_entry.stat().st_size
+                    except OSError:
+                        continue  # Removed by another worker meanwhile
+        except OSError:
+            return
+        expired_before = time.time() - self.ttl
+        entries = []  # (written_at, audio_id, size)
+        for audio_id, mtime in written_at.items():
+            if mtime < expired_before:
+                self._remove_files(audio_id)
+            elif audio_id in sizes:
+                entries.append((mtime, audio_id, sizes[audio_id]))
+        entries.sort()
+        size = sum(entry[2] for entry in entries)
+        for _, audio_id, entry_size in entries[:-1]:
+            if size <= self.max_bytes:
+                break
+            self._remove_files(audio_id)
+            size -= entry_size
+        with self._lock:
+            self._purged_size = size
+
+
+def multipart_mixed(data, audio, mimetype):
+    """Builds a multipart/mixed body: `data` as a JSON part, then the raw audio.
+
+    Returns (parts, content_type, content_length). The audio is one of the parts,
+    not copied into a joined body.
+    """
+    boundary = secrets.token_hex(16)
+    json_part = (f"--{boundary}\r\nContent-Type: application/json\r\n\r\n".encode()
+                 + json.dumps(data).encode() + b"\r\n")
+    audio_header = f"--{boundary}\r\nContent-Type: {mimetype}\r\nContent-Length: {len(audio)}\r\n\r\n".encode()
+    closing = f"\r\n--{boundary}--\r\n".encode()
+    parts = [json_part, audio_header, audio, closing]
+    return parts, f"multipart/mixed; boundary={boundary}", sum(len(part) for part in parts)
+
+
+audio_store = AudioStore(
+    max_bytes=int(os.environ.get("AUDIO_STORE_BYTES", 64 * 1024 * 1024)),
+    ttl=int(os.environ.get("AUDIO_STORE_TTL", 120)),
+    # Shared by the gunicorn workers, so /audio/<id> works whichever one it reaches.
+    # Set to an empty string to keep the audio in each process's memory instead
+    directory=os.environ.get("AUDIO_STORE_DIR", "/tmp/audio-store") or None,
+    purge_interval=float(os.environ.get("AUDIO_STORE_PURGE_INTERVAL", 10)),
+)
+
+# A lock held by another thread at fork time would never be released in the child
+os.register_at_fork(after_in_child=lambda: setattr(audio_store, '_lock', threading.Lock()))
@@ -0,0 +1,366 @@
+import logging
+import struct
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Reads container and stream headers without decoding any audio (and without
+# spawning ffprobe). Every sniffer returns a dict with `container`, `codec`,
+# `sample_rate`, `channels` and `duration_us`; fields it cannot determine are None.
+
+WAV_CODECS = {
+    (0x0001, 8): "pcm_u8", (0x0001, 16): "pcm_s16le", (0x0001, 24): "pcm_s24le", (0x0001, 32): "pcm_s32le",
+    (0x0003, 32): "pcm_f32le", (0x0003, 64): "pcm_f64le", (0x0006, 8): "pcm_alaw", (0x0007, 8): "pcm_mulaw",
+}
+
+MATROSKA_CODECS = {"A_OPUS": "opus", "A_VORBIS": "vorbis", "A_AAC": "aac", "A_FLAC": "flac", "A_MPEG/L3": "mp3",
+                   "A_PCM/INT/LIT": "pcm"}
+
+# EBML element IDs (with their length marker bits, as they appear in the file)
+EBML_HEADER = 0x1A45DFA3
+EBML_DOC_TYPE = 0x4282
+SEGMENT = 0x18538067
+INFO = 0x1549A966
+TIMESTAMP_SCALE = 0x2AD7B1
+DURATION = 0x4489
+TRACKS = 0x1654AE6B
+TRACK_ENTRY = 0xAE
+TRACK_TYPE = 0x83
+CODEC_ID = 0x86
+AUDIO = 0xE1
+SAMPLING_FREQUENCY = 0xB5
+CHANNELS = 0x9F
+CLUSTER = 0x1F43B675
+CLUSTER_TIMESTAMP = 0xE7
+BLOCK_GROUP = 0xA0
+BLOCK = 0xA1
+SIMPLE_BLOCK = 0xA3
+# Elements whose children we need; everything else is skipped by size
+EBML_MASTERS = {EBML_HEADER, SEGMENT, INFO, TRACKS, TRACK_ENTRY, AUDIO, CLUSTER, BLOCK_GROUP}
+
+MP3_BITRATES = {  # (MPEG-1?, layer) -> kbit/s by index
+    (True, 1): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    (True, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    (True, 3): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    (False, 1): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    (False, 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    (False, 3): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+MP3_SAMPLE_RATES = {3: [44100, 48000, 32000], 2: [22050, 24000, 16000], 0: [11025, 12000, 8000]}  # by version bits
+
+# ISO base media (MP4/M4A, what Safari's MediaRecorder writes): boxes to step into on the
+# way to the audio track, and the sample entry types of the codecs we name
+MP4_CONTAINER_BOXES = {b"moov", b"trak", b"mdia", b"minf", b"stbl"}
+MP4_CODECS = {b"mp4a": "aac", b"Opus": "opus", b"fLaC": "flac", b"alac": "alac", b".mp3": "mp3", b"ulaw": "pcm_mulaw",
+              b"alaw": "pcm_alaw"}
+
+
+def _info(container, codec=None, sample_rate=None, channels=None, duration_us=None):
+    return {"container": container, "codec": codec, "sample_rate": sample_rate, "channels": channels,
+            "duration_us": int(duration_us) if duration_us is not None else None}
+
+
+def sniff_wav(data):
+    fmt = None
+    offset = 12
+    while offset + 8 <= len(data):
+        chunk_id = bytes(data[offset:offset + 4])
+        chunk_size = struct.unpack_from("<I", data, offset + 4)[0]
+        if chunk_id == b"fmt " and chunk_size >= 16:
+            fmt = struct.unpack_from("<HHIIHH", data, offset + 8)
+            if fmt[0] == 0xFFFE and chunk_size >= 26:
+                fmt = (struct.unpack_from("<H", data, offset + 32)[0],) + fmt[1:]
+        elif chunk_id == b"data" and fmt:
+            format_tag, channels, sample_rate, byte_rate, _, bits = fmt
+            # Streamed WAVs leave the size at 0 or 0xFFFFFFFF; fall back to what was received
+            data_size = chunk_size if 0 < chunk_size <= len(data) - offset - 8 else len(data) - offset - 8
+            duration_us = data_size * 1_000_000 / byte_rate if byte_rate else None
+            return _info("wav", WAV_CODECS.get((format_tag, bits), f"wav_{format_tag:#06x}"), sample_rate, channels, duration_us)
+        offset += 8 + chunk_size + (chunk_size & 1)
+    return _info("wav") if fmt is None else _info("wav", WAV_CODECS.get((fmt[0], fmt[5])), fmt[2], fmt[1])
+
+
+def _read_vint(data, offset, keep_marker=False):
+    """Reads an EBML variable-length integer. Returns (value, length, all_ones)."""
+    first = data[offset]
+    length = 1
+    while length <= 8 and not first & (0x80 >> (length - 1)):
+        length += 1
+    if length > 8 or offset + length > len(data):
+        raise ValueError("Invalid EBML variable-length integer")
+    value = first if keep_marker else first & (0xFF >> length)
+    for byte in data[offset + 1:offset + length]:
+        value = value << 8 | byte
+    all_ones = value == (1 << (7 * length)) - 1 and not keep_marker
+    return value, length, all_ones
+
+
+def _ebml_uint(body):
+    return int.from_bytes(body, "big") if body else 0
+
+
+def _ebml_float(body):
+    return struct.unpack(">f" if len(body) == 4 else ">d", body)[0] if len(body) in (4, 8) else None
+
+
+def sniff_matroska(data):
+    """WebM/Matroska, including the unknown-size segments and clusters MediaRecorder writes."""
+    doc_type = "matroska"
+    timestamp_scale = 1_000_000  # ns per tick
+    duration_ticks = None
+    track = {}
+    audio_track = None
+    cluster_timestamp = 0
+    last_block_ticks = None
+
+    offset = 0
+    try:
+        while offset < len(data):
+            element_id, id_length, _ = _read_vint(data, offset, keep_marker=True)
+            size, size_length, unknown_size = _read_vint(data, offset + id_length)
+            body_start = offset + id_length + size_length
+            if element_id in EBML_MASTERS:
+                # Step inside instead of over, so unknown sizes never need resolving
+                if element_id == TRACK_ENTRY:
+                    track = {}
+                offset = body_start
+                continue
+            if unknown_size:
+                break
+            body = data[body_start:body_start + size]
+            offset = body_start + size
+
+            if element_id == EBML_DOC_TYPE:
+                doc_type = bytes(body).decode("ascii", "replace")
+            elif element_id == TIMESTAMP_SCALE:
+                timestamp_scale = _ebml_uint(body) or timestamp_scale
+            elif element_id == DURATION:
+                duration_ticks = _ebml_float(body)
+            elif element_id == TRACK_TYPE:
+                track["type"] = _ebml_uint(body)
+            elif element_id == CODEC_ID:
+                track["codec"] = bytes(body).decode("ascii", "replace")
+                if track["codec"].startswith("A_") and audio_track is None:
+                    audio_track = track
+            elif element_id == SAMPLING_FREQUENCY:
+                track["sample_rate"] = _ebml_float(body)
+            elif element_id == CHANNELS:
+                track["channels"] = _ebml_uint(body)
+            elif element_id == CLUSTER_TIMESTAMP:
+                cluster_timestamp = _ebml_uint(body)
+            elif element_id in (SIMPLE_BLOCK, BLOCK) and len(body) >= 4:
+                _, track_number_length, _ = _read_vint(body, 0)
+                relative = struct.unpack_from(">h", body, track_number_length)[0]
+                last_block_ticks = max(last_block_ticks or 0, cluster_timestamp + relative)
+    except (ValueError, IndexError, struct.error):
+        pass  # A truncated upload still tells us what it got through
+
+    audio_track = audio_track or {}
+    codec_id = audio_track.get("codec")
+    ticks = duration_ticks if duration_ticks else last_block_ticks
+    sample_rate = audio_track.get("sample_rate")
+    return _info("webm" if doc_type == "webm" else "matroska",
+                 MATROSKA_CODECS.get(codec_id, codec_id.lower() if codec_id else None),
+                 int(sample_rate) if sample_rate else None,
+                 audio_track.get("channels", 1 if audio_track else None),
+                 ticks * timestamp_scale / 1000 if ticks is not None else None)
+
+
+def sniff_ogg(data):
+    # The first page carries the codec identification header
+    segments = data[26] if len(data) > 26 else 0
+    packet = bytes(data[27 + segments:27 + segments + 64])
+    last_granule = _last_ogg_granule(data)
+    if packet.startswith(b"OpusHead") and len(packet) >= 16:
+        channels = packet[9]
+        pre_skip = struct.unpack_from("<H", packet, 10)[0]
+        # Opus always decodes at 48 kHz; the input rate in the header is informational
+        duration_us = max(0, last_granule - pre_skip) * 1_000_000 / 48000 if last_granule is not None else None
+        return _info("ogg", "opus", 48000, channels, duration_us)
+    if packet.startswith(b"\x01vorbis") and len(packet) >= 16:
+        channels = packet[11]
+        sample_rate = struct.unpack_from("<I", packet, 12)[0]
+        duration_us = last_granule * 1_000_000 / sample_rate if last_granule is not None and sample_rate else None
+        return _info("ogg", "vorbis", sample_rate, channels, duration_us)
+    if packet.startswith(b"\x7fFLAC") and packet[9:13] == b"fLaC":
+        info = sniff_flac(packet[9:])
+        info["container"] = "ogg"
+        return info
+    return _info("ogg")
+
+
+def _last_ogg_granule(data):
+    position = bytes(data[-65536:]).rfind(b"OggS")
+    if position < 0:
+        return None
+    page = data[len(data) - min(len(data), 65536) + position:]
+    if len(page) < 14:
+        return None
+    granule = struct.unpack_from("<q", page, 6)[0]
+    return granule if granule >= 0 else None
+
+
+def sniff_flac(data):
+    # STREAMINFO is always the first metadata block
+    if len(data) < 26:
+        return _info("flac", "flac")
+    packed = int.from_bytes(bytes(data[18:26]), "big")
+    sample_rate = packed >> 44
+    channels = (packed >> 41 & 0x7) + 1
+    total_samples = packed & 0xFFFFFFFFF
+    duration_us = total_samples * 1_000_000 / sample_rate if sample_rate and total_samples else None
+    return _info("flac", "flac", sample_rate, channels, duration_us)
+
+
+def _mp4_boxes(data, start, end):
+    """Yields (type, body start, body end) of the boxes between `start` and `end`."""
+    offset = start
+    while offset + 8 <= end:
+        size, box_type = struct.unpack_from(">I4s", data, offset)
+        header_size = 8
+        if size == 1:
+            size = struct.unpack_from(">Q", data, offset + 8)[0]
+            header_size = 16
+        elif size == 0:
+            size = end - offset  # Runs to the end of the file
+        if size < header_size:
+            return
+        yield box_type, offset + header_size, min(end, offset + size)
+        offset += size
+
+
+def _mp4_duration(data, body):
+    """(timescale, duration) from an mvhd or mdhd box body."""
+    if data[body] == 1:
+        timescale, duration = struct.unpack_from(">IQ", data, body + 20)
+    else:
+        timescale, duration = struct.unpack_from(">II", data, body + 12)
+    return timescale, duration
+
+
+def sniff_mp4(data):
+    """MP4/M4A: codec and format of the first sound track, and its duration when the header carries one.
+
+    Fragmented files (MediaRecorder) leave the durations at 0, which is reported as unknown.
+    """
+    movie_duration = None
+    tracks = []
+
+    def walk(start, end, track):
+        nonlocal movie_duration
+        for box_type, body, body_end in _mp4_boxes(data, start, end):
+            if box_type == b"trak":
+                track = {}
+                tracks.append(track)
+            if box_type in MP4_CONTAINER_BOXES:
+                walk(body, body_end, track)
+            elif box_type == b"mvhd":
+                movie_duration = _mp4_duration(data, body)
+            elif box_type == b"mdhd" and track is not None:
+                track["duration"] = _mp4_duration(data, body)
+            elif box_type == b"hdlr" and track is not None:
+                track["handler"] = bytes(data[body + 8:body + 12])
+            elif box_type == b"stsd" and track is not None and body_end - body >= 44:
+                # One AudioSampleEntry: size, type, 6 reserved, data reference, 8 reserved,
+                # then channel count, sample size, 4 reserved and a 16.16 sample rate
+                entry = body + 8
+                track["codec"] = bytes(data[entry + 4:entry + 8])
+                track["channels"], _, _, sample_rate = struct.unpack_from(">HHII", data, entry + 24)
+                track["sample_rate"] = sample_rate >> 16
+
+    walk(0, len(data), None)
+    track = next((track for track in tracks if track.get("handler") == b"soun"), {})
+    timescale, duration = track.get("duration") or movie_duration or (0, 0)
+    codec = track.get("codec")
+    return _info("mp4", MP4_CODECS.get(codec, codec.decode("ascii", "replace").strip() if codec else None),
+                 track.get("sample_rate") or None, track.get("channels") or None,
+                 duration * 1_000_000 / timescale if timescale and duration else None)
+
+
+def _mp3_frame(data, offset):
+    """Parses the MPEG audio frame header at `offset`. Returns a dict of its fields, or None if it is not one."""
+    if offset + 4 > len(data) or data[offset] != 0xFF or data[offset + 1] & 0xE0 != 0xE0:
+        return None
+    header = struct.unpack_from(">I", data, offset)[0]
+    version_bits = header >> 19 & 0x3
+    layer = 4 - (header >> 17 & 0x3)
+    bitrate_index = header >> 12 & 0xF
+    sample_rate_index = header >> 10 & 0x3
+    # Free-format (index 0) frames have no computable length, so they cannot be verified either
+    if version_bits == 1 or layer == 4 or bitrate_index in (0, 0xF) or sample_rate_index == 3:
+        return None
+    mpeg1 = version_bits == 3
+    sample_rate = MP3_SAMPLE_RATES[version_bits][sample_rate_index]
+    bitrate = MP3_BITRATES[(mpeg1, layer)][bitrate_index] * 1000
+    padding = header >> 9 & 0x1
+    if layer == 1:
+        length = (12 * bitrate // sample_rate + padding) * 4
+    else:
+        length = (144 if layer == 2 or mpeg1 else 72) * bitrate // sample_rate + padding
+    return {"version_bits": version_bits, "layer": layer, "mpeg1": mpeg1, "sample_rate": sample_rate, "bitrate": bitrate,
+            "channels": 1 if header >> 6 & 0x3 == 3 else 2, "length": length,
+            "samples_per_frame": 384 if layer == 1 else 1152 if layer == 2 or mpeg1 else 576}
+
+
+def sniff_mp3(data):
+    """MPEG audio, recognized by an ID3 tag or by two consecutive frame headers that agree.
+
+    Any data is full of bytes that look like a lone frame sync, so one is never enough.
+    """
+    offset = 0
+    tagged = bytes(data[:3]) == b"ID3" and len(data) >= 10
+    if tagged:
+        tag_size = (data[6] & 0x7F) << 21 | (data[7] & 0x7F) << 14 | (data[8] & 0x7F) << 7 | (data[9] & 0x7F)
+        offset = 10 + tag_size
+
+    limit = min(len(data) - 4, offset + 65536)
+    frame = None
+    while offset < limit:
+        frame = _mp3_frame(data, offset)
+        if frame:
+            following = _mp3_frame(data, offset + frame["length"])
+            if following and all(following[field] == frame[field] for field in ("version_bits", "layer", "sample_rate")):
+                break
+            if tagged and offset + frame["length"] >= len(data):
+                break  # A tagged file with a single frame
+        frame = None
+        offset += 1
+    if frame is None:
+        return _info("mp3", "mp3") if tagged else None
+
+    layer, mpeg1, channels = frame["layer"], frame["mpeg1"], frame["channels"]
+    sample_rate, bitrate, samples_per_frame = frame["sample_rate"], frame["bitrate"], frame["samples_per_frame"]
+
+    duration_us = None
+    # A Xing/Info header (VBR) stores the frame count in the first frame
+    side_info = (17 if channels == 1 else 32) if mpeg1 else (9 if channels == 1 else 17)
+    xing = offset + 4 + side_info
+    if bytes(data[xing:xing + 4]) in (b"Xing", b"Info") and len(data) >= xing + 12:
+        flags = struct.unpack_from(">I", data, xing + 4)[0]
+        if flags & 0x1:
+            frames = struct.unpack_from(">I", data, xing + 8)[0]
+            duration_us = frames * samples_per_frame * 1_000_000 / sample_rate
+    if duration_us is None and bitrate:
+        duration_us = (len(data) - offset) * 8 * 1_000_000 / bitrate
+    return _info("mp3", "mp3" if layer == 3 else f"mp{layer}", sample_rate, channels, duration_us)
+
+
+def sniff_audio(audio_bytes):
+    """Identifies WAV, WebM/Matroska, Ogg, FLAC, MP4 and MP3 from their headers. Returns None for anything else."""
+    data = memoryview(audio_bytes).cast("B")
+    magic = bytes(data[:12])
+    try:
+        if magic[:4] == b"RIFF" and magic[8:12] == b"WAVE":
+            return sniff_wav(data)
+        if magic[:4] == b"\x1a\x45\xdf\xa3":
+            return sniff_matroska(data)
+        if magic[:4] == b"OggS":
+            return sniff_ogg(data)
+        if magic[:4] == b"fLaC":
+            return sniff_flac(data)
+        if magic[4:8] == b"ftyp":
+            return sniff_mp4(data)
+        return sniff_mp3(data)
+    except (ValueError, IndexError, struct.error) as e:
+        logger.info(f"Failed to parse audio headers: {e}")
+        return None
@@ -1,11 +1,30 @@
 import subprocess
 import os
 import logging
+import tempfile
 import time
+from contextlib import contextmanager
+from .audio_headers import sniff_audio
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
+# Whether audio that is not WAV (WebM/Ogg from MediaRecorder) goes through ffmpeg before STT.
+# When off it is sent as is; Deepgram decodes those containers itself.
+FFMPEG_FALLBACK = os.environ.get("FFMPEG_FALLBACK", "false").lower() == "true"
+
+# Codecs Deepgram decodes natively; uploads in these never need FFmpeg
+STT_NATIVE_CODECS = {"opus", "vorbis", "flac", "mp3", "aac", "pcm_s16le"}
+
+# Compressed uploads are decoded with FFmpeg for the voice-activity check only when they
+# are this short: silent taps are brief, and decoding costs a process spawn. Uploads of
+# unknown duration (MediaRecorder WebM carries none) are judged by their size instead
+VAD_DECODE_MAX_SECONDS = float(os.environ.get("VAD_DECODE_MAX_SECONDS", 3))
+VAD_DECODE_MAX_BYTES = int(os.environ.get("VAD_DECODE_MAX_BYTES", 48 * 1024))
+
+# Longer uploads are rejected before any work is done
+MAX_AUDIO_SECONDS = float(os.environ.get("MAX_AUDIO_SECONDS", 120))
+
 def convert_audio_to_wav(input_file):
     """Converts any audio file to WAV format with 16-bit samples, 16 kHz, mono, and adjusts silence trimming using FFmpeg."""
     output_file = os.path.splitext(input_file)[0] + '_converted.wav'
@@ -44,12 +63,152 @@ def convert_audio_to_wav(input_file):
     return output_file
 
 
-def get_audio_info(speech_file):
-    """Retrieves basic information about an audio file using FFprobe."""
-    command = ['ffprobe', '-v', 'error', '-show_entries', 'format=format_name:stream=sample_rate', '-of', 'default=noprint_wrappers=1', speech_file]
+def convert_audio_bytes_to_wav(audio_bytes):
+    """Same conversion as convert_audio_to_wav, but in memory.
+
+    WAV input is decoded, downmixed, resampled and trimmed in-process with NumPy;
+    anything else is piped through FFmpeg.
+    """
+    convert_audio_start_time = time.time()
+    from .pcm import normalize_wav  # NumPy is only imported once audio is converted
+    converted_audio = normalize_wav(audio_bytes)
+    if converted_audio is not None:
+        logger.info(f"Audio converted in-process in {time.time() - convert_audio_start_time:.2f} seconds.")
+        return converted_audio
+    return _convert_audio_bytes_with_ffmpeg(audio_bytes)
+
+
+def normalize_audio_bytes(audio_bytes, ffmpeg_fallback=None):
+    """Prepares uploaded audio for STT: WAV is always normalized in-process, other
+    containers only go through FFmpeg when `ffmpeg_fallback` (default FFMPEG_FALLBACK)
+    is on and are otherwise returned unchanged.
+    """
+    from .pcm import is_wav
+    if ffmpeg_fallback is None:
+        ffmpeg_fallback = FFMPEG_FALLBACK
+    if is_wav(audio_bytes):
+        return convert_audio_bytes_to_wav(audio_bytes)
+    if ffmpeg_fallback:
+        audio_info = sniff_audio(audio_bytes)
+        if audio_info and audio_info["codec"] in STT_NATIVE_CODECS:
+            logger.info(f"Skipping conversion of {audio_info['container']}/{audio_info['codec']} audio")
+            return audio_bytes
+        return convert_audio_bytes_to_wav(audio_bytes)
+    return audio_bytes
+
+
+def is_audio_too_long(audio_info, max_seconds=None):
+    """Whether sniffed audio is longer than `max_seconds` (default MAX_AUDIO_SECONDS). Unknown durations pass."""
+    if max_seconds is None:
+        max_seconds = MAX_AUDIO_SECONDS
+    return bool(audio_info and audio_info["duration_us"] and audio_info["duration_us"] > max_seconds * 1_000_000)
+
+
+def _short_enough_to_decode(audio_bytes):
+    audio_info = sniff_audio(audio_bytes)
+    if audio_info and audio_info["duration_us"]:
+        return audio_info["duration_us"] <= VAD_DECODE_MAX_SECONDS * 1_000_000
+    return len(audio_bytes) <= VAD_DECODE_MAX_BYTES
+
+
+def check_speech(audio_bytes):
+    """Local voice-activity check run before any provider call. Returns (speech, audio to transcribe).
+
+    WAV is checked as is. A short compressed upload (WebM/Ogg/MP4 from MediaRecorder)
+    is decoded with FFmpeg first, and the decoded WAV is returned for STT so the
+    decode is not wasted. Longer compressed uploads, and ones FFmpeg cannot decode,
+    are treated as speech and returned unchanged.
+    """
+    from .pcm import contains_speech as pcm_contains_speech, is_wav, VAD_ENABLED
+    if not VAD_ENABLED:
+        return True, audio_bytes
+    if is_wav(audio_bytes):
+        return pcm_contains_speech(audio_bytes), audio_bytes
+    if not _short_enough_to_decode(audio_bytes):
+        logger.info("Voice activity check skipped: the compressed upload is too long to be a silent tap")
+        return True, audio_bytes
+    decoded_audio = _convert_audio_bytes_with_ffmpeg(audio_bytes, trim_silence=False)
+    if not decoded_audio:
+        logger.warning("Voice activity check skipped: the upload could not be decoded")
+        return True, audio_bytes
+    return pcm_contains_speech(decoded_audio), decoded_audio
+
+
+def contains_speech(audio_bytes):
+    """Whether check_speech finds speech in the upload. False means the upload is silence."""
+    return check_speech(audio_bytes)[0]
+
+
+def _convert_audio_bytes_with_ffmpeg(audio_bytes, trim_silence=True):
+    """FFmpeg reads stdin and writes stdout. Returns None if FFmpeg fails or is not installed."""
+    convert_audio_start_time = time.time()
+
+    silence_filter = (
+        'silenceremove=start_periods=1:start_duration=0.5:start_threshold=-50dB:'
+        'stop_periods=1:stop_duration=0.5:stop_threshold=-50dB'
+    )
+
+    command = [
+        'ffmpeg',
+        '-i', 'pipe:0',
+        *(['-af', silence_filter] if trim_silence else []),
+        '-ar', '16000',
+        '-ac', '1',
+        '-acodec', 'pcm_s16le',
+        '-f', 'wav',
+        'pipe:1'
+    ]
+
     try:
-        result = subprocess.run(command, text=True, capture_output=True, check=True)
-        return result.stdout
+        result = subprocess.run(command, input=bytes(audio_bytes), check=True, capture_output=True)
     except subprocess.CalledProcessError as e:
-        logger.error(f"FFprobe error: {e.stderr}")
-        return None
\ No newline at end of file
+        logger.error(f"FFmpeg error: {e.stderr.decode()}")
+        return None
+    except OSError as e:
+        logger.error(f"Failed to run FFmpeg: {e}")
+        return None
+
+    conversion_time = time.time() - convert_audio_start_time
+    logger.info(f"Audio converted in memory in {conversion_time:.2f} seconds.")
+    return result.stdout
+
+
+def read_audio_bytes(source):
+    """Returns the audio in `source` as a bytes-like object.
+
+    `source` may already be bytes/bytearray/memoryview (returned as-is, without
+    copying), a file-like object, or a path on disk.
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return source
+    if hasattr(source, 'read'):
+        return source.read()
+    with open(source, 'rb') as audio_file:
+        return audio_file.read()
+
+
+@contextmanager
+def spooled_audio_file(audio_bytes, suffix=".wav"):
+    """Writes the audio to a private temporary file for the stages that truly need a path.
+
+    The file is unique to the caller and removed on exit, so concurrent requests
+    never share it.
+    """
+    with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as temp_audio:
+        temp_audio.write(audio_bytes)
+        temp_audio_path = temp_audio.name
+    try:
+        yield temp_audio_path
+    finally:
+        os.unlink(temp_audio_path)
+
+
+def get_audio_info(speech_file):
+    """Container, codec, sample rate, channels and duration (in microseconds) of an audio file or bytes.
+
+    Read from the headers in-process, without FFprobe. Returns None for formats it does not recognize.
+    """
+    audio_info = sniff_audio(read_audio_bytes(speech_file))
+    if audio_info is None:
+        logger.error("Unrecognized audio format")
+    return audio_info
\ No newline at end of file
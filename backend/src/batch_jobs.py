@@ -0,0 +1,494 @@
+import fcntl
+import json
+import logging
+import os
+import queue
+import re
+import secrets
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+from .audio_processing import get_audio_info, normalize_audio_bytes, check_speech
+from .transcription import transcribe_audio, NO_TEXT_MESSAGE
+from .translation_race import translate_transcription
+from .translation import translate_texts
+from .pipeline import SENTENCE_END
+from .voice_generation import synthesize_voice
+from .output_formats import output_mimetype
+from .http_pool import get_http_session
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Jobs live on disk so a restarted (or another) worker can pick up where one left off
+BATCH_JOBS_DIR = os.environ.get("BATCH_JOBS_DIR", "/tmp/batch-jobs")
+BATCH_WORKERS = int(os.environ.get("BATCH_WORKERS", 2))
+BATCH_MAX_FILES = int(os.environ.get("BATCH_MAX_FILES", 200))
+BATCH_MAX_AUDIO_SECONDS = float(os.environ.get("BATCH_MAX_AUDIO_SECONDS", 4 * 3600))
+# Size of a /batch-jobs request, which is streamed to disk rather than held in memory. Sized so a
+# BATCH_MAX_AUDIO_SECONDS recording fits even as 16 kHz mono WAV; compressed uploads are far smaller
+BATCH_MAX_UPLOAD_BYTES = int(os.environ.get("BATCH_MAX_UPLOAD_BYTES", 512 * 1024 * 1024))
+# Seconds a /batch-jobs upload may take to arrive under the ASGI app (Quart's BODY_TIMEOUT is 60)
+BATCH_UPLOAD_TIMEOUT = int(os.environ.get("BATCH_UPLOAD_TIMEOUT", 600))
+# Calls a batch may have in flight per stage, across all of this process's batch workers
+BATCH_STAGE_LIMITS = {
+    "stt": int(os.environ.get("BATCH_STT_CONCURRENCY", 2)),
+    "translate": int(os.environ.get("BATCH_TRANSLATE_CONCURRENCY", 2)),
+    "tts": int(os.environ.get("BATCH_TTS_CONCURRENCY", 1)),
+}
+# Batch stages hold off while this many interactive requests are in flight, for at most BATCH_MAX_YIELD_SECONDS
+BATCH_INTERACTIVE_THRESHOLD = int(os.environ.get("BATCH_INTERACTIVE_THRESHOLD", 1))
+BATCH_MAX_YIELD_SECONDS = float(os.environ.get("BATCH_MAX_YIELD_SECONDS", 10))
+# Transcripts longer than this are translated as several segments of whole sentences, in one
+# batched Translate call, instead of in one long GPT completion
+BATCH_TRANSLATE_SEGMENT_CHARS = int(os.environ.get("BATCH_TRANSLATE_SEGMENT_CHARS", 2000))
+# Text sent to TTS per call; OpenAI rejects input over 4096 characters
+BATCH_TTS_MAX_CHARS = int(os.environ.get("BATCH_TTS_MAX_CHARS", 4096))
+# Hosts a finished job may be reported to with a POST to its callback_url, comma separated.
+# Empty disables callbacks; clients poll /batch-jobs/<id> instead
+BATCH_CALLBACK_HOSTS = {host.strip().lower() for host in os.environ.get("BATCH_CALLBACK_HOSTS", "").split(",") if host.strip()}
+# How often idle batch workers look for jobs nobody holds (e.g. after a worker died)
+BATCH_RESCAN_INTERVAL = float(os.environ.get("BATCH_RESCAN_INTERVAL", 30))
+# Completed jobs and their results are deleted this long after they finish
+BATCH_RETENTION_SECONDS = float(os.environ.get("BATCH_RETENTION_SECONDS", 7 * 24 * 3600))
+
+JOB_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+PENDING, DONE, FAILED = "pending", "done", "failed"
+QUEUED, RUNNING, COMPLETED = "queued", "running", "completed"
+
+
+def is_valid_job_id(job_id):
+    return bool(job_id) and JOB_ID_PATTERN.match(job_id) is not None
+
+
+def callback_url_error(callback_url):
+    """Why the server will not POST to `callback_url`, or None if it will.
+
+    Only https URLs on a BATCH_CALLBACK_HOSTS host qualify, so a submission cannot
+    point the server at its own network.
+    """
+    if not BATCH_CALLBACK_HOSTS:
+        return "callbacks are not enabled; poll the job's status_url instead"
+    try:
+        url = urlsplit(callback_url)
+        hostname = url.hostname
+        url.port  # Raises for a malformed port
+    except ValueError:
+        return "callback_url is not a valid URL"
+    if url.scheme != "https":
+        return "callback_url must be an https URL"
+    if not hostname or hostname.lower() not in BATCH_CALLBACK_HOSTS:
+        return "callback_url's host is not allowed"
+    return None
+
+
+def batch_options(form):
+    """The job options in a submission's form fields. Raises ValueError for invalid ones."""
+    callback_url = form.get('callback_url') or None
+    error = callback_url_error(callback_url) if callback_url else None
+    if error:
+        raise ValueError(error)
+    return {
+        "input_lang": form.get('input_lang', 'en-US'),
+        "output_lang": form.get('output_lang', 'es'),
+        "mode": form.get('mode', 'patient'),
+        "voice": form.get('voice', 'Jarvis'),
+        "synthesize_voice": form.get('synthesize_voice', 'false').lower() == 'true',
+        "callback_url": callback_url,
+    }
+
+
+def split_text(text, max_chars):
+    """Splits `text` into segments of whole sentences of at most `max_chars` characters.
+
+    A single sentence longer than that is cut at the last space that fits, or mid-word if there is none.
+    """
+    segments, current = [], ""
+    for sentence in SENTENCE_END.split(text.strip()):
+        while len(sentence) > max_chars:
+            cut = sentence.rfind(" ", 0, max_chars + 1)
+            if cut <= 0:
+                cut = max_chars
+            if current:
+                segments.append(current)
+                current = ""
+            segments.append(sentence[:cut].strip())
+            sentence = sentence[cut:].strip()
+        if current and len(current) + 1 + len(sentence) > max_chars:
+            segments.append(current)
+            current = ""
+        current = f"{current} {sentence}" if current else sentence
+    if current:
+        segments.append(current)
+    return segments
+
+
+class BatchJobs:
+    """Translates recorded visits and voicemails in the background.
+
+    Every uploaded file is one item of a job. A job is claimed by a process with
+    an flock on its directory, so with several gunicorn workers each job runs in
+    exactly one of them, and a job whose worker died is picked up by another.
+    Items already finished are never redone; an item interrupted mid-way is.
+    """
+
+    def __init__(self, root=BATCH_JOBS_DIR, workers=BATCH_WORKERS, stage_limits=BATCH_STAGE_LIMITS):
+        self.root = root
+        self.workers = workers
+        self.stage_limits = stage_limits
+        self._init_state()
+
+    def _init_state(self):
+        self._queue = queue.Queue()
+        self._threads = []
+        self._claims = {}  # job_id -> lock file object held while this process runs the job
+        self._job_locks = {}
+        self._lock = threading.Lock()
+        self._stages = {stage: threading.BoundedSemaphore(limit) for stage, limit in self.stage_limits.items()}
+        self._interactive = 0
+        self._interactive_condition = threading.Condition()
+        self._completed = {}  # job_id -> time it completed, so rescans need not re-read finished jobs
+        self._last_scan = 0
+
+    # Interactive traffic
+
+    def begin_interactive(self):
+        with self._interactive_condition:
+            self._interactive += 1
+
+    def end_interactive(self):
+        with self._interactive_condition:
+            self._interactive -= 1
+            self._interactive_condition.notify_all()
+
+    @contextmanager
+    def _stage(self, stage):
+        """Runs a batch stage once interactive traffic has quieted down and a slot for the stage is free."""
+        with self._interactive_condition:
+            self._interactive_condition.wait_for(lambda: self._interactive < BATCH_INTERACTIVE_THRESHOLD,
+                                                 timeout=BATCH_MAX_YIELD_SECONDS)
+        with self._stages[stage]:
+            yield
+
+    # Job files
+
+    def _job_dir(self, job_id):
+        return os.path.join(self.root, job_id)
+
+    def _read_job(self, job_id):
+        try:
+            with open(os.path.join(self._job_dir(job_id), "job.json")) as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def _write_json(self, path, data):
+        temporary_path = f"{path}.tmp"
+        with open(temporary_path, "w") as file:
+            json.dump(data, file)
+        os.replace(temporary_path, path)  # Readers never see a half-written file
+
+    def _job_lock(self, job_id):
+        with self._lock:
+            return self._job_locks.setdefault(job_id, threading.Lock())
+
+    # Public API
+
+    def submit(self, files, options):
+        """Stores `files` ((filename, bytes or file object) pairs) as a new job and queues it. Returns the job.
+
+        File objects (uploads spooled to disk) are copied in chunks, never read into memory whole.
+        """
+        job_id = secrets.token_urlsafe(12)
+        job_dir = self._job_dir(job_id)
+        os.makedirs(os.path.join(job_dir, "inputs"))
+        os.makedirs(os.path.join(job_dir, "results"))
+        for index, (_, audio) in enumerate(files):
+            with open(os.path.join(job_dir, "inputs", str(index)), "wb") as file:
+                if hasattr(audio, "read"):
+                    shutil.copyfileobj(audio, file)
+                else:
+                    file.write(audio)
+
+        now = time.time()
+        job = {
+            "id": job_id, "status": QUEUED, "created_at": now, "updated_at": now, "options": options,
+            "items": [{"index": index, "filename": filename, "status": PENDING, "error": None}
+                      for index, (filename, _) in enumerate(files)],
+        }
+        self._write_json(os.path.join(job_dir, "job.json"), job)
+        logger.info(f"Batch job {job_id} submitted with {len(files)} files")
+        self.start()
+        self._claim(job_id)
+        return job
+
+    def get(self, job_id):
+        """The job with its progress and the results of the finished items, or None if it does not exist."""
+        job = self._read_job(job_id)
+        if job is None:
+            return None
+        for item in job["items"]:
+            if item["status"] == DONE:
+                try:
+                    with open(os.path.join(self._job_dir(job_id), "results", f"{item['index']}.json")) as file:
+                        item["result"] = json.load(file)
+                except (OSError, ValueError):
+                    item["result"] = None
+        job["progress"] = {status: sum(item["status"] == status for item in job["items"]) for status in (PENDING, DONE, FAILED)}
+        return job
+
+    def voice(self, job_id, index):
+        """(audio, mimetype) of an item's synthesized voice, or None."""
+        job = self._read_job(job_id)
+        if job is None or not 0 <= index < len(job["items"]):
+            return None
+        try:
+            with open(os.path.join(self._job_dir(job_id), "results", f"{index}.voice"), "rb") as file:
+                return file.read(), output_mimetype(None)
+        except OSError:
+            return None
+
+    def delete(self, job_id):
+        """Removes a job and its results. Returns False if it does not exist."""
+        if self._read_job(job_id) is None:
+            return False
+        self._release(job_id)
+        self._completed.pop(job_id, None)
+        shutil.rmtree(self._job_dir(job_id), ignore_errors=True)
+        return True
+
+    # Workers
+
+    def start(self):
+        """Starts this process's batch workers. Must run after gunicorn forks, never in a preloading master."""
+        with self._lock:
+            if self._threads:
+                return
+            os.makedirs(self.root, exist_ok=True)
+            self._threads = [threading.Thread(target=self._work, name=f"batch-worker-{index}", daemon=True)
+                             for index in range(self.workers)]
+            for thread in self._threads:
+                thread.start()
+
+    def resume(self):
+        """Starts the workers, claims every unfinished job no other process holds and deletes expired ones."""
+        self.start()
+        with self._lock:
+            self._last_scan = time.time()
+        try:
+            job_ids = os.listdir(self.root)
+        except OSError:
+            return
+        for job_id in job_ids:
+            if not is_valid_job_id(job_id) or job_id in self._claims:
+                continue
+            if job_id not in self._completed and self._claim(job_id):
+                continue
+            completed_at = self._completed.get(job_id)
+            if completed_at is not None and time.time() - completed_at > BATCH_RETENTION_SECONDS:
+                logger.info(f"Deleting batch job {job_id}: past its retention")
+                self._completed.pop(job_id, None)
+                shutil.rmtree(self._job_dir(job_id), ignore_errors=True)
+        for job_id in self._completed.keys() - set(job_ids):  # Deleted by another process
+            self._completed.pop(job_id, None)
+
+    def _rescan_due(self):
+        """Whether a rescan is due. Only one of the idle workers gets True per BATCH_RESCAN_INTERVAL."""
+        with self._lock:
+            if time.time() - self._last_scan < BATCH_RESCAN_INTERVAL:
+                return False
+            self._last_scan = time.time()
+            return True
+
+    def _claim(self, job_id):
+        job = self._read_job(job_id)
+        if job is None:
+            return False
+        if job["status"] == COMPLETED:
+            self._completed[job_id] = job["updated_at"]
+            return False
+        lock_file = open(os.path.join(self._job_dir(job_id), ".lock"), "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        with self._lock:
+            self._claims[job_id] = lock_file
+
+        job = self._read_job(job_id)  # Re-read: the previous holder may have progressed meanwhile
+        pending = [item["index"] for item in job["items"] if item["status"] == PENDING]
+        if job["status"] == RUNNING:
+            logger.info(f"Resuming batch job {job_id} with {len(pending)} files left")
+        for index in pending:
+            self._queue.put((job_id, index))
+        if not pending:
+            self._finish_job(job_id)
+        return True
+
+    def _release(self, job_id):
+        with self._lock:
+            lock_file = self._claims.pop(job_id, None)
+        if lock_file:
+            lock_file.close()
+
+    def _work(self):
+        while True:
+            try:
+                job_id, index = self._queue.get(timeout=BATCH_RESCAN_INTERVAL)
+            except queue.Empty:
+                if self._rescan_due():
+                    self.resume()
+                continue
+            try:
+                self._process(job_id, index)
+            except Exception as e:
+                logger.error(f"Batch job {job_id} file {index} failed: {e}", exc_info=True)
+                self._update_item(job_id, index, FAILED, "An internal error occurred")
+
+    def _process(self, job_id, index):
+        job = self._read_job(job_id)
+        if job is None:
+            return  # Deleted while queued
+        options = job["options"]
+        input_lang, output_lang = options["input_lang"], options["output_lang"]
+        with self._job_lock(job_id):
+            if job["status"] == QUEUED:
+                self._set_status(job_id, RUNNING)
+
+        with open(os.path.join(self._job_dir(job_id), "inputs", str(index)), "rb") as file:
+            audio_bytes = file.read()
+        audio_info = get_audio_info(audio_bytes)
+        if audio_info and (audio_info["duration_us"] or 0) > BATCH_MAX_AUDIO_SECONDS * 1_000_000:
+            return self._update_item(job_id, index, FAILED, "Audio is too long")
+
+        timings = {}
+        stage_start_time = time.time()
+        converted_audio = normalize_audio_bytes(audio_bytes)
+        if not converted_audio:
+            return self._update_item(job_id, index, FAILED, "Failed to convert audio file")
+        speech_detected, converted_audio = check_speech(converted_audio)
+        if speech_detected:
+            with self._stage("stt"):
+                transcribed_text = transcribe_audio(converted_audio, input_lang)
+        else:
+            transcribed_text = NO_TEXT_MESSAGE
+        timings["transcription"] = time.time() - stage_start_time
+        if not transcribed_text:
+            return self._update_item(job_id, index, FAILED, "Transcription failed")
+
+        stage_start_time = time.time()
+        if transcribed_text == NO_TEXT_MESSAGE:
+            translated_text = NO_TEXT_MESSAGE
+        else:
+            with self._stage("translate"):
+                translated_text = self._translate(transcribed_text, options["mode"], input_lang, output_lang)
+        timings["translation"] = time.time() - stage_start_time
+        if not translated_text:
+            return self._update_item(job_id, index, FAILED, "Translation failed")
+
+        # The text is saved before TTS runs, so a voice failure cannot lose it
+        result = {"transcribed_text": transcribed_text, "translated_text": translated_text, "voice": False}
+        result_path = os.path.join(self._job_dir(job_id), "results", f"{index}.json")
+        result["timings"] = {stage: round(seconds, 3) for stage, seconds in timings.items()}
+        self._write_json(result_path, result)
+
+        if options.get("synthesize_voice"):
+            stage_start_time = time.time()
+            voice_bytes = self._synthesize(translated_text, options["voice"], output_lang)
+            timings["voice"] = time.time() - stage_start_time
+            if voice_bytes:
+                with open(os.path.join(self._job_dir(job_id), "results", f"{index}.voice"), "wb") as file:
+                    file.write(voice_bytes)
+                result["voice"] = True
+            else:
+                result["voice_error"] = "Voice generation failed"
+            result["timings"] = {stage: round(seconds, 3) for stage, seconds in timings.items()}
+            self._write_json(result_path, result)
+
+        logger.info(f"Batch job {job_id} file {index} done in {sum(timings.values()):.2f} seconds")
+        self._update_item(job_id, index, DONE)
+
+    def _translate(self, text, mode, input_lang, output_lang):
+        """Translates a transcript. Long ones go to Translate as a batch of segments rather than one GPT call."""
+        segments = split_text(text, BATCH_TRANSLATE_SEGMENT_CHARS)
+        if len(segments) <= 1:
+            return translate_transcription(text, mode, input_lang, output_lang)
+        translations = translate_texts(segments, input_lang, output_lang) or [None] * len(segments)
+        # Segments whose batch failed get a second chance with the conversational translator
+        translations = [translation or translate_transcription(segment, mode, input_lang, output_lang)
+                        for segment, translation in zip(segments, translations)]
+        if not all(translations):
+            return None
+        return " ".join(translations)
+
+    def _synthesize(self, text, voice, output_lang):
+        """MP3 of `text`, synthesized in pieces TTS accepts and concatenated. None if any piece fails."""
+        voice_bytes = b""
+        for segment in split_text(text, BATCH_TTS_MAX_CHARS):
+            with self._stage("tts"):
+                segment_voice = synthesize_voice(segment, voice, output_lang)
+            if not segment_voice:
+                return None
+            voice_bytes += segment_voice
+        return voice_bytes
+
+    def _set_status(self, job_id, status):
+        job = self._read_job(job_id)
+        if job is None:
+            return None
+        job["status"] = status
+        job["updated_at"] = time.time()
+        self._write_json(os.path.join(self._job_dir(job_id), "job.json"), job)
+        return job
+
+    def _update_item(self, job_id, index, status, error=None):
+        with self._job_lock(job_id):
+            job = self._read_job(job_id)
+            if job is None:
+                return
+            job["items"][index].update(status=status, error=error)
+            job["updated_at"] = time.time()
+            self._write_json(os.path.join(self._job_dir(job_id), "job.json"), job)
+            finished = all(item["status"] != PENDING for item in job["items"])
+        if finished:
+            self._finish_job(job_id)
+
+    def _finish_job(self, job_id):
+        with self._job_lock(job_id):
+            job = self._set_status(job_id, COMPLETED)
+        self._release(job_id)
+        if job is None:
+            return
+        self._completed[job_id] = job["updated_at"]
+        logger.info(f"Batch job {job_id} completed")
+        callback_url = job["options"].get("callback_url")
+        if callback_url:
+            # Checked again: the job may predate the current allowlist
+            error = callback_url_error(callback_url)
+            if error:
+                logger.warning(f"Not notifying {callback_url} about batch job {job_id}: {error}")
+                return
+            try:
+                # Redirects are not followed, or an allowed host could forward the POST anywhere
+                get_http_session().post(callback_url, json=self.get(job_id), timeout=10, allow_redirects=False)
+            except Exception as e:
+                logger.warning(f"Failed to notify {callback_url} about batch job {job_id}: {e}")
+
+    def stats(self):
+        with self._lock:
+            claimed = list(self._claims)
+        return {"workers": len(self._threads), "queued_files": self._queue.qsize(), "claimed_jobs": claimed,
+                "interactive_in_flight": self._interactive}
+
+    def reset_after_fork(self):
+        # Neither the parent's worker threads nor its job claims belong to the child
+        for lock_file in self._claims.values():
+            lock_file.close()
+        self._init_state()
+
+
+batch_jobs = BatchJobs()
+os.register_at_fork(after_in_child=batch_jobs.reset_after_fork)
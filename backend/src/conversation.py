@@ -1,42 +1,164 @@
+import atexit
 import datetime
+import itertools
 import logging
+import os
+import re
+import threading
 import time
-import google.cloud.firestore as firestore
-from .secret_manager import Credentials  # Adjusted import for the centralized Credentials class
+import uuid
+from .secret_manager import get_credentials
+from .conversation_buffer import ConversationBuffer
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
-credentials = Credentials()  # Instantiate credentials
+credentials = get_credentials()  # Process-wide registry shared by all modules
 
-def delete_all_conversations():
-    db = credentials.get_firestore_client()
-    conversation_collection = db.collection('conversation')
-    docs = conversation_collection.stream()
-    for doc in docs:
-        logger.info(f"Deleting {doc.id}")
-        doc.reference.delete()
-    logger.info("All conversations have been deleted.")
-
-def get_last_three_conversations():
+# Firestore caps a batched write at 500 operations
+FIRESTORE_BATCH_LIMIT = 500
+CONTEXT_TURNS = 3
+
+# Each session keeps its turns in sessions/{session_id}/conversation, so lookups
+# and resets only touch that session's documents
+SESSIONS_COLLECTION = 'sessions'
+DEFAULT_SESSION_ID = 'default'
+_SESSION_ID_PATTERN = re.compile(r'[A-Za-z0-9_-]{1,128}')
+
+def is_valid_session_id(session_id):
+    """Session IDs become Firestore document IDs: letters, digits, "_" and "-" only."""
+    return bool(session_id) and _SESSION_ID_PATTERN.fullmatch(session_id) is not None
+
+def _conversation_collection(db, session_id):
+    return db.collection(SESSIONS_COLLECTION).document(session_id).collection('conversation')
+
+def _write_conversations(entries):
     db = credentials.get_firestore_client()
-    conversation_collection = db.collection('conversation')
+    batch = db.batch()
+    for session_id, entry in entries:
+        data = {key: value for key, value in entry.items() if key != 'id'}
+        batch.set(_conversation_collection(db, session_id).document(entry['id']), data)
+    batch.commit()
+
+conversation_buffer = ConversationBuffer(
+    _write_conversations,
+    max_entries=int(os.environ.get("CONVERSATION_BUFFER_SIZE", 20)),
+    max_sessions=int(os.environ.get("CONVERSATION_SESSIONS", 1000)),
+    batch_size=FIRESTORE_BATCH_LIMIT,
+    flush_interval=float(os.environ.get("CONVERSATION_FLUSH_INTERVAL", 0.5)),
+    # Seconds after which a session's turns are read from Firestore again, in the
+    # background, so turns recorded by the other gunicorn workers join the context
+    max_age=float(os.environ.get("CONVERSATION_CONTEXT_TTL", 30)),
+)
+
+os.register_at_fork(after_in_child=conversation_buffer._reset_after_fork)
+# Give queued turns a chance to reach Firestore when a worker shuts down
+atexit.register(conversation_buffer.flush)
+
+def _new_conversation(text, person_type):
+    return {
+        'id': uuid.uuid4().hex,
+        'text': text,
+        'person_type': person_type,
+        'timestamp': datetime.datetime.now()
+    }
+
+def _query_last_conversations(conversation_collection, count):
+    from google.cloud import firestore
     query = conversation_collection.where('person_type', 'in', ['doctor', 'patient'])
-    results = query.order_by('timestamp', direction=firestore.Query.DESCENDING).limit(3).stream()
+    return query.order_by('timestamp', direction=firestore.Query.DESCENDING).limit(count).stream()
+
+def delete_all_conversations(session_id=DEFAULT_SESSION_ID):
+    """Forgets a session's conversation in this process, then deletes its stored turns in batched writes."""
+    delete_start_time = time.time()
+    conversation_buffer.clear(session_id)
+    db = credentials.get_firestore_client()
+    conversation_collection = _conversation_collection(db, session_id)
+    deleted = 0
+    while True:
+        docs = list(itertools.islice(conversation_collection.list_documents(page_size=FIRESTORE_BATCH_LIMIT), FIRESTORE_BATCH_LIMIT))
+        if not docs:
+            break
+        batch = db.batch()
+        for doc in docs:
+            batch.delete(doc)
+        batch.commit()
+        deleted += len(docs)
+    logger.info(f"All conversations of session {session_id} have been deleted ({deleted} documents in {time.time() - delete_start_time:.2f} seconds).")
+
+def _read_conversations(session_id):
+    db = credentials.get_firestore_client()
     conversations = []
-    for doc in results:
+    for doc in _query_last_conversations(_conversation_collection(db, session_id), conversation_buffer.max_entries):
         data = doc.to_dict()
         data['id'] = doc.id
         conversations.insert(0, data)
     return conversations
 
-def add_conversation(text, person_type):
-    db = credentials.get_firestore_client()
-    conversation_collection = db.collection('conversation')
-    document_data = {
-        'text': text,
-        'person_type': person_type,
-        'timestamp': datetime.datetime.now()
-    }
-    doc_ref = conversation_collection.add(document_data)
-    logger.info(f"Added new conversation with ID: {doc_ref[1].id}")
+def _refresh_conversations(session_id):
+    try:
+        conversation_buffer.hydrate(session_id, _read_conversations(session_id))
+    except Exception as e:
+        conversation_buffer.end_refresh(session_id)
+        logger.error(f"Failed to refresh the conversation of session {session_id}: {e}")
+
+def _refresh_if_stale(session_id):
+    # The turns in memory are served meanwhile; the refreshed ones are used from the next turn on
+    if conversation_buffer.claim_refresh(session_id):
+        threading.Thread(target=_refresh_conversations, args=(session_id,), daemon=True).start()
+
+def get_last_three_conversations(session_id=DEFAULT_SESSION_ID):
+    """A session's last three turns, oldest first.
+
+    Served from memory. Firestore is read on a session's first use in this process,
+    and again in the background once that read is CONVERSATION_CONTEXT_TTL seconds old.
+    """
+    if not conversation_buffer.hydrated(session_id):
+        conversation_buffer.hydrate(session_id, _read_conversations(session_id))
+    else:
+        _refresh_if_stale(session_id)
+    return conversation_buffer.recent(session_id, CONTEXT_TURNS)
+
+def add_conversation(text, person_type, session_id=DEFAULT_SESSION_ID):
+    """Records a turn. It is readable at once and written to Firestore in the background."""
+    conversation = _new_conversation(text, person_type)
+    conversation_buffer.append(session_id, conversation)
+    logger.info(f"Added new conversation with ID: {conversation['id']} to session {session_id}")
+
+async def delete_all_conversations_async(session_id=DEFAULT_SESSION_ID):
+    delete_start_time = time.time()
+    conversation_buffer.clear(session_id)
+    db = credentials.get_async_firestore_client()
+    conversation_collection = _conversation_collection(db, session_id)
+    deleted = 0
+    while True:
+        docs = []
+        async for doc in conversation_collection.list_documents(page_size=FIRESTORE_BATCH_LIMIT):
+            docs.append(doc)
+            if len(docs) == FIRESTORE_BATCH_LIMIT:
+                break
+        if not docs:
+            break
+        batch = db.batch()
+        for doc in docs:
+            batch.delete(doc)
+        await batch.commit()
+        deleted += len(docs)
+    logger.info(f"All conversations of session {session_id} have been deleted ({deleted} documents in {time.time() - delete_start_time:.2f} seconds).")
+
+async def get_last_three_conversations_async(session_id=DEFAULT_SESSION_ID):
+    if not conversation_buffer.hydrated(session_id):
+        db = credentials.get_async_firestore_client()
+        conversations = []
+        async for doc in _query_last_conversations(_conversation_collection(db, session_id), conversation_buffer.max_entries):
+            data = doc.to_dict()
+            data['id'] = doc.id
+            conversations.insert(0, data)
+        conversation_buffer.hydrate(session_id, conversations)
+    else:
+        _refresh_if_stale(session_id)
+    return conversation_buffer.recent(session_id, CONTEXT_TURNS)
+
+async def add_conversation_async(text, person_type, session_id=DEFAULT_SESSION_ID):
+    # Appending never blocks, so the async app shares the sync write-behind path
+    add_conversation(text, person_type, session_id)
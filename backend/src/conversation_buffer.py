@@ -0,0 +1,193 @@
+import itertools
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+class ConversationBuffer:
+    """Per-process ring buffers of recent conversation turns, one per session, with write-behind persistence.
+
+    Reads are served from memory. Appended turns are queued and handed to `write`
+    as (session_id, turn) pairs in batches by one background thread, so persisting
+    them never adds a round trip to a request. A session's buffer starts out empty
+    in a new process; call `hydrate` with its stored turns before the first read so
+    context survives restarts. Other processes (gunicorn workers) add turns to the
+    same sessions, so once a session was read `max_age` seconds ago `claim_refresh`
+    hands out one refresh: the caller keeps serving the turns in memory and hydrates
+    the session again off the request path. None trusts the first read for good,
+    which only suits a single process. At most `max_sessions` sessions are kept; the
+    least recently used is dropped and hydrated again if it comes back.
+    """
+
+    def __init__(self, write, max_entries=20, max_sessions=1000, batch_size=100, flush_interval=0.5, max_attempts=3,
+                 max_age=None):
+        self.write = write
+        self.max_entries = max_entries
+        self.max_sessions = max_sessions
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+        self.max_age = max_age
+        self._init_state()
+
+    def _init_state(self):
+        self._sessions = OrderedDict()  # session_id -> deque of turns
+        self._hydrated_at = {}  # session_id -> when its stored turns were last read
+        self._refreshing = {}  # session_id -> turns appended here since its refresh was claimed
+        self._pending = deque()  # (session_id, attempts, turn)
+        self._writing = []  # The batch being written, same shape as _pending
+        self._condition = threading.Condition()
+        self._flush_lock = threading.Lock()  # Held while a batch is being written; taken before _condition
+        self._writer = None
+
+    def hydrated(self, session_id):
+        with self._condition:
+            return session_id in self._sessions
+
+    def claim_refresh(self, session_id):
+        """True if the session was read `max_age` seconds ago or more and no refresh is under way.
+
+        The caller must then hydrate the session with freshly read turns, or call
+        end_refresh if reading them failed.
+        """
+        with self._condition:
+            if self.max_age is None or session_id not in self._sessions or session_id in self._refreshing:
+                return False
+            if time.time() - self._hydrated_at.get(session_id, 0) < self.max_age:
+                return False
+            self._refreshing[session_id] = []
+            return True
+
+    def end_refresh(self, session_id):
+        """Gives up a refresh claimed with claim_refresh; the session is read again once claimed anew."""
+        with self._condition:
+            self._refreshing.pop(session_id, None)
+
+    def _session(self, session_id):
+        entries = self._sessions.get(session_id)
+        if entries is None:
+            entries = self._sessions[session_id] = deque(maxlen=self.max_entries)
+            while len(self._sessions) > self.max_sessions:
+                evicted_session_id, _ = self._sessions.popitem(last=False)
+                self._hydrated_at.pop(evicted_session_id, None)
+        self._sessions.move_to_end(session_id)
+        return entries
+
+    def hydrate(self, session_id, entries):
+        """Seeds a session with its stored turns (oldest first) unless it was already seeded.
+
+        A session whose refresh was claimed has its turns replaced instead.
+        """
+        with self._condition:
+            appended_meanwhile = self._refreshing.pop(session_id, None)
+            if session_id in self._sessions and appended_meanwhile is None:
+                return
+            session = self._session(session_id)
+            session.clear()
+            session.extend(entries)
+            # Turns appended since the read began, or still waiting for (or in) the writer,
+            # may not be in what was read
+            seen_ids = {entry.get('id') for entry in session}
+            unsent = [entry for unsent_session_id, _, entry in itertools.chain(self._writing, self._pending)
+                      if unsent_session_id == session_id]
+            unsent_ids = {entry.get('id') for entry in unsent}
+            # Those already written went out before the ones still queued
+            written_meanwhile = [entry for entry in appended_meanwhile or [] if entry.get('id') not in unsent_ids]
+            for entry in itertools.chain(written_meanwhile, unsent):
+                if entry.get('id') not in seen_ids:
+                    seen_ids.add(entry.get('id'))
+                    session.append(entry)
+            self._hydrated_at[session_id] = time.time()
+
+    def recent(self, session_id, count=3):
+        """The last `count` turns of a session, oldest first."""
+        with self._condition:
+            entries = self._sessions.get(session_id)
+            if not entries or not count:
+                return []
+            self._sessions.move_to_end(session_id)
+            return list(entries)[-count:]
+
+    def append(self, session_id, entry):
+        """Adds a turn to a session and queues it for the next batched write."""
+        with self._condition:
+            self._session(session_id).append(entry)
+            if session_id in self._refreshing:
+                self._refreshing[session_id].append(entry)
+            self._pending.append((session_id, 1, entry))
+            self._ensure_writer()
+            self._condition.notify()
+
+    def clear(self, session_id):
+        """Empties a session and drops its queued writes, waiting for a batch already in flight.
+
+        On return no earlier turn of the session can still land in storage, so the
+        caller can delete the stored turns.
+        """
+        with self._flush_lock, self._condition:
+            self._sessions.pop(session_id, None)
+            self._session(session_id)
+            self._hydrated_at[session_id] = time.time()
+            self._refreshing.pop(session_id, None)  # A refresh under way may have read the turns being deleted
+            self._pending = deque(item for item in self._pending if item[0] != session_id)
+
+    def flush(self, timeout=5.0):
+        """Waits until every queued turn has been written. Returns False on timeout."""
+        deadline = time.time() + timeout
+        with self._condition:
+            while self._pending:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+        with self._flush_lock:
+            return True
+
+    def _ensure_writer(self):
+        if self._writer is None or not self._writer.is_alive():
+            self._writer = threading.Thread(target=self._run, daemon=True)
+            self._writer.start()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending:
+                    self._condition.wait()
+                # Give the rest of a burst a moment to join the batch
+                if len(self._pending) < self.batch_size:
+                    self._condition.wait(self.flush_interval)
+
+            with self._flush_lock:
+                with self._condition:
+                    batch = [self._pending.popleft() for _ in range(min(self.batch_size, len(self._pending)))]
+                    self._writing = batch
+                written = self._write_batch(batch)
+                with self._condition:
+                    self._writing = []
+                    self._condition.notify_all()
+            if not written:
+                time.sleep(self.flush_interval)
+
+    def _write_batch(self, batch):
+        if not batch:
+            return True
+        write_start_time = time.time()
+        try:
+            self.write([(session_id, entry) for session_id, _, entry in batch])
+            logger.info(f"Wrote {len(batch)} conversation turns in {time.time() - write_start_time:.2f} seconds")
+            return True
+        except Exception as e:
+            retries = [(session_id, attempts + 1, entry) for session_id, attempts, entry in batch if attempts < self.max_attempts]
+            logger.error(f"Failed to write {len(batch)} conversation turns, retrying {len(retries)}: {e}")
+            with self._condition:
+                self._pending.extendleft(reversed(retries))
+            return False
+
+    def _reset_after_fork(self):
+        # The writer thread does not survive a fork and its locks may be held; the child
+        # starts empty and hydrates from storage like any new process
+        self._init_state()
@@ -0,0 +1,105 @@
+import logging
+from collections import deque
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+DENTAL_TERMS = (
+    "Invisalign", "braces", "crown", "filling", "implant", "root canal", "veneer", "whitening", "x-ray",
+    "extraction", "fluoride", "gum disease", "orthodontist", "periodontist", "prosthodontist", "endodontist",
+    "pedodontist", "oral surgeon", "dental hygienist", "dental assistant", "dental laboratory technician",
+    "dental therapist", "dental technician", "dental prosthetist", "dental public health", "forensic odontology",
+    "geriatric dentistry", "oral medicine", "oral pathology", "oral and maxillofacial radiology",
+    "oral and maxillofacial surgery", "orthodontics and dentofacial orthopedics", "pediatric dentistry",
+    "periodontics", "prosthodontics", "dental anatomy", "dental materials", "dental morphology", "dental occlusion",
+    "dental plaque", "dental restoration", "dental surgery", "dental trauma", "dental caries", "dental cavities",
+    "dental erosion", "dental fluorosis", "dental calculus", "dental pulp", "dental pulp cavity", "dental pulp test",
+    "dental radiography", "dental sealant", "dental treatment", "dental x-ray", "dental abscess", "dental alveolus",
+    "dental amalgam", "dental arch", "dental attrition", "dental avulsion", "dental braces", "dental bridge",
+    "dental cavity", "dental cement", "dental crown", "dental cyst", "dental extraction", "dental floss",
+    "dental impression", "dental laboratory", "dental malocclusion",
+)
+
+
+class TermMatcher:
+    """Aho-Corasick automaton that finds which glossary terms a text mentions in one pass.
+
+    Each term is matched by its full (case-insensitive) phrase, and "dental X" terms
+    also by X alone, so "the plaque" surfaces "dental plaque". A match must start on a
+    word boundary and end on one, optionally after a plural "s"/"es".
+    """
+
+    def __init__(self, terms):
+        self.terms = tuple(dict.fromkeys(terms))
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]  # node -> [(pattern length, term index)]
+
+        for index, term in enumerate(self.terms):
+            for pattern in self._patterns(term):
+                self._add(pattern, index)
+        self._build_failure_links()
+
+    @staticmethod
+    def _patterns(term):
+        pattern = term.casefold()
+        patterns = [pattern]
+        if pattern.startswith("dental ") and len(pattern) > len("dental "):
+            patterns.append(pattern[len("dental "):])
+        return patterns
+
+    def _add(self, pattern, index):
+        node = 0
+        for char in pattern:
+            if char not in self._goto[node]:
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+                self._goto[node][char] = len(self._goto) - 1
+            node = self._goto[node][char]
+        self._output[node].append((len(pattern), index))
+
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(char, 0)
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def find(self, text):
+        """Returns the glossary terms mentioned in `text`, in glossary order."""
+        text = text.casefold()
+        found = set()
+        node = 0
+        for position, char in enumerate(text):
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+            for length, index in self._output[node]:
+                start = position - length + 1
+                if start > 0 and text[start - 1].isalnum():
+                    continue
+                if self._ends_word(text, position + 1):
+                    found.add(index)
+        return [self.terms[index] for index in sorted(found)]
+
+    @staticmethod
+    def _ends_word(text, end):
+        for suffix in ("", "s", "es"):
+            after = end + len(suffix)
+            if text.startswith(suffix, end) and (after >= len(text) or not text[after].isalnum()):
+                return True
+        return False
+
+
+dental_term_matcher = TermMatcher(DENTAL_TERMS)
+
+
+def relevant_dental_terms(text):
+    """Dental glossary terms that `text` mentions."""
+    return dental_term_matcher.find(text)
@@ -0,0 +1,174 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Hedged speech-to-text: if the primary provider has not answered within the
+# STT_HEDGE_PERCENTILE of its recent latencies, the next provider is asked as
+# well and the first usable transcript wins
+STT_HEDGING = os.environ.get("STT_HEDGING", "false").lower() == "true"
+STT_HEDGE_PERCENTILE = float(os.environ.get("STT_HEDGE_PERCENTILE", 95))
+STT_HEDGE_MIN_DELAY = float(os.environ.get("STT_HEDGE_MIN_DELAY", 0.3))
+STT_HEDGE_MAX_DELAY = float(os.environ.get("STT_HEDGE_MAX_DELAY", 5.0))
+STT_HEDGE_TIMEOUT = float(os.environ.get("STT_HEDGE_TIMEOUT", 60))
+STT_HEDGE_WORKERS = int(os.environ.get("STT_HEDGE_WORKERS", 16))
+
+LATENCY_WINDOW = 200
+MIN_LATENCY_SAMPLES = 20  # Below this the percentile is noise; use the default delay
+DEFAULT_HEDGE_DELAY = 1.5
+
+
+class ProviderStats:
+    """Rolling latencies and outcome counters of one provider."""
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self.latencies = deque(maxlen=window)
+        self.calls = 0
+        self.wins = 0
+        self.failures = 0
+        self.abandoned = 0  # Finished after another provider had already won
+
+    def percentile(self, percentile):
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, int(round(percentile / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def to_dict(self):
+        return {
+            "calls": self.calls, "wins": self.wins, "failures": self.failures, "abandoned": self.abandoned,
+            "p50": _rounded(self.percentile(50)), "p95": _rounded(self.percentile(95)), "p99": _rounded(self.percentile(99)),
+        }
+
+
+def _rounded(value):
+    return None if value is None else round(value, 3)
+
+
+class HedgedTranscriber:
+    """Runs a transcription on the first provider and hedges onto the next ones when it is slow or fails.
+
+    `providers` maps a name to (transcribe, accepts): transcribe(audio_bytes, input_lang)
+    returns a transcript or None, and accepts(audio_info) says whether the provider can
+    take the upload at all. `registry` (a ProviderRegistry) orders the providers and is
+    told every outcome, including those of the losers. Provider calls are blocking HTTP
+    requests, so a loser that has already started cannot be interrupted: it is cancelled
+    if still queued, and otherwise left to finish with its result discarded.
+    """
+
+    def __init__(self, providers, registry, percentile=STT_HEDGE_PERCENTILE, min_delay=STT_HEDGE_MIN_DELAY,
+                 max_delay=STT_HEDGE_MAX_DELAY, timeout=STT_HEDGE_TIMEOUT, max_workers=STT_HEDGE_WORKERS):
+        self.providers = providers
+        self.registry = registry
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.timeout = timeout
+        self.max_workers = max_workers
+        self.hedges = 0
+        self._stats = {name: ProviderStats() for name in self.providers}
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="stt-hedge")
+            return self._executor
+
+    def hedge_delay(self, name):
+        """How long to wait on `name` before asking the next provider."""
+        with self._lock:
+            stats = self._stats[name]
+            delay = stats.percentile(self.percentile) if len(stats.latencies) >= MIN_LATENCY_SAMPLES else DEFAULT_HEDGE_DELAY
+        return min(self.max_delay, max(self.min_delay, delay))
+
+    def _call(self, name, audio_bytes, input_lang):
+        start_time = time.time()
+        try:
+            transcript = self.providers[name][0](audio_bytes, input_lang)
+        except Exception as e:
+            logger.error(f"STT provider {name} raised: {e}", exc_info=True)
+            transcript = None
+        latency = time.time() - start_time
+        with self._lock:
+            stats = self._stats[name]
+            stats.calls += 1
+            if transcript is None:
+                stats.failures += 1
+            else:
+                stats.latencies.append(latency)
+        self.registry.record(name, input_lang, latency, transcript is not None)
+        return name, transcript, latency
+
+    def transcribe(self, audio_bytes, input_lang, audio_info=None):
+        """First usable transcript from the configured providers, or None if every one failed."""
+        candidates = self.registry.rank(input_lang, [name for name in self.registry.providers
+                                                     if name in self.providers and self.providers[name][1](audio_info)])
+        if not candidates:
+            logger.error("No STT provider accepts this upload")
+            return None
+
+        executor = self._get_executor()
+        deadline = time.time() + self.timeout
+        pending = {}
+        winner = None
+
+        def launch(name):
+            pending[executor.submit(self._call, name, audio_bytes, input_lang)] = name
+
+        launch(candidates.pop(0))
+        while pending and winner is None:
+            # Hedge once the newest request has had its percentile delay (or straight away if it failed)
+            newest = list(pending.values())[-1]
+            wait_for = self.hedge_delay(newest) if candidates else deadline - time.time()
+            done, _ = wait(pending, timeout=max(0.0, min(wait_for, deadline - time.time())), return_when=FIRST_COMPLETED)
+            for future in done:
+                name, transcript, latency = future.result()
+                del pending[future]
+                if transcript is not None and winner is None:
+                    winner = (name, transcript, latency)
+            if winner is None and candidates and (not done or not pending):
+                hedged = candidates.pop(0)
+                with self._lock:
+                    self.hedges += 1
+                logger.info(f"Hedging STT onto {hedged} after waiting on {', '.join(pending.values()) or 'a failed provider'}")
+                launch(hedged)
+            elif winner is None and not done and time.time() >= deadline:
+                break
+
+        for future, name in pending.items():
+            if future.cancel():
+                self.registry.release(name)
+            else:
+                future.add_done_callback(lambda _, name=name: self._abandoned(name))
+        if winner is None:
+            logger.error("Every STT provider failed")
+            return None
+        name, transcript, latency = winner
+        with self._lock:
+            self._stats[name].wins += 1
+        logger.info(f"STT won by {name} in {latency:.2f} seconds")
+        return transcript
+
+    def _abandoned(self, name):
+        with self._lock:
+            self._stats[name].abandoned += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "enabled": STT_HEDGING, "percentile": self.percentile, "hedges": self.hedges,
+                "providers": {name: stats.to_dict() for name, stats in self._stats.items()},
+            }
+
+    def reset_after_fork(self):
+        # The parent's worker threads do not exist in the child
+        self._lock = threading.Lock()
+        self._executor = None
@@ -0,0 +1,117 @@
+import importlib.util
+import logging
+import os
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+import httpx
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Shared connection pools for every REST provider call. Reusing connections
+# means only the first request to a host pays the TCP+TLS handshake.
+HTTP_POOL_SIZE = int(os.environ.get("HTTP_POOL_SIZE", 20))
+HTTP_KEEPALIVE_EXPIRY = float(os.environ.get("HTTP_KEEPALIVE_EXPIRY", 120))
+HTTP_TIMEOUT = float(os.environ.get("HTTP_TIMEOUT", 60))
+HTTP2 = os.environ.get("HTTP2", "false").lower() == "true"
+
+# Hosts worth connecting to before the first utterance
+PREWARM_URLS = {
+    "openai": "https://api.openai.com/v1/models",
+    "elevenlabs": "https://api.elevenlabs.io/v1/models",
+    "deepgram": "https://api.deepgram.com/v1/listen",
+}
+
+_lock = threading.Lock()
+_session = None
+_httpx_client = None
+_async_httpx_client = None
+
+
+def _http2_enabled():
+    if HTTP2 and not importlib.util.find_spec("h2"):
+        logger.warning("HTTP2=true but the h2 package is not installed; using HTTP/1.1")
+        return False
+    return HTTP2
+
+
+def _limits():
+    return httpx.Limits(max_connections=HTTP_POOL_SIZE, max_keepalive_connections=HTTP_POOL_SIZE,
+                        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY)
+
+
+class _TimeoutHTTPAdapter(HTTPAdapter):
+    """Applies HTTP_TIMEOUT to requests made without a timeout, which requests would otherwise wait on forever."""
+
+    def send(self, request, timeout=None, **kwargs):
+        return super().send(request, timeout=HTTP_TIMEOUT if timeout is None else timeout, **kwargs)
+
+
+def get_http_session():
+    """Process-wide requests.Session with a keep-alive pool (used for Eleven Labs and Deepgram).
+
+    Calls without a timeout get HTTP_TIMEOUT, like the httpx clients.
+    """
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = _TimeoutHTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+
+def get_httpx_client():
+    """Process-wide httpx.Client with a keep-alive pool (handed to the OpenAI SDK)."""
+    global _httpx_client
+    if _httpx_client is None:
+        with _lock:
+            if _httpx_client is None:
+                _httpx_client = httpx.Client(limits=_limits(), http2=_http2_enabled(), timeout=HTTP_TIMEOUT)
+    return _httpx_client
+
+
+def get_async_httpx_client():
+    """Process-wide httpx.AsyncClient for the ASGI app. Must be first used inside its event loop."""
+    global _async_httpx_client
+    if _async_httpx_client is None:
+        with _lock:
+            if _async_httpx_client is None:
+                _async_httpx_client = httpx.AsyncClient(limits=_limits(), http2=_http2_enabled(), timeout=HTTP_TIMEOUT)
+    return _async_httpx_client
+
+
+def prewarm_connections(providers=None):
+    """Opens pooled connections to the provider hosts so the next real call skips the handshake.
+
+    Any response (even 401) leaves a live keep-alive connection in the pool.
+    """
+    for provider in PREWARM_URLS if providers is None else providers:
+        url = PREWARM_URLS.get(provider)
+        if not url:
+            continue
+        prewarm_start_time = time.time()
+        try:
+            if provider == "openai":
+                get_httpx_client().head(url, timeout=5)
+            else:
+                get_http_session().head(url, timeout=5)
+            logger.info(f"Pre-warmed connection to {provider} in {time.time() - prewarm_start_time:.2f} seconds")
+        except Exception as e:
+            logger.warning(f"Failed to pre-warm connection to {provider}: {e}")
+
+
+def _reset_after_fork():
+    # Pooled sockets belong to the parent; the child opens its own
+    global _lock, _session, _httpx_client, _async_httpx_client
+    _lock = threading.Lock()
+    _session = None
+    _httpx_client = None
+    _async_httpx_client = None
+
+os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,103 @@
+import logging
+import subprocess
+import time
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Formats a client can ask synthesized speech to be delivered in
+OUTPUT_MIMETYPES = {
+    "mp3": "audio/mpeg",
+    "opus": "audio/ogg",
+    "aac": "audio/aac",
+    "flac": "audio/flac",
+    "wav": "audio/wav",
+    "pcm": "audio/L16",  # Raw 16-bit little-endian mono samples
+}
+
+OPENAI_RESPONSE_FORMATS = {"mp3", "opus", "aac", "flac", "wav", "pcm"}
+OPENAI_PCM_SAMPLE_RATE = 24000
+
+ELEVEN_LABS_MP3 = {(22050, 32), (44100, 32), (44100, 64), (44100, 96), (44100, 128), (44100, 192)}
+ELEVEN_LABS_PCM_SAMPLE_RATES = {16000, 22050, 24000, 44100}
+ELEVEN_LABS_OPUS_BITRATES = {32, 64, 96, 128, 192}
+ELEVEN_LABS_DEFAULT_SAMPLE_RATE = 44100
+ELEVEN_LABS_DEFAULT_BITRATE = 128
+
+FFMPEG_CODECS = {
+    "mp3": ['-c:a', 'libmp3lame', '-f', 'mp3'],
+    "opus": ['-c:a', 'libopus', '-application', 'voip', '-f', 'ogg'],
+    "aac": ['-c:a', 'aac', '-f', 'adts'],
+    "flac": ['-c:a', 'flac', '-f', 'flac'],
+    "wav": ['-c:a', 'pcm_s16le', '-f', 'wav'],
+    "pcm": ['-c:a', 'pcm_s16le', '-f', 's16le'],
+}
+
+
+def parse_output_format(output_format=None, bitrate=None, sample_rate=None):
+    """Validates a client's requested output format. Returns None for the default (provider MP3).
+
+    `bitrate` is in kbit/s and `sample_rate` in Hz. Raises ValueError for anything
+    that cannot be delivered.
+    """
+    output_format = (output_format or "mp3").lower()
+    if output_format not in OUTPUT_MIMETYPES:
+        raise ValueError(f"Unsupported output_format: {output_format}")
+    bitrate = int(bitrate) if bitrate else None
+    sample_rate = int(sample_rate) if sample_rate else None
+    if bitrate is not None and not 8 <= bitrate <= 320:
+        raise ValueError(f"Unsupported bitrate: {bitrate}")
+    if sample_rate is not None and not 8000 <= sample_rate <= 48000:
+        raise ValueError(f"Unsupported sample_rate: {sample_rate}")
+    if output_format == "mp3" and bitrate is None and sample_rate is None:
+        return None
+    return {"format": output_format, "bitrate": bitrate, "sample_rate": sample_rate}
+
+
+def output_mimetype(spec):
+    return OUTPUT_MIMETYPES[spec["format"] if spec else "mp3"]
+
+
+def openai_response_format(spec):
+    """The OpenAI response_format that yields `spec` directly, or None if it needs a local transcode."""
+    if spec is None:
+        return "mp3"
+    if spec["bitrate"] is not None or spec["format"] not in OPENAI_RESPONSE_FORMATS:
+        return None
+    if spec["sample_rate"] is not None and not (spec["format"] == "pcm" and spec["sample_rate"] == OPENAI_PCM_SAMPLE_RATE):
+        return None
+    return spec["format"]
+
+
+def eleven_labs_output_format(spec):
+    """The Eleven Labs output_format that yields `spec` directly, or None if it needs a local transcode."""
+    if spec is None:
+        return None  # Provider default (MP3)
+    output_format, bitrate, sample_rate = spec["format"], spec["bitrate"], spec["sample_rate"]
+    if output_format == "mp3":
+        candidate = (sample_rate or ELEVEN_LABS_DEFAULT_SAMPLE_RATE, bitrate or ELEVEN_LABS_DEFAULT_BITRATE)
+        return f"mp3_{candidate[0]}_{candidate[1]}" if candidate in ELEVEN_LABS_MP3 else None
+    if output_format == "pcm" and bitrate is None and (sample_rate or 24000) in ELEVEN_LABS_PCM_SAMPLE_RATES:
+        return f"pcm_{sample_rate or 24000}"
+    if output_format == "opus" and sample_rate in (None, 48000) and (bitrate or 64) in ELEVEN_LABS_OPUS_BITRATES:
+        return f"opus_48000_{bitrate or 64}"
+    return None
+
+
+def transcode(audio_bytes, spec, input_args=()):
+    """Converts synthesized audio to `spec` with FFmpeg. `input_args` describe headerless input. Returns None on failure."""
+    transcode_start_time = time.time()
+    command = ['ffmpeg', '-v', 'error', *input_args, '-i', 'pipe:0', '-ac', '1']
+    if spec["sample_rate"]:
+        command += ['-ar', str(spec["sample_rate"])]
+    if spec["bitrate"] and spec["format"] not in ("wav", "pcm", "flac"):
+        command += ['-b:a', f'{spec["bitrate"]}k']
+    command += [*FFMPEG_CODECS[spec["format"]], 'pipe:1']
+
+    try:
+        result = subprocess.run(command, input=bytes(audio_bytes), check=True, capture_output=True)
+    except (OSError, subprocess.CalledProcessError) as e:
+        logger.error(f"Failed to transcode voice to {spec}: {getattr(e, 'stderr', e)}")
+        return None
+    logger.info(f"Voice transcoded to {spec['format']} in {time.time() - transcode_start_time:.2f} seconds.")
+    return result.stdout
@@ -0,0 +1,184 @@
+import io
+import logging
+import os
+import struct
+import wave
+import numpy as np
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+TARGET_SAMPLE_RATE = 16000
+
+# Same threshold as the ffmpeg silenceremove filter this replaces
+SILENCE_THRESHOLD_DB = -50.0
+SILENCE_FRAME_SECONDS = 0.02
+SILENCE_PADDING_SECONDS = 0.1
+
+# Voice activity detection: a frame counts as speech when it is louder than
+# VAD_THRESHOLD_DB and its zero-crossing rate is not that of hiss or clicks, or
+# when it is far louder than the threshold (fricatives cross zero often)
+VAD_ENABLED = os.environ.get("VAD_ENABLED", "true").lower() == "true"
+VAD_THRESHOLD_DB = float(os.environ.get("VAD_THRESHOLD_DB", -45))
+VAD_MIN_SPEECH_SECONDS = float(os.environ.get("VAD_MIN_SPEECH_SECONDS", 0.25))
+VAD_MAX_ZERO_CROSSING_RATE = 0.35
+VAD_LOUD_MARGIN_DB = 15
+
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+def is_wav(audio_bytes):
+    return len(audio_bytes) >= 12 and bytes(audio_bytes[:4]) == b"RIFF" and bytes(audio_bytes[8:12]) == b"WAVE"
+
+
+def decode_wav(audio_bytes):
+    """Decodes a PCM or float WAV into float32 samples shaped (frames, channels) in [-1, 1].
+
+    Returns (samples, sample_rate), or None if the data is not a WAV this can decode.
+    """
+    data = memoryview(audio_bytes)
+    if not is_wav(data):
+        return None
+
+    fmt = None
+    pcm = None
+    offset = 12
+    while offset + 8 <= len(data):
+        chunk_id = bytes(data[offset:offset + 4])
+        chunk_size = struct.unpack_from("<I", data, offset + 4)[0]
+        body = data[offset + 8:offset + 8 + chunk_size]
+        if chunk_id == b"fmt ":
+            fmt = body
+        elif chunk_id == b"data":
+            # Streamed WAVs leave the size at 0 (or 0xFFFFFFFF); the samples run to the end
+            pcm = data[offset + 8:] if chunk_size == 0 else body
+            break
+        offset += 8 + chunk_size + (chunk_size & 1)  # Chunks are word aligned
+
+    if fmt is None or pcm is None or len(fmt) < 16:
+        return None
+    format_tag, channels, sample_rate, _, block_align, bits = struct.unpack_from("<HHIIHH", fmt)
+    if format_tag == WAVE_FORMAT_EXTENSIBLE and len(fmt) >= 26:
+        format_tag = struct.unpack_from("<H", fmt, 24)[0]  # First two bytes of the sub-format GUID
+    if not channels or not sample_rate or block_align != channels * bits // 8:
+        return None
+
+    # A truncated upload may end mid-frame
+    pcm = pcm[:len(pcm) - len(pcm) % block_align]
+    if format_tag == WAVE_FORMAT_IEEE_FLOAT and bits in (32, 64):
+        samples = np.frombuffer(pcm, dtype=f"<f{bits // 8}").astype(np.float32)
+    elif format_tag == WAVE_FORMAT_PCM and bits == 8:
+        samples = (np.frombuffer(pcm, dtype=np.uint8).astype(np.float32) - 128) / 128
+    elif format_tag == WAVE_FORMAT_PCM and bits in (16, 32):
+        samples = np.frombuffer(pcm, dtype=f"<i{bits // 8}").astype(np.float32) / 2 ** (bits - 1)
+    elif format_tag == WAVE_FORMAT_PCM and bits == 24:
+        raw = np.frombuffer(pcm, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        samples = ((raw[:, 0] | raw[:, 1] << 8 | raw[:, 2] << 16) << 8 >> 8).astype(np.float32) / 2 ** 23
+    else:
+        logger.info(f"Unsupported WAV encoding: format {format_tag:#x}, {bits} bits")
+        return None
+    return samples.reshape(-1, channels), sample_rate
+
+
+def downmix(samples):
+    """Averages the channels of (frames, channels) samples into one."""
+    return samples.mean(axis=1) if samples.shape[1] > 1 else samples[:, 0]
+
+
+def resample(samples, sample_rate, target_rate=TARGET_SAMPLE_RATE):
+    """Band-limited resampling of mono samples by zero-padding or truncating their spectrum."""
+    if sample_rate == target_rate or not len(samples):
+        return samples
+    target_length = int(round(len(samples) * target_rate / sample_rate))
+    if not target_length:
+        return np.empty(0, dtype=np.float32)
+    spectrum = np.fft.rfft(samples)
+    target_bins = target_length // 2 + 1
+    if target_bins <= len(spectrum):
+        spectrum = spectrum[:target_bins]
+    else:
+        spectrum = np.concatenate([spectrum, np.zeros(target_bins - len(spectrum), dtype=spectrum.dtype)])
+    return (np.fft.irfft(spectrum, target_length) * (target_length / len(samples))).astype(np.float32)
+
+
+def frame_levels(samples, sample_rate, frame_seconds=SILENCE_FRAME_SECONDS):
+    """RMS level in dBFS of each consecutive frame of mono samples."""
+    frame_length = max(1, int(sample_rate * frame_seconds))
+    frames = len(samples) // frame_length
+    if not frames:
+        return np.empty(0, dtype=np.float32)
+    framed = samples[:frames * frame_length].reshape(frames, frame_length)
+    rms = np.sqrt(np.mean(np.square(framed, dtype=np.float64), axis=1))
+    return 20 * np.log10(np.maximum(rms, 1e-10))
+
+
+def frame_zero_crossing_rates(samples, sample_rate, frame_seconds=SILENCE_FRAME_SECONDS):
+    """Fraction of sample pairs in each consecutive frame whose signs differ."""
+    frame_length = max(2, int(sample_rate * frame_seconds))
+    frames = len(samples) // frame_length
+    if not frames:
+        return np.empty(0, dtype=np.float32)
+    signs = np.signbit(samples[:frames * frame_length].reshape(frames, frame_length))
+    return np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / (frame_length - 1)
+
+
+def speech_seconds(samples, sample_rate, threshold_db=VAD_THRESHOLD_DB):
+    """Seconds of mono samples that an energy and zero-crossing detector classifies as speech."""
+    levels = frame_levels(samples, sample_rate)
+    crossings = frame_zero_crossing_rates(samples, sample_rate)
+    frames = min(len(levels), len(crossings))
+    levels, crossings = levels[:frames], crossings[:frames]
+    speech = (levels > threshold_db) & ((crossings < VAD_MAX_ZERO_CROSSING_RATE) | (levels > threshold_db + VAD_LOUD_MARGIN_DB))
+    return np.count_nonzero(speech) * SILENCE_FRAME_SECONDS
+
+
+def contains_speech(audio_bytes, min_seconds=VAD_MIN_SPEECH_SECONDS):
+    """False only when `audio_bytes` is a WAV with less than `min_seconds` of speech.
+
+    Audio this cannot decode is given the benefit of the doubt. Compressed
+    containers go through audio_processing.contains_speech, which decodes them first.
+    """
+    if not VAD_ENABLED:
+        return True
+    decoded = decode_wav(audio_bytes)
+    if decoded is None:
+        logger.info("Voice activity check skipped: not a WAV this can decode")
+        return True
+    samples, sample_rate = decoded
+    return speech_seconds(downmix(samples), sample_rate) >= min_seconds
+
+
+def trim_silence(samples, sample_rate, threshold_db=SILENCE_THRESHOLD_DB, padding=SILENCE_PADDING_SECONDS):
+    """Drops leading and trailing audio quieter than `threshold_db`, keeping `padding` seconds around speech."""
+    frame_length = max(1, int(sample_rate * SILENCE_FRAME_SECONDS))
+    voiced = np.flatnonzero(frame_levels(samples, sample_rate) > threshold_db)
+    if not len(voiced):
+        return samples[:0]
+    pad = int(sample_rate * padding)
+    start = max(0, voiced[0] * frame_length - pad)
+    end = min(len(samples), (voiced[-1] + 1) * frame_length + pad)
+    return samples[start:end]
+
+
+def encode_wav(samples, sample_rate=TARGET_SAMPLE_RATE):
+    """Encodes mono float samples as a 16-bit PCM WAV."""
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype("<i2")
+    output = io.BytesIO()
+    with wave.open(output, "wb") as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(pcm.tobytes())
+    return output.getvalue()
+
+
+def normalize_wav(audio_bytes, target_rate=TARGET_SAMPLE_RATE):
+    """WAV in, 16 kHz mono 16-bit WAV with silence trimmed out. Returns None if the input is not a decodable WAV."""
+    decoded = decode_wav(audio_bytes)
+    if decoded is None:
+        return None
+    samples, sample_rate = decoded
+    mono = resample(downmix(samples), sample_rate, target_rate)
+    return encode_wav(trim_silence(mono, target_rate), target_rate)
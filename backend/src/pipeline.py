@@ -0,0 +1,75 @@
+import logging
+import queue
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from .transcription import stream_post_process_using_gpt
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# A sentence ends at . ! ? (followed by whitespace) or at CJK full-width punctuation
+SENTENCE_END = re.compile(r'(?<=[.!?])\s+|(?<=[。！？])')
+
+# Don't cut tiny fragments ("Dr.", "1.") into their own TTS call
+MIN_SENTENCE_LENGTH = 12
+
+
+def split_sentences(pieces, min_length=MIN_SENTENCE_LENGTH):
+    """Regroups a stream of text pieces into complete sentences."""
+    buffer = ""
+    for piece in pieces:
+        buffer += piece
+        start = 0
+        for match in SENTENCE_END.finditer(buffer):
+            sentence = buffer[start:match.start()].strip()
+            if len(sentence) >= min_length:
+                yield sentence
+                start = match.end()
+        buffer = buffer[start:]
+
+    if buffer.strip():
+        yield buffer.strip()
+
+
+def translate_and_speak(transcription_text, mode, input_lang, output_lang, synthesize, max_workers=3, previous_texts=[]):
+    """Streams the GPT translation sentence by sentence and overlaps TTS with generation.
+
+    `synthesize` turns one sentence into audio bytes. TTS for sentence N starts as
+    soon as it is complete, while GPT is still producing sentence N+1. Yields
+    (sentence, audio_bytes) tuples in sentence order; audio_bytes is None when
+    synthesis of that sentence failed.
+    """
+    start_time = time.time()
+    futures = queue.Queue()
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def produce():
+        try:
+            pieces = stream_post_process_using_gpt(transcription_text, mode, input_lang, output_lang, previous_texts)
+            for index, sentence in enumerate(split_sentences(pieces)):
+                logger.info(f"Sentence {index} ready after {time.time() - start_time:.2f} seconds: {sentence}")
+                futures.put((sentence, executor.submit(synthesize, sentence)))
+        except RuntimeError:
+            logger.info("Sentence pipeline was abandoned by its consumer")
+        finally:
+            futures.put(None)
+
+    threading.Thread(target=produce, daemon=True).start()
+
+    try:
+        while True:
+            item = futures.get()
+            if item is None:
+                break
+            sentence, future = item
+            try:
+                audio = future.result()
+            except Exception as e:
+                logger.error(f"Error in synthesizing sentence: {e}")
+                audio = None
+            yield sentence, audio
+    finally:
+        executor.shutdown(wait=False)
+        logger.info(f"Sentence pipeline took {time.time() - start_time:.2f} seconds")
@@ -0,0 +1,276 @@
+import logging
+import math
+import os
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Smoothing of the per provider/language latency and error rate estimates
+PROVIDER_EWMA_ALPHA = float(os.environ.get("PROVIDER_EWMA_ALPHA", 0.2))
+# Consecutive failures that open a provider's circuit breaker
+PROVIDER_BREAKER_FAILURES = int(os.environ.get("PROVIDER_BREAKER_FAILURES", 3))
+# Seconds an open breaker waits before the background prober checks the provider again
+PROVIDER_BREAKER_COOLDOWN = float(os.environ.get("PROVIDER_BREAKER_COOLDOWN", 30))
+PROVIDER_PROBE_INTERVAL = float(os.environ.get("PROVIDER_PROBE_INTERVAL", 5))
+# Share of requests sent to a random healthy provider so the others keep being measured
+PROVIDER_EXPLORE_RATE = float(os.environ.get("PROVIDER_EXPLORE_RATE", 0.02))
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class LocalFailure(Exception):
+    """Raised by a provider call when the provider answered but our own handling of the answer failed.
+
+    It is not counted against the provider, and the other providers are not tried.
+    """
+
+
+class CircuitBreaker:
+    """Opens after a burst of consecutive failures.
+
+    An open breaker is moved to half-open by the background prober once the
+    provider answers again; the next real request is then the trial that closes
+    it (or opens it again).
+    """
+
+    def __init__(self, failures=PROVIDER_BREAKER_FAILURES, cooldown=PROVIDER_BREAKER_COOLDOWN):
+        self.failures = failures
+        self.cooldown = cooldown
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self.trips = 0
+
+    def record(self, ok):
+        self.trial_in_flight = False
+        if ok:
+            self.consecutive_failures = 0
+            self.state = CLOSED
+            return False
+        self.consecutive_failures += 1
+        if self.state == HALF_OPEN or (self.state == CLOSED and self.consecutive_failures >= self.failures):
+            self.trip()
+            return True
+        return False
+
+    def trip(self):
+        self.state = OPEN
+        self.opened_at = time.time()
+        self.trial_in_flight = False
+        self.trips += 1
+
+    def probe_due(self, now):
+        return self.state == OPEN and now - self.opened_at >= self.cooldown
+
+    def to_dict(self):
+        return {"state": self.state, "consecutive_failures": self.consecutive_failures, "trips": self.trips}
+
+
+class LatencyEstimate:
+    """EWMA latency (of successful calls) and error rate of one provider for one language."""
+
+    def __init__(self, alpha=PROVIDER_EWMA_ALPHA):
+        self.alpha = alpha
+        self.latency = None
+        self.error_rate = 0.0
+        self.samples = 0
+
+    def update(self, latency, ok):
+        self.samples += 1
+        self.error_rate += self.alpha * ((0.0 if ok else 1.0) - self.error_rate)
+        if ok:
+            self.latency = latency if self.latency is None else self.latency + self.alpha * (latency - self.latency)
+
+    def score(self):
+        """Expected seconds per usable answer; lower is better."""
+        if self.latency is None:
+            return math.inf
+        return self.latency / max(0.05, 1.0 - self.error_rate)
+
+    def to_dict(self):
+        return {"latency": None if self.latency is None else round(self.latency, 3),
+                "error_rate": round(self.error_rate, 3), "samples": self.samples}
+
+
+class ProviderRegistry:
+    """Routes one pipeline stage (STT, TTS) to the fastest healthy provider.
+
+    `providers` lists the provider names in order of preference, which decides
+    until there are measurements. `probes` maps a name to a cheap health check
+    (raises or returns a falsy value when the provider is still down); providers
+    without one are let back in for a trial request as soon as the cooldown ends.
+    """
+
+    def __init__(self, stage, providers, probes=None, explore_rate=PROVIDER_EXPLORE_RATE):
+        self.stage = stage
+        self.providers = list(providers)
+        self.probes = probes or {}
+        self.explore_rate = explore_rate
+        self._breakers = {name: CircuitBreaker() for name in self.providers}
+        self._estimates = {}  # (provider, language) -> LatencyEstimate
+        self._lock = threading.Lock()
+        _registries.append(self)
+
+    def rank(self, language, candidates=None, trial=True):
+        """Healthy `candidates` (default: every provider) fastest first.
+
+        With `trial`, a half-open provider is put first to serve as its breaker's
+        trial request; the caller must then record() its outcome. If every candidate
+        is open they are all returned in preference order, since trying a broken
+        provider beats failing outright.
+        """
+        candidates = [name for name in (self.providers if candidates is None else candidates) if name in self._breakers]
+        with self._lock:
+            healthy = [name for name in candidates if self._breakers[name].state == CLOSED]
+            healthy.sort(key=lambda name: (self._estimate(name, language).score(), self.providers.index(name)))
+            if len(healthy) > 1 and random.random() < self.explore_rate:
+                healthy.insert(0, healthy.pop(random.randrange(1, len(healthy))))
+            if trial:
+                for name in candidates:
+                    breaker = self._breakers[name]
+                    if breaker.state == HALF_OPEN and not breaker.trial_in_flight:
+                        breaker.trial_in_flight = True
+                        healthy.insert(0, name)
+                        break
+        if not healthy and candidates:
+            logger.warning(f"Every {self.stage} provider is unavailable; trying {', '.join(candidates)} anyway")
+            return candidates
+        return healthy
+
+    def best(self, language, candidates=None):
+        """The provider rank() would try first, without claiming a breaker trial. None if there are no candidates."""
+        ranked = self.rank(language, candidates, trial=False)
+        return ranked[0] if ranked else None
+
+    def _estimate(self, name, language):
+        estimate = self._estimates.get((name, language))
+        if estimate is None:
+            estimate = self._estimates[(name, language)] = LatencyEstimate()
+        return estimate
+
+    def record(self, name, language, latency, ok):
+        with self._lock:
+            self._estimate(name, language).update(latency, ok)
+            tripped = self._breakers[name].record(ok)
+        if tripped:
+            logger.warning(f"Circuit breaker for {self.stage} provider {name} opened")
+            _start_prober()
+
+    def release(self, name):
+        """Gives back a breaker trial claimed by rank() for a call that was never made."""
+        with self._lock:
+            self._breakers[name].trial_in_flight = False
+
+    def call(self, language, calls, *args, **kwargs):
+        """Calls the providers in `calls` (name -> function) fastest first until one returns something other than None."""
+        for name in self.rank(language, list(calls)):
+            start_time = time.time()
+            try:
+                result = calls[name](*args, **kwargs)
+            except LocalFailure:
+                self.release(name)
+                raise
+            except Exception as e:
+                logger.error(f"{self.stage} provider {name} raised: {e}", exc_info=True)
+                result = None
+            self.record(name, language, time.time() - start_time, result is not None)
+            if result is not None:
+                return result
+            logger.warning(f"{self.stage} provider {name} failed; trying the next one")
+        return None
+
+    async def call_async(self, language, calls, *args, **kwargs):
+        """Async version of call(); `calls` maps names to coroutine functions."""
+        for name in self.rank(language, list(calls)):
+            start_time = time.time()
+            try:
+                result = await calls[name](*args, **kwargs)
+            except LocalFailure:
+                self.release(name)
+                raise
+            except Exception as e:
+                logger.error(f"{self.stage} provider {name} raised: {e}", exc_info=True)
+                result = None
+            self.record(name, language, time.time() - start_time, result is not None)
+            if result is not None:
+                return result
+            logger.warning(f"{self.stage} provider {name} failed; trying the next one")
+        return None
+
+    def probe_open_breakers(self):
+        """Moves open breakers whose cooldown has passed to half-open if their provider answers its probe."""
+        now = time.time()
+        with self._lock:
+            due = [name for name, breaker in self._breakers.items() if breaker.probe_due(now)]
+        for name in due:
+            probe = self.probes.get(name)
+            try:
+                healthy = probe() if probe else True
+            except Exception as e:
+                logger.info(f"Probe of {self.stage} provider {name} failed: {e}")
+                healthy = False
+            with self._lock:
+                breaker = self._breakers[name]
+                if breaker.state != OPEN:
+                    continue
+                if healthy:
+                    breaker.state = HALF_OPEN
+                    logger.info(f"{self.stage} provider {name} answered its probe; admitting a trial request")
+                else:
+                    breaker.opened_at = time.time()
+
+    def has_open_breakers(self):
+        with self._lock:
+            return any(breaker.state == OPEN for breaker in self._breakers.values())
+
+    def stats(self):
+        with self._lock:
+            return {name: {**self._breakers[name].to_dict(),
+                           "languages": {language: estimate.to_dict() for (provider, language), estimate in self._estimates.items()
+                                         if provider == name}}
+                    for name in self.providers}
+
+    def reset_after_fork(self):
+        self._lock = threading.Lock()
+
+
+_registries = []
+_prober = None
+_prober_lock = threading.Lock()
+
+
+def _probe_loop():
+    global _prober
+    while True:
+        time.sleep(PROVIDER_PROBE_INTERVAL)
+        for registry in list(_registries):
+            registry.probe_open_breakers()
+        with _prober_lock:
+            if not any(registry.has_open_breakers() for registry in _registries):
+                _prober = None
+                return
+
+
+def _start_prober():
+    """Starts the background prober unless it is already running; it stops once every breaker has left the open state."""
+    global _prober
+    with _prober_lock:
+        if _prober is None:
+            _prober = threading.Thread(target=_probe_loop, name="provider-prober", daemon=True)
+            _prober.start()
+
+
+def _reset_after_fork():
+    # The parent's prober thread does not exist in the child
+    global _prober, _prober_lock
+    _prober = None
+    _prober_lock = threading.Lock()
+    for registry in _registries:
+        registry.reset_after_fork()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
@@ -1,33 +1,98 @@
 import logging
 import json
-from google.cloud import secretmanager, speech_v1p1beta1 as speech, translate_v3 as translate, firestore
-from google.oauth2 import service_account
-import openai
-from deepgram import DeepgramClient
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Provider SDKs are imported inside the builders below, so a process only pays
+# the import cost for the providers it actually uses.
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
+# How long a fetched secret is served before it is refreshed in the background
+SECRET_TTL = int(os.environ.get("SECRET_TTL", 3600))
+
+# Local development and benchmarks (see fakes/): a JSON file of secret id -> value
+# consulted before Secret Manager, and a plaintext gRPC endpoint for the Translate
+# clients. Firestore honours FIRESTORE_EMULATOR_HOST on its own.
+LOCAL_SECRETS_FILE = os.environ.get("LOCAL_SECRETS_FILE")
+TRANSLATE_API_ENDPOINT = os.environ.get("TRANSLATE_API_ENDPOINT")
+FIRESTORE_EMULATOR_HOST = os.environ.get("FIRESTORE_EMULATOR_HOST")
+
 class Credentials:
-    def __init__(self, project_id="70513175587", location='global'):
+    """Secrets and SDK clients shared by every module in the process.
+
+    Use get_credentials() rather than instantiating this directly, so the whole
+    process shares one Secret Manager channel, one copy of each secret and one
+    of each client. Secrets are fetched once (concurrent first callers wait for
+    the same fetch), served from memory, and refreshed in the background after
+    `secret_ttl` seconds; clients built from a rotated secret are rebuilt.
+    """
+
+    def __init__(self, project_id="70513175587", location='global', secret_ttl=SECRET_TTL):
         self.project_id = project_id
         self.location = location
+        self.secret_ttl = secret_ttl
         self.google_secret_id = "cloud-translation-service-account"
         self.openai_api_key_secret_id = "OpenAI_API_KEY"
         self.elevenlabs_key_secret_id = "ElevenLabsAPIKey"
         self.deepgram_key_secret_id = "DeepgramTestAPIKey"
-        self.client = secretmanager.SecretManagerServiceClient()
-        
+        self.elevenlabs_voice_ids_secret_id = "ElevenLabsVoiceIDs"
+        self._client = None
+        self._local_secrets = None
+
+        self._secrets = {}  # secret_id -> (value, fetched_at)
+        self._locks = {}  # secret id or client attribute -> Lock
+        self._locks_lock = threading.Lock()
+        self._refreshing = set()
+
         self._gcp_credentials = None
-        self._openai_api_key = None
-        self._elevenlabs_api_key = None
         self._speech_client = None
         self._translation_client = None
         self._openai_client = None
         self._deepgram_client = None
         self._firestore_client = None
+        self._async_translation_client = None
+        self._async_openai_client = None
+        self._async_firestore_client = None
+
+        # Clients to rebuild when the secret they were built from rotates
+        self._dependent_clients = {
+            self.google_secret_id: ['_gcp_credentials', '_speech_client', '_translation_client', '_firestore_client',
+                                    '_async_translation_client', '_async_firestore_client'],
+            self.openai_api_key_secret_id: ['_openai_client', '_async_openai_client'],
+            self.deepgram_key_secret_id: ['_deepgram_client'],
+        }
+
+    @property
+    def client(self):
+        # Created on first use so that importing src does not need Google credentials
+        if not self._client:
+            with self._lock_for('_client'):
+                if not self._client:
+                    from google.cloud import secretmanager
+                    self._client = secretmanager.SecretManagerServiceClient()
+        return self._client
+
+    def _lock_for(self, name):
+        with self._locks_lock:
+            return self._locks.setdefault(name, threading.Lock())
+
+    def _read_local_secrets(self):
+        if self._local_secrets is None:
+            try:
+                with open(LOCAL_SECRETS_FILE) as file:
+                    self._local_secrets = json.load(file)
+            except (OSError, ValueError) as e:
+                logger.error(f"Failed to read local secrets from {LOCAL_SECRETS_FILE}: {e}")
+                self._local_secrets = {}
+        return self._local_secrets
 
     def _fetch_secret(self, secret_id):
+        if LOCAL_SECRETS_FILE and secret_id in self._read_local_secrets():
+            return self._read_local_secrets()[secret_id]
         secret_name = f"projects/{self.project_id}/secrets/{secret_id}/versions/latest"
         try:
             response = self.client.access_secret_version(request={"name": secret_name})
@@ -37,51 +102,208 @@ class Credentials:
             logger.error(f"Failed to access secret {secret_id}: {e}")
             return None
 
+    def get_secret(self, secret_id):
+        """Returns a secret, hitting Secret Manager at most once per TTL for the whole process."""
+        cached = self._secrets.get(secret_id)
+        if cached:
+            if time.time() - cached[1] > self.secret_ttl:
+                self._refresh_in_background(secret_id)
+            return cached[0]
+
+        with self._lock_for(secret_id):
+            # Another thread may have fetched it while we were waiting
+            cached = self._secrets.get(secret_id)
+            if cached:
+                return cached[0]
+            value = self._fetch_secret(secret_id)
+            if value is not None:
+                self._secrets[secret_id] = (value, time.time())
+            return value
+
+    def _refresh_in_background(self, secret_id):
+        with self._locks_lock:
+            if secret_id in self._refreshing:
+                return
+            self._refreshing.add(secret_id)
+        threading.Thread(target=self._refresh_secret, args=(secret_id,), daemon=True).start()
+
+    def _refresh_secret(self, secret_id):
+        try:
+            old_value = self._secrets[secret_id][0]
+            value = self._fetch_secret(secret_id)
+            # Keep serving the old value if the refresh failed; try again after another TTL
+            self._secrets[secret_id] = (value if value is not None else old_value, time.time())
+            if value is not None and value != old_value:
+                logger.info(f"Secret {secret_id} changed; rebuilding the clients that use it")
+                for attribute in self._dependent_clients.get(secret_id, []):
+                    setattr(self, attribute, None)
+        finally:
+            with self._locks_lock:
+                self._refreshing.discard(secret_id)
+
+    def _get_client(self, attribute, build):
+        """Returns the client stored in `attribute`, building it exactly once with `build()`."""
+        client = getattr(self, attribute)
+        if client is None:
+            with self._lock_for(attribute):
+                client = getattr(self, attribute)
+                if client is None:
+                    client = build()
+                    setattr(self, attribute, client)
+        return client
+
     def get_gcp_credentials(self):
-        if not self._gcp_credentials:
-            secret_data = self._fetch_secret(self.google_secret_id)
+        def build():
+            secret_data = self.get_secret(self.google_secret_id)
             if secret_data:
                 try:
+                    from google.oauth2 import service_account
                     credentials_info = json.loads(secret_data)
-                    self._gcp_credentials = service_account.Credentials.from_service_account_info(credentials_info)
+                    return service_account.Credentials.from_service_account_info(credentials_info)
                 except Exception as e:
                     logger.error(f"Failed to construct credentials from secret {self.google_secret_id}: {e}")
-        return self._gcp_credentials
+            return None
+        return self._get_client('_gcp_credentials', build)
 
     def get_openai_api_key(self):
-        if not self._openai_api_key:
-            self._openai_api_key = self._fetch_secret(self.openai_api_key_secret_id)
-        return self._openai_api_key
+        return self.get_secret(self.openai_api_key_secret_id)
 
     def get_elevenlabs_api_key(self):
-        if not self._elevenlabs_api_key:
-            self._elevenlabs_api_key = self._fetch_secret(self.elevenlabs_key_secret_id)
-        return self._elevenlabs_api_key
-    
+        return self.get_secret(self.elevenlabs_key_secret_id)
+
+    def get_deepgram_api_key(self):
+        return self.get_secret(self.deepgram_key_secret_id)
+
+    def get_elevenlabs_voice_ids(self):
+        return self.get_secret(self.elevenlabs_voice_ids_secret_id)
+
     def get_speech_client(self):
-        if not self._speech_client and self.get_gcp_credentials():
-            self._speech_client = speech.SpeechClient(credentials=self._gcp_credentials)
-        return self._speech_client
+        def build():
+            from google.cloud import speech_v1p1beta1 as speech
+            gcp_credentials = self.get_gcp_credentials()
+            return speech.SpeechClient(credentials=gcp_credentials) if gcp_credentials else None
+        return self._get_client('_speech_client', build)
 
     def get_translation_client(self):
-        if not self._translation_client and self.get_gcp_credentials():
-            self._translation_client = translate.TranslationServiceClient(credentials=self._gcp_credentials)
-        return self._translation_client
+        def build():
+            from google.cloud import translate_v3 as translate
+            if TRANSLATE_API_ENDPOINT:
+                import grpc
+                from google.cloud.translate_v3.services.translation_service.transports import TranslationServiceGrpcTransport
+                return translate.TranslationServiceClient(
+                    transport=TranslationServiceGrpcTransport(channel=grpc.insecure_channel(TRANSLATE_API_ENDPOINT)))
+            gcp_credentials = self.get_gcp_credentials()
+            return translate.TranslationServiceClient(credentials=gcp_credentials) if gcp_credentials else None
+        return self._get_client('_translation_client', build)
 
     def get_openai_client(self):
-        if not self._openai_client and self.get_openai_api_key():
-            self._openai_client = openai.OpenAI(api_key=self._openai_api_key)
-        return self._openai_client
+        def build():
+            import openai
+            api_key = self.get_openai_api_key()
+            from .http_pool import get_httpx_client
+            return openai.OpenAI(api_key=api_key, http_client=get_httpx_client()) if api_key else None
+        return self._get_client('_openai_client', build)
+
+    def get_async_translation_client(self):
+        def build():
+            from google.cloud import translate_v3 as translate
+            if TRANSLATE_API_ENDPOINT:
+                import grpc
+                from google.cloud.translate_v3.services.translation_service.transports import TranslationServiceGrpcAsyncIOTransport
+                return translate.TranslationServiceAsyncClient(
+                    transport=TranslationServiceGrpcAsyncIOTransport(channel=grpc.aio.insecure_channel(TRANSLATE_API_ENDPOINT)))
+            gcp_credentials = self.get_gcp_credentials()
+            return translate.TranslationServiceAsyncClient(credentials=gcp_credentials) if gcp_credentials else None
+        return self._get_client('_async_translation_client', build)
+
+    def get_async_openai_client(self):
+        def build():
+            import openai
+            api_key = self.get_openai_api_key()
+            from .http_pool import get_async_httpx_client
+            return openai.AsyncOpenAI(api_key=api_key, http_client=get_async_httpx_client()) if api_key else None
+        return self._get_client('_async_openai_client', build)
+
+    def get_async_firestore_client(self):
+        def build():
+            from google.cloud import firestore
+            return firestore.AsyncClient() if FIRESTORE_EMULATOR_HOST or self.get_gcp_credentials() else None
+        return self._get_client('_async_firestore_client', build)
 
     def get_firestore_client(self):
-        if not self._firestore_client:
-            if self.get_gcp_credentials():
-                self._firestore_client = firestore.Client()
-        return self._firestore_client
+        def build():
+            from google.cloud import firestore
+            return firestore.Client() if FIRESTORE_EMULATOR_HOST or self.get_gcp_credentials() else None
+        return self._get_client('_firestore_client', build)
 
     def get_deepgram_client(self):
-        if not self._deepgram_client:
-            deepgram_api_key = self._fetch_secret(self.deepgram_key_secret_id)
-            if deepgram_api_key:
-                self._deepgram_client = DeepgramClient(deepgram_api_key)
-        return self._deepgram_client
+        def build():
+            from deepgram import DeepgramClient
+            api_key = self.get_deepgram_api_key()
+            return DeepgramClient(api_key) if api_key else None
+        return self._get_client('_deepgram_client', build)
+
+    def _warm_up_steps(self):
+        return {
+            "deepgram": [self.get_deepgram_api_key],
+            "openai": [self.get_openai_client],
+            "elevenlabs": [self.get_elevenlabs_api_key, self.get_elevenlabs_voice_ids],
+            "firestore": [self.get_firestore_client],
+            "google-speech": [self.get_speech_client],
+            "google-translate": [self.get_translation_client],
+        }
+
+    def warm_up(self, providers=None):
+        """Fetches the secrets and builds the sync clients of `providers` up front, in parallel.
+
+        Meant to run once when a worker boots so the first request doesn't pay
+        for Secret Manager round trips, SDK imports and client construction.
+        Defaults to every provider. Async clients are left to be built lazily
+        inside the event loop that will use them.
+        """
+        warm_up_start_time = time.time()
+        available_steps = self._warm_up_steps()
+        steps = [step for provider in (providers or available_steps) for step in available_steps.get(provider, [])]
+        if not steps:
+            return
+        with ThreadPoolExecutor(max_workers=len(steps)) as executor:
+            results = list(executor.map(lambda step: step() is not None, steps))
+        logger.info(f"Credentials warm-up: {sum(results)}/{len(steps)} ready in {time.time() - warm_up_start_time:.2f} seconds")
+
+    def _reset_after_fork(self):
+        """Drops everything that must not be shared with a parent process.
+
+        gRPC channels and HTTP connection pools are not fork-safe, and a lock held
+        by another thread at fork time would never be released in the child. The
+        fetched secrets are plain strings and are kept.
+        """
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+        self._refreshing = set()
+        self._client = None
+        for attribute in ['_gcp_credentials', '_speech_client', '_translation_client', '_openai_client', '_deepgram_client',
+                          '_firestore_client', '_async_translation_client', '_async_openai_client', '_async_firestore_client']:
+            setattr(self, attribute, None)
+
+
+_credentials = None
+_credentials_lock = threading.Lock()
+
+def get_credentials():
+    """Returns the process-wide Credentials registry."""
+    global _credentials
+    if _credentials is None:
+        with _credentials_lock:
+            if _credentials is None:
+                _credentials = Credentials()
+    return _credentials
+
+def _reset_credentials_after_fork():
+    global _credentials_lock
+    _credentials_lock = threading.Lock()
+    if _credentials is not None:
+        _credentials._reset_after_fork()
+
+# Lets gunicorn --preload import everything in the master without workers
+# inheriting its gRPC channels
+os.register_at_fork(after_in_child=_reset_credentials_after_fork)
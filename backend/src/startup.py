@@ -0,0 +1,44 @@
+import logging
+import os
+import threading
+from .secret_manager import get_credentials
+from .voice_generation import prewarm_voice_cache
+from .http_pool import prewarm_connections
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Providers this deployment actually calls; only their SDKs are imported and their clients built
+WARM_UP_PROVIDERS = [provider.strip() for provider in os.environ.get("WARM_UP_PROVIDERS", "deepgram,openai,firestore").split(",") if provider.strip()]
+
+
+def _http_providers(providers):
+    return [provider for provider in providers if provider in ("openai", "elevenlabs", "deepgram")]
+
+
+def warm_up(providers=None):
+    """Fetches secrets, builds the provider clients and pre-renders fixed phrases before traffic arrives.
+
+    Also opens keep-alive connections to the HTTP providers so the first
+    utterance skips the TCP and TLS handshakes. Must run in the process that will serve requests (after gunicorn forks), never
+    in a preloading master: gRPC channels do not survive a fork.
+    """
+    providers = providers or WARM_UP_PROVIDERS
+    get_credentials().warm_up(providers)
+    prewarm_connections(_http_providers(providers))
+    if "openai" in providers:
+        prewarm_voice_cache()
+
+
+def start_warm_up(providers=None):
+    """Runs warm_up in a background thread so the worker can start accepting requests right away."""
+    thread = threading.Thread(target=warm_up, args=(providers,), daemon=True)
+    thread.start()
+    return thread
+
+
+def start_connection_prewarm(providers=None):
+    """Re-opens the provider connections in the background, e.g. when a conversation starts after a long idle."""
+    thread = threading.Thread(target=prewarm_connections, args=(_http_providers(providers or WARM_UP_PROVIDERS),), daemon=True)
+    thread.start()
+    return thread
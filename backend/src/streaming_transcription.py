@@ -0,0 +1,119 @@
+import json
+import logging
+import os
+import threading
+import time
+from urllib.parse import urlencode
+from websockets.sync.client import connect
+from .secret_manager import get_credentials
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+credentials = get_credentials()  # Process-wide registry shared by all modules
+
+# Point this at fakes/deepgram_live.py to run without the real Deepgram service
+DEEPGRAM_LIVE_URL = os.environ.get("DEEPGRAM_LIVE_URL", "wss://api.deepgram.com/v1/listen")
+
+
+class LiveTranscriber:
+    """Streams audio frames to a Deepgram live session and reports interim and final transcripts.
+
+    `on_transcript` is called from a background thread with a dict holding
+    `transcript`, `is_final` and `speech_final` for every result Deepgram sends.
+    """
+
+    def __init__(self, input_lang, on_transcript=None, encoding=None, sample_rate=None,
+                 endpointing=300, model="nova-2", api_key=None, url=None):
+        self.input_lang = input_lang
+        self.on_transcript = on_transcript
+        self.encoding = encoding
+        self.sample_rate = sample_rate
+        self.endpointing = endpointing
+        self.model = model
+        self.api_key = api_key
+        self.url = url or DEEPGRAM_LIVE_URL
+
+        self._ws = None
+        self._reader = None
+        self._final_segments = []
+        self._started_at = None
+        self._last_audio_at = None
+
+    def _build_url(self):
+        params = {
+            "model": self.model,
+            "language": self.input_lang,
+            "smart_format": "true",
+            "interim_results": "true",
+            "endpointing": self.endpointing,
+        }
+        # Containerized audio (WebM/Ogg from MediaRecorder) is self-describing; raw PCM is not
+        if self.encoding:
+            params["encoding"] = self.encoding
+        if self.sample_rate:
+            params["sample_rate"] = self.sample_rate
+        return f"{self.url}?{urlencode(params)}"
+
+    def start(self):
+        """Opens the live session. Returns False if the session could not be opened."""
+        api_key = self.api_key or credentials.get_deepgram_api_key()
+        if not api_key:
+            logger.error("Failed to load Deepgram API key for live transcription")
+            return False
+
+        try:
+            self._ws = connect(self._build_url(), additional_headers={"Authorization": f"Token {api_key}"})
+        except Exception as e:
+            logger.error(f"Failed to open Deepgram live session: {e}")
+            return False
+
+        self._started_at = time.time()
+        self._reader = threading.Thread(target=self._read_results, daemon=True)
+        self._reader.start()
+        logger.info(f"Opened Deepgram live session for {self.input_lang}")
+        return True
+
+    def send(self, frame):
+        """Forwards one audio frame to the live session. Returns False once the session has closed."""
+        self._last_audio_at = time.time()
+        try:
+            self._ws.send(frame)
+            return True
+        except Exception as e:
+            logger.error(f"Failed to send audio to the Deepgram live session: {e}")
+            return False
+
+    def finish(self, timeout=5.0):
+        """Flushes the session and returns the full final transcript."""
+        try:
+            self._ws.send(json.dumps({"type": "CloseStream"}))
+        except Exception as e:
+            logger.error(f"Failed to close Deepgram live session cleanly: {e}")
+        self._reader.join(timeout)
+        self._ws.close()
+
+        if self._last_audio_at:
+            logger.info(f"Final transcript {time.time() - self._last_audio_at:.2f} seconds after last audio frame")
+        return " ".join(self._final_segments).strip()
+
+    def _read_results(self):
+        try:
+            for message in self._ws:
+                data = json.loads(message)
+                if data.get("type") != "Results":
+                    continue
+
+                transcript = data["channel"]["alternatives"][0]["transcript"]
+                is_final = data.get("is_final", False)
+                if is_final and transcript:
+                    self._final_segments.append(transcript)
+
+                if self.on_transcript:
+                    self.on_transcript({
+                        "transcript": transcript,
+                        "is_final": is_final,
+                        "speech_final": data.get("speech_final", False),
+                    })
+        except Exception as e:
+            logger.error(f"Deepgram live session ended with an error: {e}")
@@ -1,95 +1,233 @@
+import asyncio
 import logging
+import os
 import time
-from google.cloud import speech_v1p1beta1 as speech
-from src.audio_processing import convert_audio_to_wav, get_audio_info
-from .secret_manager import Credentials
-from deepgram import (
-    PrerecordedOptions,
-    FileSource,
-)
+from src.audio_processing import convert_audio_to_wav, get_audio_info, read_audio_bytes
+from .secret_manager import get_credentials
+from .translation_cache import translation_cache
+from .glossary import relevant_dental_terms
+from .http_pool import get_http_session, get_async_httpx_client
+from .upload_encoding import encode_for_upload
+from .hedging import HedgedTranscriber, STT_HEDGING
+from .provider_routing import ProviderRegistry
 
 # Configure the logger
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
 
-credentials = Credentials()  # Instantiate once and use throughout
+credentials = get_credentials()  # Process-wide registry shared by all modules
+
+# Pre-recorded transcription endpoint; called directly so each upload can carry its own Content-Type
+DEEPGRAM_API_URL = os.environ.get("DEEPGRAM_API_URL", "https://api.deepgram.com/v1/listen")
+
+# Speech-to-text providers in order of preference; requests go to the fastest healthy one
+STT_PROVIDERS = [name.strip() for name in os.environ.get("STT_PROVIDERS", "deepgram,whisper").split(",") if name.strip()]
+
+# Whisper picks the decoder from the file extension and rejects ones it does not know, such as .matroska
+WHISPER_FILE_EXTENSIONS = {"matroska": "webm", "mp4": "m4a"}
+
+# Utterances of at most this many words are cached on their text alone even when they
+# were translated with conversation context: the stock chairside phrases the cache is
+# for ("Open wide.", "Rinse, please.") read the same in any context. Longer turns
+# translated with context are never cached
+TRANSLATION_CACHE_CONTEXT_FREE_WORDS = int(os.environ.get("TRANSLATION_CACHE_CONTEXT_FREE_WORDS", 6))
+
+# What the pipeline says back when an upload holds no speech
+NO_TEXT_MESSAGE = "No text was provided. Please try again."
+
+# Identical on every call so provider-side prompt caching can reuse it; anything
+# that varies per request goes in the messages after it.
+GPT_SYSTEM_PROMPT = "You are a helpful translator for a dental clinic. Review the transcription and ensure all dental terms are spelled correctly and add necessary punctuation. DO NOT reply with anything other than the final, most natural-sounding, most accurate TRANSLATION ONLY. You are not to give your own generated thoughts, but only verify the transcription and translate the given text. If *patient or *doctor is present, do not include it in the result text."
+
+def _build_gpt_messages(transcription_text, mode, input_lang, output_lang, previous_texts):
+    """Builds the chat messages used to translate a transcription with GPT."""
+    request_prompt = f"Translate from {input_lang} to {output_lang}."
+    dental_terms = relevant_dental_terms(transcription_text)
+    if dental_terms:
+        request_prompt += f" Relevant dental terms: {', '.join(dental_terms)}."
+
+    messages = [{"role": "system", "content": GPT_SYSTEM_PROMPT}, {"role": "system", "content": request_prompt}] + [
+        {"role": "user", "content": f"*{text['person_type']}: {text['text']}"} for text in previous_texts
+    ] + [{"role": "system", "content": f"TRANSCRIBE THE FOLLOWING TEXT => *{mode}: {transcription_text}"}]
+    return messages
+
+def _translation_cache_key(transcription_text, mode, input_lang, output_lang, previous_texts):
+    """Cache key for a GPT translation, or None when the cache must be bypassed.
+
+    The key never includes the context: turns translated with it are cached only
+    when they are short (TRANSLATION_CACHE_CONTEXT_FREE_WORDS).
+    """
+    if not translation_cache.enabled:
+        return None
+    if previous_texts and len(transcription_text.split()) > TRANSLATION_CACHE_CONTEXT_FREE_WORDS:
+        return None
+    return translation_cache.make_key(transcription_text, input_lang, output_lang, mode)
+
+def cached_gpt_translation(transcription_text, mode, input_lang, output_lang, previous_texts=[]):
+    """The translation post_process_using_gpt would serve from the translation cache, or None."""
+    cache_key = _translation_cache_key(transcription_text, mode, input_lang, output_lang, previous_texts)
+    return translation_cache.get(cache_key) if cache_key else None
 
 def post_process_using_gpt(transcription_text, mode, input_lang, output_lang, previous_texts=[]):
     """Refine transcription using GPT-4."""
+    cache_key = _translation_cache_key(transcription_text, mode, input_lang, output_lang, previous_texts)
+    if cache_key:
+        cached_translation = translation_cache.get(cache_key)
+        if cached_translation:
+            logger.info("Post-processing served from translation cache.")
+            return cached_translation
+
     client = credentials.get_openai_client()
     if not client:
         logger.error("Failed to load OpenAI client")
         return None    
     
     gpt_model="gpt-4o"
-    
-
-    dental_terms = ["Invisalign", "braces", "crown", "filling", "implant", "root canal", "veneer", "whitening", "x-ray", "extraction", "fluoride", "gum disease", "orthodontist", "periodontist", "prosthodontist", "endodontist", "pedodontist", "oral surgeon", "dental hygienist", "dental assistant", "dental laboratory technician", "dental therapist", "dental technician", "dental prosthetist", "dental public health", "forensic odontology", "geriatric dentistry", "oral medicine", "oral pathology", "oral and maxillofacial radiology", "oral and maxillofacial surgery", "orthodontics and dentofacial orthopedics", "pediatric dentistry", "periodontics", "prosthodontics", "dental anatomy", "dental materials", "dental morphology", "dental occlusion", "dental plaque", "dental restoration", "dental surgery", "dental trauma", "dental caries", "dental cavities", "dental erosion", "dental fluorosis", "dental plaque", "dental calculus", "dental pulp", "dental pulp cavity", "dental pulp test", "dental radiography", "dental sealant", "dental surgery", "dental technician", "dental therapist", "dental trauma", "dental treatment", "dental x-ray", "dental abscess", "dental alveolus", "dental amalgam", "dental anatomy", "dental arch", "dental assistant", "dental attrition", "dental avulsion", "dental braces", "dental bridge", "dental calculus", "dental caries", "dental cavity", "dental cement", "dental crown", "dental cyst", "dental extraction", "dental floss", "dental fluorosis", "dental implant", "dental impression", "dental laboratory", "dental malocclusion", "dental materials", "dental morphology", "dental occlusion", "dental plaque", "dental pulp", "dental radiography", "dental restoration", "dental sealant", "dental surgery", "dental technician", "dental therapist", "dental trauma", "dental treatment", "dental x-ray", "dental abscess", "dental alveol"]
-    prompt_text = f"You are a helpful translator for a dental clinic. translating from {input_lang} to {output_lang}. Review the transcription and ensure all dental terms are spelled correctly and add necessary punctuation. DO NOT reply with anything other than the final, most natural-sounding, most accurate TRANSLATION ONLY. You are not to give your own generated thoughts, but only verify the transcription and translate the given text. If *patient or *doctor is present, do not include it in the result text. Here are some common dental terms: {dental_terms}"
-
-    messages = [{"role": "system", "content": prompt_text}] + [
-        {"role": "user", "content": f"*{text['person_type']}: {text['text']}"} for text in previous_texts
-    ] + [{"role": "system", "content": f"TRANSCRIBE THE FOLLOWING TEXT => *{mode}: {transcription_text}"}]
+    messages = _build_gpt_messages(transcription_text, mode, input_lang, output_lang, previous_texts)
    
     try:
         response = client.chat.completions.create(model=gpt_model, messages=messages)
         refined_transcription = response.choices[0].message.content
         logger.info("Post-processing refinement successful.")
+        if cache_key and refined_transcription:
+            translation_cache.set(cache_key, refined_transcription)
         return refined_transcription
     except Exception as e:
         logger.error(f"Error in post-processing transcription with GPT-4: {e}", exc_info=True)
         return None
+
+def stream_post_process_using_gpt(transcription_text, mode, input_lang, output_lang, previous_texts=[]):
+    """Same as post_process_using_gpt, but yields the translation in pieces as GPT produces it."""
+    cache_key = _translation_cache_key(transcription_text, mode, input_lang, output_lang, previous_texts)
+    if cache_key:
+        cached_translation = translation_cache.get(cache_key)
+        if cached_translation:
+            logger.info("Streaming post-processing served from translation cache.")
+            yield cached_translation
+            return
+
+    client = credentials.get_openai_client()
+    if not client:
+        logger.error("Failed to load OpenAI client")
+        return
+
+    gpt_model="gpt-4o"
+    messages = _build_gpt_messages(transcription_text, mode, input_lang, output_lang, previous_texts)
+
+    try:
+        stream = client.chat.completions.create(model=gpt_model, messages=messages, stream=True)
+        pieces = []
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                pieces.append(chunk.choices[0].delta.content)
+                yield chunk.choices[0].delta.content
+        logger.info("Streaming post-processing refinement successful.")
+        if cache_key and pieces:
+            translation_cache.set(cache_key, "".join(pieces))
+    except Exception as e:
+        logger.error(f"Error in streaming post-processing with GPT-4: {e}", exc_info=True)
     
 
-def transcribe_audio_deepgram_local(AUDIO_FILE, input_lang, previous_texts=None):
-    """Transcribe audio using Deepgram API from a remote URL."""
-    deepgram_client = credentials.get_deepgram_client()
-    if not deepgram_client:
-        logger.error("Failed to load Deepgram client")
+async def post_process_using_gpt_async(transcription_text, mode, input_lang, output_lang, previous_texts=[]):
+    """Async version of post_process_using_gpt for the ASGI app."""
+    cache_key = _translation_cache_key(transcription_text, mode, input_lang, output_lang, previous_texts)
+    if cache_key:
+        cached_translation = translation_cache.get(cache_key)
+        if cached_translation:
+            logger.info("Post-processing served from translation cache.")
+            return cached_translation
+
+    client = credentials.get_async_openai_client()
+    if not client:
+        logger.error("Failed to load async OpenAI client")
         return None
 
-    try:
-        # STEP 1 Create a Deepgram client using the API key
-        deepgram = credentials.get_deepgram_client()
+    gpt_model="gpt-4o"
+    messages = _build_gpt_messages(transcription_text, mode, input_lang, output_lang, previous_texts)
 
-        with open(AUDIO_FILE, "rb") as file:
-            buffer_data = file.read()
+    try:
+        response = await client.chat.completions.create(model=gpt_model, messages=messages)
+        refined_transcription = response.choices[0].message.content
+        logger.info("Post-processing refinement successful.")
+        if cache_key and refined_transcription:
+            translation_cache.set(cache_key, refined_transcription)
+        return refined_transcription
+    except Exception as e:
+        logger.error(f"Error in post-processing transcription with GPT-4: {e}", exc_info=True)
+        return None
 
-        payload: FileSource = {
-            "buffer": buffer_data,
-        }
+def _deepgram_request(audio_bytes, input_lang):
+    """Builds the query parameters and headers of a Deepgram pre-recorded call for an upload-ready payload."""
+    api_key = credentials.get_deepgram_api_key()  # Use centralized method to get API key
+    if not api_key:
+        logger.error("Failed to load Deepgram API key")
+        return None
 
-        #STEP 2: Configure Deepgram options for audio analysis
+    payload, mimetype = encode_for_upload(audio_bytes)
+    params = {
+        "model": "nova-2",
+        "smart_format": "true",
+        "language": input_lang,
+    }
+    headers = {"Authorization": f"Token {api_key}", "Content-Type": mimetype}
+    return payload, params, headers
 
+def _deepgram_transcript(response_json):
+    transcript = response_json["results"]["channels"][0]["alternatives"][0]["transcript"]
+    if not transcript:
+        logger.error("No transcription results returned from Deepgram API")
+        transcript = NO_TEXT_MESSAGE
+    return transcript
 
-        options = PrerecordedOptions(
-            model="nova-2",
-            smart_format=True,
-            language=input_lang,
-        )
+def transcribe_audio_deepgram_local(AUDIO_FILE, input_lang, previous_texts=None):
+    """Transcribe audio using Deepgram API. AUDIO_FILE may be a path or the audio bytes."""
+    try:
+        deepgram_request = _deepgram_request(read_audio_bytes(AUDIO_FILE), input_lang)
+        if not deepgram_request:
+            return None
+        payload, params, headers = deepgram_request
 
-        # STEP 3: Call the transcribe_file method with the text payload and options
         time_to_transcribe = time.time()
-        response = deepgram.listen.prerecorded.v("1").transcribe_file(payload, options)
+        response = get_http_session().post(DEEPGRAM_API_URL, params=params, data=bytes(payload), headers=headers, timeout=60)
+        response.raise_for_status()
         time_to_transcribe = time.time() - time_to_transcribe
-        transcript = response["results"]["channels"][0]["alternatives"][0]["transcript"]
-        print("Transcript: ", transcript)
+        transcript = _deepgram_transcript(response.json())
         logger.info(f"Base transcription using Deepgram (local): {transcript}")
-        logger.info(f"Time to transcribe base text: {time_to_transcribe:.2f} seconds")
+        logger.info(f"Time to transcribe base text: {time_to_transcribe:.2f} seconds ({len(payload)} bytes, {headers['Content-Type']})")
+        return transcript
+
+    except Exception as e:
+        logger.error(f"Error in transcribing audio with Deepgram: {e}", exc_info=True)
+        return None
 
-        if not transcript:
-            logger.error("No transcription results returned from Deepgram API")
-            transcript = "No text was provided. Please try again."
+async def transcribe_audio_deepgram_async(AUDIO_FILE, input_lang):
+    """Async version of transcribe_audio_deepgram_local for the ASGI app. AUDIO_FILE may be a path or the audio bytes."""
+    try:
+        # Encoding may spawn FFmpeg; keep it off the event loop
+        deepgram_request = await asyncio.to_thread(_deepgram_request, read_audio_bytes(AUDIO_FILE), input_lang)
+        if not deepgram_request:
+            return None
+        payload, params, headers = deepgram_request
 
+        time_to_transcribe = time.time()
+        response = await get_async_httpx_client().post(DEEPGRAM_API_URL, params=params, content=bytes(payload), headers=headers, timeout=60)
+        response.raise_for_status()
+        time_to_transcribe = time.time() - time_to_transcribe
+        transcript = _deepgram_transcript(response.json())
+        logger.info(f"Base transcription using Deepgram (async): {transcript}")
+        logger.info(f"Time to transcribe base text: {time_to_transcribe:.2f} seconds ({len(payload)} bytes, {headers['Content-Type']})")
         return transcript
 
     except Exception as e:
-        print(f"Exception: {e}")
+        logger.error(f"Error in transcribing audio with Deepgram (async): {e}", exc_info=True)
+        return None
 
-def transcribe_audio_google(speech_file, language_code, previous_texts, mode, phrase_set_id="test"):
-    """Transcribes audio using Google Cloud Speech-to-Text API."""
+def transcribe_audio_google_raw(speech_file, language_code, phrase_set_id="test"):
+    """Google Cloud Speech-to-Text transcript without GPT post-processing. Expects 16 kHz LINEAR16 audio.
 
+    Returns NO_TEXT_MESSAGE when nothing was recognized and None on failure.
+    """
     time_to_get_client = time.time()
     speech_client = credentials.get_speech_client()
     time_to_get_client = time.time() - time_to_get_client
@@ -100,9 +238,9 @@ def transcribe_audio_google(speech_file, language_code, previous_texts, mode, ph
         return None
 
     try:
-        with open(speech_file, 'rb') as audio_file:
-            content = audio_file.read()
-        audio = speech.RecognitionAudio(content=content)
+        from google.cloud import speech_v1p1beta1 as speech
+        content = read_audio_bytes(speech_file)
+        audio = speech.RecognitionAudio(content=bytes(content))
         config = speech.RecognitionConfig(
             encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
             sample_rate_hertz=16000,
@@ -116,15 +254,27 @@ def transcribe_audio_google(speech_file, language_code, previous_texts, mode, ph
         response = speech_client.recognize(config=config, audio=audio)
         time_to_get_transcription = time.time() - time_to_get_transcription
         logger.info(f"Time to get transcription: {time_to_get_transcription:.2f} seconds")
-    
-                    
+
         if not response.results:
             logger.error("No transcription results returned from Google Speech-to-Text API")
-            return "No text was provided"
+            return NO_TEXT_MESSAGE
 
         transcript = response.results[0].alternatives[0].transcript
         logger.info(f"Transcription successful: {transcript}")
+        return transcript
+    except Exception as e:
+        logger.error(f"Error in Google Cloud transcription: {e}", exc_info=True)
+        return None
 
+def transcribe_audio_google(speech_file, language_code, previous_texts, mode, phrase_set_id="test"):
+    """Transcribes audio using Google Cloud Speech-to-Text API."""
+    transcript = transcribe_audio_google_raw(speech_file, language_code, phrase_set_id)
+    if transcript is None:
+        return None
+    if transcript == NO_TEXT_MESSAGE:
+        return "No text was provided"
+
+    try:
         time_to_post_process = time.time()
         post_processed_text = post_process_using_gpt(transcript, previous_texts, mode)
         time_to_post_process = time.time() - time_to_post_process
@@ -135,25 +285,101 @@ def transcribe_audio_google(speech_file, language_code, previous_texts, mode, ph
         logger.error(f"Error in Google Cloud transcription: {e}", exc_info=True)
         return None
 
-def transcribe_audio_whisper(speech_file, previous_texts, mode):
-    """Transcribe audio using OpenAI's Whisper model."""
+def transcribe_audio_whisper_raw(speech_file, input_lang=None):
+    """Whisper transcript without GPT post-processing. Returns NO_TEXT_MESSAGE when nothing was heard and None on failure."""
     openai_client = credentials.get_openai_client()
     if not openai_client:
         logger.error("Failed to load OpenAI client")
         return None
 
     try:
-        with open(speech_file, 'rb') as audio_file:
-            response = openai_client.audio.transcriptions.create(
-                model="whisper-1",
-                file=audio_file
-            )
-
-        transcription = response.text
-        logger.info(f"Base transcription using Whisper: {transcription}")
+        audio_bytes = read_audio_bytes(speech_file)
+        # Whisper picks the decoder from the file name, so keep it when we were given a path
+        if isinstance(speech_file, str):
+            file_name = os.path.basename(speech_file)
+        else:
+            audio_info = get_audio_info(audio_bytes)
+            container = audio_info['container'] if audio_info else 'wav'
+            file_name = f"audio.{WHISPER_FILE_EXTENSIONS.get(container, container)}"
+        options = {"language": input_lang.split("-")[0]} if input_lang else {}
+        time_to_transcribe = time.time()
+        response = openai_client.audio.transcriptions.create(
+            model="whisper-1",
+            file=(file_name, bytes(audio_bytes)),
+            **options
+        )
+        logger.info(f"Base transcription using Whisper: {response.text}")
+        logger.info(f"Time to transcribe base text: {time.time() - time_to_transcribe:.2f} seconds")
+        return response.text.strip() or NO_TEXT_MESSAGE
+    except Exception as e:
+        logger.error(f"Error in transcribing audio with Whisper: {e}", exc_info=True)
+        return None
+
+def transcribe_audio_whisper(speech_file, previous_texts, mode):
+    """Transcribe audio using OpenAI's Whisper model."""
+    transcription = transcribe_audio_whisper_raw(speech_file)
+    if transcription is None:
+        return None
+
+    try:
         post_processed_text = post_process_using_gpt(transcription, previous_texts, mode)
         logger.info(f"Post-processed transcription using Whisper: {post_processed_text}")
         return post_processed_text
     except Exception as e:
         logger.error(f"Error in transcribing audio with Whisper: {e}", exc_info=True)
         return None
+
+def _accepts_any(audio_info):
+    return True
+
+def _accepts_linear16(audio_info):
+    # Google is configured for 16 kHz LINEAR16, which is what normalize_audio_bytes produces
+    return bool(audio_info) and audio_info["codec"] == "pcm_s16le" and audio_info["sample_rate"] == 16000
+
+def _probe_deepgram():
+    api_key = credentials.get_deepgram_api_key()
+    if not api_key:
+        return False
+    projects_url = DEEPGRAM_API_URL.rsplit("/", 1)[0] + "/projects"
+    get_http_session().get(projects_url, headers={"Authorization": f"Token {api_key}"}, timeout=5).raise_for_status()
+    return True
+
+def _probe_whisper():
+    openai_client = credentials.get_openai_client()
+    return bool(openai_client and openai_client.models.retrieve("whisper-1"))
+
+STT_CALLS = {
+    "deepgram": (transcribe_audio_deepgram_local, _accepts_any),
+    "whisper": (transcribe_audio_whisper_raw, _accepts_any),
+    "google": (transcribe_audio_google_raw, _accepts_linear16),
+}
+stt_registry = ProviderRegistry("stt", [name for name in STT_PROVIDERS if name in STT_CALLS],
+                                probes={"deepgram": _probe_deepgram, "whisper": _probe_whisper})
+stt_hedger = HedgedTranscriber(STT_CALLS, stt_registry)
+os.register_at_fork(after_in_child=stt_hedger.reset_after_fork)
+
+def _stt_calls(audio_info):
+    return {name: transcribe for name, (transcribe, accepts) in STT_CALLS.items() if accepts(audio_info)}
+
+def transcribe_audio(speech_file, input_lang, audio_info=None):
+    """Base transcript of an upload from the fastest healthy STT provider, falling back to the others.
+
+    With STT_HEDGING the next provider is asked in parallel when the first one is slow.
+    """
+    audio_bytes = read_audio_bytes(speech_file)
+    audio_info = audio_info or get_audio_info(audio_bytes)
+    if STT_HEDGING:
+        return stt_hedger.transcribe(audio_bytes, input_lang, audio_info)
+    return stt_registry.call(input_lang, _stt_calls(audio_info), audio_bytes, input_lang)
+
+async def transcribe_audio_async(speech_file, input_lang, audio_info=None):
+    """Async version of transcribe_audio. Providers without an async client run on a worker thread."""
+    audio_bytes = read_audio_bytes(speech_file)
+    audio_info = audio_info or get_audio_info(audio_bytes)
+    if STT_HEDGING:
+        return await asyncio.to_thread(stt_hedger.transcribe, audio_bytes, input_lang, audio_info)
+    calls = {name: (lambda *args, transcribe=transcribe: asyncio.to_thread(transcribe, *args))
+             for name, transcribe in _stt_calls(audio_info).items()}
+    if "deepgram" in calls:
+        calls["deepgram"] = transcribe_audio_deepgram_async
+    return await stt_registry.call_async(input_lang, calls, audio_bytes, input_lang)
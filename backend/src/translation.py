@@ -1,12 +1,72 @@
+import asyncio
 import logging
+import os
+import threading
 import time
-from .secret_manager import Credentials  # Adjusted import for the centralized Credentials class
+from concurrent.futures import ThreadPoolExecutor
+from .secret_manager import get_credentials
 
 # Ensure the logger uses the same configuration
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
-credentials = Credentials()  # Instantiate credentials for centralized management
+credentials = get_credentials()  # Process-wide registry shared by all modules
+
+# Limits of one batched Translate request (the API recommends at most 1024 strings
+# and 30k codepoints per call) and how many such requests run at once
+TRANSLATE_BATCH_MAX_SEGMENTS = int(os.environ.get("TRANSLATE_BATCH_MAX_SEGMENTS", 1024))
+TRANSLATE_BATCH_MAX_CHARS = int(os.environ.get("TRANSLATE_BATCH_MAX_CHARS", 30000))
+TRANSLATE_BATCH_CONCURRENCY = int(os.environ.get("TRANSLATE_BATCH_CONCURRENCY", 4))
+
+_batch_executor = None
+_batch_executor_lock = threading.Lock()
+
+def _get_batch_executor():
+    global _batch_executor
+    with _batch_executor_lock:
+        if _batch_executor is None:
+            _batch_executor = ThreadPoolExecutor(max_workers=TRANSLATE_BATCH_CONCURRENCY, thread_name_prefix="translate-batch")
+        return _batch_executor
+
+def _reset_after_fork():
+    # The parent's executor threads do not exist in the child
+    global _batch_executor, _batch_executor_lock
+    _batch_executor = None
+    _batch_executor_lock = threading.Lock()
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+def _translation_request(contents, source_language, target_language, model_id=None):
+    parent = f"projects/{credentials.project_id}/locations/{credentials.location}"
+    request = {
+        "parent": parent,
+        "contents": contents,
+        "mime_type": "text/plain",  # MIME types: "text/plain" or "text/html"
+        "source_language_code": source_language,
+        "target_language_code": target_language
+    }
+    # Adding the model to the request if a custom model ID is provided
+    if model_id:
+        request["model"] = f"{parent}/models/{model_id}"
+    return request
+
+def pack_translation_batches(texts, max_segments=TRANSLATE_BATCH_MAX_SEGMENTS, max_chars=TRANSLATE_BATCH_MAX_CHARS):
+    """Groups the indexes of the non-empty `texts` into consecutive batches within both limits.
+
+    A single text longer than `max_chars` gets a batch of its own.
+    """
+    batches, batch, batch_chars = [], [], 0
+    for index, text in enumerate(texts):
+        if not text:
+            continue
+        if batch and (len(batch) >= max_segments or batch_chars + len(text) > max_chars):
+            batches.append(batch)
+            batch, batch_chars = [], 0
+        batch.append(index)
+        batch_chars += len(text)
+    if batch:
+        batches.append(batch)
+    return batches
 
 def translate_text(text, source_language='en-US', target_language='es', model_id=None):
     """Translates text from one language to another using Google Cloud Translate."""
@@ -24,25 +84,39 @@ def translate_text(text, source_language='en-US', target_language='es', model_id
         logger.error("Failed to load Google Cloud credentials for Translate API")
         return None
 
-    project_id = credentials.project_id  # Use the centralized project_id
-    location = credentials.location  # Use the centralized location
-    parent = f"projects/{project_id}/locations/{location}"
+    request = _translation_request([text], source_language, target_language, model_id)
 
-    # Building the request
-    request = {
-        "parent": parent,
-        "contents": [text],
-        "mime_type": "text/plain",  # MIME types: "text/plain" or "text/html"
-        "source_language_code": source_language,
-        "target_language_code": target_language
-    }
+    try:
+        response = client.translate_text(request)
+        if response.translations:
+            translation = response.translations[0].translated_text
+            logger.info(f"Translated text: {translation}")
+            return translation
+    except Exception as e:
+        logger.error(f"Failed to translate text: {e}", exc_info=True)
+        return None
 
-    # Adding the model to the request if a custom model ID is provided
-    if model_id:
-        request["model"] = f"{parent}/models/{model_id}"
+    finally:
+        time_to_translate = time.time() - translate_start_time
+        logger.info(f"Time to translate: {time_to_translate:.2f} seconds")
+
+async def translate_text_async(text, source_language='en-US', target_language='es', model_id=None):
+    """Async version of translate_text for the ASGI app."""
+    translate_start_time = time.time()
+
+    if source_language[:2] == target_language[:2]:
+        logger.info("Source and target languages are the same. No translation needed.")
+        return text
+
+    client = credentials.get_async_translation_client()
+    if not client:
+        logger.error("Failed to load Google Cloud credentials for Translate API")
+        return None
+
+    request = _translation_request([text], source_language, target_language, model_id)
 
     try:
-        response = client.translate_text(request)
+        response = await client.translate_text(request)
         if response.translations:
             translation = response.translations[0].translated_text
             logger.info(f"Translated text: {translation}")
@@ -55,3 +129,75 @@ def translate_text(text, source_language='en-US', target_language='es', model_id
         time_to_translate = time.time() - translate_start_time
         logger.info(f"Time to translate: {time_to_translate:.2f} seconds")
 
+def _translate_batch(client, texts, batch, source_language, target_language, model_id):
+    batch_start_time = time.time()
+    request = _translation_request([texts[index] for index in batch], source_language, target_language, model_id)
+    try:
+        response = client.translate_text(request)
+        logger.info(f"Translated a batch of {len(batch)} segments in {time.time() - batch_start_time:.2f} seconds")
+        return [translation.translated_text for translation in response.translations]
+    except Exception as e:
+        logger.error(f"Failed to translate a batch of {len(batch)} segments: {e}", exc_info=True)
+        return None
+
+def _merge_batches(texts, batches, translated_batches):
+    # Empty segments stay empty; segments of a failed batch are None
+    results = ["" if not text else None for text in texts]
+    for batch, translations in zip(batches, translated_batches):
+        if translations is None or len(translations) != len(batch):
+            continue
+        for index, translation in zip(batch, translations):
+            results[index] = translation
+    return results
+
+def translate_texts(texts, source_language='en-US', target_language='es', model_id=None):
+    """Translates many segments with as few Google Cloud Translate calls as the batch limits allow.
+
+    The batches run concurrently. Returns the translations in the order of `texts`,
+    with None for segments whose batch failed, or None if the client is unavailable.
+    """
+    texts = list(texts)
+    if source_language[:2] == target_language[:2]:
+        return texts
+
+    client = credentials.get_translation_client()
+    if not client:
+        logger.error("Failed to load Google Cloud credentials for Translate API")
+        return None
+
+    translate_start_time = time.time()
+    batches = pack_translation_batches(texts)
+    executor = _get_batch_executor()
+    translated_batches = list(executor.map(
+        lambda batch: _translate_batch(client, texts, batch, source_language, target_language, model_id), batches))
+    logger.info(f"Translated {len(texts)} segments in {len(batches)} batches in {time.time() - translate_start_time:.2f} seconds")
+    return _merge_batches(texts, batches, translated_batches)
+
+async def translate_texts_async(texts, source_language='en-US', target_language='es', model_id=None):
+    """Async version of translate_texts for the ASGI app."""
+    texts = list(texts)
+    if source_language[:2] == target_language[:2]:
+        return texts
+
+    client = credentials.get_async_translation_client()
+    if not client:
+        logger.error("Failed to load Google Cloud credentials for Translate API")
+        return None
+
+    translate_start_time = time.time()
+    batches = pack_translation_batches(texts)
+    semaphore = asyncio.Semaphore(TRANSLATE_BATCH_CONCURRENCY)
+
+    async def translate_batch(batch):
+        async with semaphore:
+            request = _translation_request([texts[index] for index in batch], source_language, target_language, model_id)
+            try:
+                response = await client.translate_text(request)
+                return [translation.translated_text for translation in response.translations]
+            except Exception as e:
+                logger.error(f"Failed to translate a batch of {len(batch)} segments: {e}", exc_info=True)
+                return None
+
+    translated_batches = await asyncio.gather(*(translate_batch(batch) for batch in batches))
+    logger.info(f"Translated {len(texts)} segments in {len(batches)} batches in {time.time() - translate_start_time:.2f} seconds")
+    return _merge_batches(texts, batches, translated_batches)
@@ -0,0 +1,136 @@
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Bump whenever the GPT prompt changes so stale translations are never served
+PROMPT_VERSION = "2"
+
+
+def normalize_text(text):
+    """Normalizes a transcript so trivially different utterances share a cache entry."""
+    text = unicodedata.normalize("NFKC", text).casefold()
+    text = re.sub(r"\s+", " ", text).strip()
+    # Keep "?" so a question and a statement never share a translation
+    return text.rstrip(". 。")
+
+
+class TranslationCache:
+    """Exact-match translation cache: a bounded in-memory LRU with TTL, backed by an optional SQLite file.
+
+    Safe to share between threads. Set `path` to keep entries across restarts.
+    """
+
+    def __init__(self, max_entries=1024, ttl=7 * 24 * 3600, path=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path
+        self._entries = OrderedDict()  # key -> (expires_at, translation)
+        self._lock = threading.Lock()
+        self._db = None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._open()
+
+    def _open(self):
+        if not self.path:
+            return
+        try:
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS translations (key TEXT PRIMARY KEY, translation TEXT, expires_at REAL)")
+            self._db.execute("DELETE FROM translations WHERE expires_at < ?", (time.time(),))
+            self._db.commit()
+        except sqlite3.Error as e:
+            logger.error(f"Failed to open translation cache at {self.path}, using memory only: {e}")
+            self._db = None
+
+    def _reset_after_fork(self):
+        # A SQLite connection must not be used across fork; give the child its own
+        self._lock = threading.Lock()
+        self._open()
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    @staticmethod
+    def make_key(text, input_lang, output_lang, mode, prompt_version=PROMPT_VERSION):
+        raw = "\x1f".join([prompt_version, input_lang, output_lang, mode, normalize_text(text)])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry:
+                del self._entries[key]
+
+            if self._db:
+                row = self._db.execute("SELECT translation, expires_at FROM translations WHERE key = ?", (key,)).fetchone()
+                if row and row[1] > now:
+                    self._store(key, row[0], row[1])
+                    self.disk_hits += 1
+                    return row[0]
+
+            self.misses += 1
+            return None
+
+    def set(self, key, translation):
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._store(key, translation, expires_at)
+            if self._db:
+                try:
+                    self._db.execute("INSERT OR REPLACE INTO translations VALUES (?, ?, ?)", (key, translation, expires_at))
+                    self._db.commit()
+                except sqlite3.Error as e:
+                    logger.error(f"Failed to persist translation cache entry: {e}")
+
+    def _store(self, key, translation, expires_at):
+        self._entries[key] = (expires_at, translation)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._db:
+                self._db.execute("DELETE FROM translations")
+                self._db.commit()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                "persistent": self._db is not None,
+            }
+
+
+translation_cache = TranslationCache(
+    max_entries=int(os.environ.get("TRANSLATION_CACHE_SIZE", 1024)),
+    ttl=int(os.environ.get("TRANSLATION_CACHE_TTL", 7 * 24 * 3600)),
+    path=os.environ.get("TRANSLATION_CACHE_PATH"),
+)
+
+os.register_at_fork(after_in_child=translation_cache._reset_after_fork)
@@ -0,0 +1,189 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from .transcription import post_process_using_gpt, post_process_using_gpt_async, cached_gpt_translation
+from .translation import translate_text, translate_text_async
+from .hedging import ProviderStats
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# How a transcription is translated:
+#   gpt  - GPT post-processing only (the original behaviour)
+#   race - GPT and Google NMT in parallel; NMT is used when GPT misses TRANSLATION_GPT_BUDGET
+TRANSLATION_MODE = os.environ.get("TRANSLATION_MODE", "gpt")
+TRANSLATION_GPT_BUDGET = float(os.environ.get("TRANSLATION_GPT_BUDGET", 1.5))
+# Seconds past the budget to wait for either engine before giving up
+TRANSLATION_NMT_TIMEOUT = float(os.environ.get("TRANSLATION_NMT_TIMEOUT", 5))
+TRANSLATION_RACE_WORKERS = int(os.environ.get("TRANSLATION_RACE_WORKERS", 16))
+
+
+class TranslationRace:
+    """Outcome counters and latencies of GPT and NMT, for tuning the budget."""
+
+    def __init__(self):
+        self.engines = {"gpt": ProviderStats(), "nmt": ProviderStats()}
+        self.wins = {"gpt": 0, "nmt": 0}
+        self.gpt_over_budget = 0
+        self.cache_hits = 0  # Answered from the translation cache without racing
+        self.timeouts = 0  # Neither engine answered in time
+        self._lock = threading.Lock()
+        self._executor = None
+        self._background_tasks = set()  # Losing asyncio tasks, kept referenced until they finish
+
+    def get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=TRANSLATION_RACE_WORKERS, thread_name_prefix="translation-race")
+            return self._executor
+
+    def record(self, engine, latency, ok):
+        with self._lock:
+            stats = self.engines[engine]
+            stats.calls += 1
+            if ok:
+                stats.latencies.append(latency)
+            else:
+                stats.failures += 1
+        logger.info(f"Translation race: {engine} {'answered' if ok else 'failed'} in {latency:.2f} seconds")
+
+    def record_winner(self, engine, over_budget):
+        with self._lock:
+            self.wins[engine] += 1
+            self.engines[engine].wins += 1
+            self.gpt_over_budget += over_budget
+
+    def record_cache_hit(self):
+        with self._lock:
+            self.cache_hits += 1
+
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+        logger.error("Translation race: neither GPT nor NMT answered in time")
+
+    def stats(self):
+        with self._lock:
+            return {"mode": TRANSLATION_MODE, "budget": TRANSLATION_GPT_BUDGET, "wins": dict(self.wins),
+                    "gpt_over_budget": self.gpt_over_budget, "cache_hits": self.cache_hits, "timeouts": self.timeouts,
+                    "engines": {name: stats.to_dict() for name, stats in self.engines.items()}}
+
+    def reset_after_fork(self):
+        self._lock = threading.Lock()
+        self._executor = None
+        self._background_tasks = set()
+
+
+translation_race = TranslationRace()
+os.register_at_fork(after_in_child=translation_race.reset_after_fork)
+
+
+def _winner(engine, translated_text, over_budget):
+    if engine == "nmt":
+        logger.info(f"Translation race: GPT {'missed the budget' if over_budget else 'failed'}; using NMT")
+    translation_race.record_winner(engine, over_budget)
+    return translated_text
+
+
+def _timed(engine, function, *args):
+    start_time = time.time()
+    try:
+        result = function(*args)
+    except Exception as e:
+        logger.error(f"Translation race: {engine} raised: {e}", exc_info=True)
+        result = None
+    translation_race.record(engine, time.time() - start_time, result is not None)
+    return result
+
+
+def race_translation(transcription_text, mode, input_lang, output_lang, previous_texts=[], budget=None):
+    """Translates with GPT and Google NMT at the same time.
+
+    Returns GPT's translation if it arrives within `budget` seconds (default
+    TRANSLATION_GPT_BUDGET); after that, whichever engine answers first within
+    another TRANSLATION_NMT_TIMEOUT seconds, or None. The slower engine is left to
+    finish so both latencies are logged, and a late GPT answer still lands in the
+    translation cache. Cached GPT translations are returned without racing.
+    """
+    cached_translation = cached_gpt_translation(transcription_text, mode, input_lang, output_lang, previous_texts)
+    if cached_translation:
+        translation_race.record_cache_hit()
+        return cached_translation
+
+    budget = TRANSLATION_GPT_BUDGET if budget is None else budget
+    executor = translation_race.get_executor()
+    gpt = executor.submit(_timed, "gpt", post_process_using_gpt, transcription_text, mode, input_lang, output_lang, previous_texts)
+    nmt = executor.submit(_timed, "nmt", translate_text, transcription_text, input_lang, output_lang)
+
+    done, _ = wait([gpt], timeout=budget)
+    over_budget = not done
+    deadline = time.time() + TRANSLATION_NMT_TIMEOUT
+    pending = {future for future in (gpt, nmt) if not future.done()}
+    while True:
+        for engine, future in (("gpt", gpt), ("nmt", nmt)):
+            if future.done() and future.result() is not None:
+                return _winner(engine, future.result(), over_budget)
+        if not pending:
+            return None
+        done, pending = wait(pending, timeout=max(0.0, deadline - time.time()), return_when=FIRST_COMPLETED)
+        if not done:
+            translation_race.record_timeout()
+            return None
+
+
+async def race_translation_async(transcription_text, mode, input_lang, output_lang, previous_texts=[], budget=None):
+    """Async version of race_translation for the ASGI app."""
+    cached_translation = cached_gpt_translation(transcription_text, mode, input_lang, output_lang, previous_texts)
+    if cached_translation:
+        translation_race.record_cache_hit()
+        return cached_translation
+
+    budget = TRANSLATION_GPT_BUDGET if budget is None else budget
+
+    async def timed(engine, coroutine):
+        start_time = time.time()
+        try:
+            result = await coroutine
+        except Exception as e:
+            logger.error(f"Translation race: {engine} raised: {e}", exc_info=True)
+            result = None
+        translation_race.record(engine, time.time() - start_time, result is not None)
+        return result
+
+    gpt = asyncio.create_task(timed("gpt", post_process_using_gpt_async(transcription_text, mode, input_lang, output_lang, previous_texts)))
+    nmt = asyncio.create_task(timed("nmt", translate_text_async(transcription_text, input_lang, output_lang)))
+    for task in (gpt, nmt):
+        translation_race._background_tasks.add(task)
+        task.add_done_callback(translation_race._background_tasks.discard)
+
+    done, _ = await asyncio.wait({gpt}, timeout=budget)
+    over_budget = not done
+    deadline = time.time() + TRANSLATION_NMT_TIMEOUT
+    pending = {task for task in (gpt, nmt) if not task.done()}
+    while True:
+        for engine, task in (("gpt", gpt), ("nmt", nmt)):
+            if task.done() and task.result() is not None:
+                return _winner(engine, task.result(), over_budget)
+        if not pending:
+            return None
+        done, pending = await asyncio.wait(pending, timeout=max(0.0, deadline - time.time()), return_when=asyncio.FIRST_COMPLETED)
+        if not done:
+            translation_race.record_timeout()
+            return None
+
+
+def translate_transcription(transcription_text, mode, input_lang, output_lang, previous_texts=[]):
+    """Translates a transcription the way TRANSLATION_MODE says."""
+    if TRANSLATION_MODE == "race":
+        return race_translation(transcription_text, mode, input_lang, output_lang, previous_texts)
+    return post_process_using_gpt(transcription_text, mode, input_lang, output_lang, previous_texts)
+
+
+async def translate_transcription_async(transcription_text, mode, input_lang, output_lang, previous_texts=[]):
+    """Async version of translate_transcription."""
+    if TRANSLATION_MODE == "race":
+        return await race_translation_async(transcription_text, mode, input_lang, output_lang, previous_texts)
+    return await post_process_using_gpt_async(transcription_text, mode, input_lang, output_lang, previous_texts)
@@ -0,0 +1,168 @@
+import hashlib
+import json
+import logging
+import mmap
+import os
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Phrases the app speaks verbatim; synthesized once at startup so they never wait on TTS
+DEFAULT_PREWARM_PHRASES = ["No text was provided. Please try again."]
+
+
+class AudioCache:
+    """Content-addressed cache of synthesized speech.
+
+    Entries are keyed on everything that changes the audio (text, provider, voice,
+    model, settings). The memory tier is an LRU bounded by total bytes; the optional
+    disk tier keeps one file per entry under `directory`, bounded by `max_disk_bytes`,
+    and serves hits as memoryviews over memory-mapped files so they are never copied
+    onto the heap.
+    """
+
+    def __init__(self, max_bytes=32 * 1024 * 1024, directory=None, max_disk_bytes=512 * 1024 * 1024, max_open_maps=256):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+        self.max_open_maps = max_open_maps
+        self._entries = OrderedDict()  # key -> bytes
+        self._maps = OrderedDict()  # key -> mmap of the disk file
+        self._disk_sizes = OrderedDict()  # key -> file size, oldest first
+        self._size = 0
+        self._disk_size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            files = [entry for entry in os.scandir(directory) if entry.name.endswith(".audio")]
+            for entry in sorted(files, key=lambda entry: entry.stat().st_mtime):
+                self._disk_sizes[entry.name[:-len(".audio")]] = entry.stat().st_size
+                self._disk_size += entry.stat().st_size
+            logger.info(f"Voice cache found {len(self._disk_sizes)} entries ({self._disk_size} bytes) in {directory}")
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0 or bool(self.directory)
+
+    @staticmethod
+    def make_key(text, provider, voice, model, settings=None):
+        raw = json.dumps([text, provider, voice, model, settings or {}], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.audio")
+
+    def get(self, key):
+        """Returns the cached audio as a bytes-like object, or None."""
+        with self._lock:
+            audio = self._entries.get(key)
+            if audio is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return audio
+
+            if key in self._disk_sizes:
+                audio = self._map(key)
+                if audio is not None:
+                    self.disk_hits += 1
+                    return audio
+
+            self.misses += 1
+            return None
+
+    def _map(self, key):
+        mapped = self._maps.get(key)
+        if mapped is None:
+            try:
+                with open(self._path(key), "rb") as file:
+                    mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            except (OSError, ValueError) as e:
+                logger.error(f"Failed to map cached voice file {key}: {e}")
+                self._disk_size -= self._disk_sizes.pop(key, 0)
+                return None
+            self._maps[key] = mapped
+            # Dropped maps close once the last memoryview over them is released
+            while len(self._maps) > self.max_open_maps:
+                self._maps.popitem(last=False)
+        self._maps.move_to_end(key)
+        return memoryview(mapped)
+
+    def set(self, key, audio):
+        audio = bytes(audio)
+        with self._lock:
+            if 0 < len(audio) <= self.max_bytes:
+                if key in self._entries:
+                    self._size -= len(self._entries.pop(key))
+                self._entries[key] = audio
+                self._size += len(audio)
+                while self._size > self.max_bytes:
+                    _, evicted = self._entries.popitem(last=False)
+                    self._size -= len(evicted)
+
+            if self.directory and key not in self._disk_sizes:
+                self._write(key, audio)
+
+    def _write(self, key, audio):
+        temp_path = f"{self._path(key)}.{threading.get_ident()}.tmp"
+        try:
+            with open(temp_path, "wb") as file:
+                file.write(audio)
+            os.replace(temp_path, self._path(key))
+        except OSError as e:
+            logger.error(f"Failed to write cached voice file {key}: {e}")
+            return
+        self._disk_sizes[key] = len(audio)
+        self._disk_size += len(audio)
+        while self._disk_size > self.max_disk_bytes and self._disk_sizes:
+            evicted, size = self._disk_sizes.popitem(last=False)
+            self._maps.pop(evicted, None)
+            self._disk_size -= size
+            try:
+                os.unlink(self._path(evicted))
+            except OSError:
+                pass
+
+    def prewarm(self, phrases, synthesize):
+        """Synthesizes each phrase once through `synthesize`, which stores its result in this cache."""
+        for phrase in phrases:
+            if synthesize(phrase):
+                logger.info(f"Pre-warmed voice cache with: {phrase}")
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "disk_entries": len(self._disk_sizes),
+                "disk_bytes": self._disk_size,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            }
+
+
+def prewarm_phrases():
+    """Phrases to synthesize at startup: TTS_PREWARM_PHRASES (separated by "|") or the defaults."""
+    configured = os.environ.get("TTS_PREWARM_PHRASES")
+    if configured:
+        return [phrase.strip() for phrase in configured.split("|") if phrase.strip()]
+    return DEFAULT_PREWARM_PHRASES
+
+
+voice_cache = AudioCache(
+    max_bytes=int(os.environ.get("TTS_CACHE_BYTES", 32 * 1024 * 1024)),
+    directory=os.environ.get("TTS_CACHE_DIR"),
+    max_disk_bytes=int(os.environ.get("TTS_CACHE_DISK_BYTES", 512 * 1024 * 1024)),
+)
+
+# A lock held by another thread at fork time would never be released in the child
+os.register_at_fork(after_in_child=lambda: setattr(voice_cache, '_lock', threading.Lock()))
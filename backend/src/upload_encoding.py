@@ -0,0 +1,108 @@
+import logging
+import os
+import shutil
+import subprocess
+import time
+from .audio_headers import sniff_audio
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# How audio is encoded before it is uploaded to the STT provider:
+#   auto        - compress PCM only when the expected upload time saved beats the measured encode cost
+#   passthrough - send what we have
+#   flac / opus - always compress PCM with that codec
+STT_UPLOAD_ENCODING = os.environ.get("STT_UPLOAD_ENCODING", "auto")
+# Measured (or expected) uplink towards the STT provider, used by "auto"
+STT_UPLINK_BYTES_PER_SECOND = float(os.environ.get("STT_UPLINK_BYTES_PER_SECOND", 1_000_000))
+
+FFMPEG_AVAILABLE = shutil.which("ffmpeg") is not None
+
+CONTAINER_MIMETYPES = {
+    "wav": "audio/wav", "webm": "audio/webm", "matroska": "audio/x-matroska", "ogg": "audio/ogg",
+    "flac": "audio/flac", "mp3": "audio/mpeg", "mp4": "audio/mp4",
+}
+
+
+class UploadEncoder:
+    """Compresses PCM uploads with FFmpeg, keeping running estimates of the compression ratio and encode time."""
+
+    def __init__(self, name, codec_args, mimetype, ratio, seconds, smoothing=0.2):
+        self.name = name
+        self.codec_args = codec_args
+        self.mimetype = mimetype
+        self.ratio = ratio  # Output size / input size
+        self.seconds = seconds  # Wall time per encode, including the FFmpeg spawn
+        self.smoothing = smoothing
+        self.encodes = 0
+
+    def expected_saving(self, size, bytes_per_second=None):
+        """Seconds of upload time saved on `size` bytes, net of the encode cost. Negative means not worth it."""
+        bytes_per_second = bytes_per_second or STT_UPLINK_BYTES_PER_SECOND
+        return size * (1 - self.ratio) / bytes_per_second - self.seconds
+
+    def encode(self, audio_bytes):
+        """Returns the encoded audio, or None if FFmpeg failed."""
+        encode_start_time = time.time()
+        command = ['ffmpeg', '-v', 'error', '-i', 'pipe:0', *self.codec_args, 'pipe:1']
+        try:
+            result = subprocess.run(command, input=bytes(audio_bytes), check=True, capture_output=True)
+        except (OSError, subprocess.CalledProcessError) as e:
+            logger.error(f"Failed to encode upload as {self.name}: {getattr(e, 'stderr', e)}")
+            return None
+
+        seconds = time.time() - encode_start_time
+        ratio = len(result.stdout) / max(1, len(audio_bytes))
+        self.seconds += self.smoothing * (seconds - self.seconds)
+        self.ratio += self.smoothing * (ratio - self.ratio)
+        self.encodes += 1
+        logger.info(f"Encoded upload as {self.name}: {len(audio_bytes)} -> {len(result.stdout)} bytes in {seconds:.2f} seconds")
+        return result.stdout
+
+    def stats(self):
+        return {"ratio": round(self.ratio, 3), "seconds": round(self.seconds, 3), "encodes": self.encodes}
+
+
+# Priors until the first measurements come in: 16 kHz mono speech
+UPLOAD_ENCODERS = {
+    "flac": UploadEncoder("flac", ['-c:a', 'flac', '-f', 'flac'], "audio/flac", ratio=0.55, seconds=0.15),
+    "opus": UploadEncoder("opus", ['-c:a', 'libopus', '-b:a', '24k', '-application', 'voip', '-f', 'ogg'], "audio/ogg",
+                          ratio=0.1, seconds=0.15),
+}
+
+
+def _choose_encoder(size, encoding):
+    if encoding in UPLOAD_ENCODERS:
+        return UPLOAD_ENCODERS[encoding]
+    if encoding != "auto":
+        return None
+    best = max(UPLOAD_ENCODERS.values(), key=lambda encoder: encoder.expected_saving(size))
+    return best if best.expected_saving(size) > 0 else None
+
+
+def encode_for_upload(audio_bytes, encoding=None):
+    """Returns (payload, mimetype) for sending `audio_bytes` to the STT provider.
+
+    Audio that is already compressed (Opus, Vorbis, FLAC, MP3 from the browser) is
+    forwarded as is. PCM is compressed when `encoding` (default STT_UPLOAD_ENCODING)
+    asks for it and FFmpeg is available.
+    """
+    encoding = encoding or STT_UPLOAD_ENCODING
+    audio_info = sniff_audio(audio_bytes)
+    container = audio_info["container"] if audio_info else None
+    mimetype = CONTAINER_MIMETYPES.get(container, "audio/*")
+
+    if container != "wav" or encoding == "passthrough" or not FFMPEG_AVAILABLE:
+        return audio_bytes, mimetype
+
+    encoder = _choose_encoder(len(audio_bytes), encoding)
+    if encoder is None:
+        return audio_bytes, mimetype
+    encoded = encoder.encode(audio_bytes)
+    if encoded is None:
+        return audio_bytes, mimetype
+    return encoded, encoder.mimetype
+
+
+def upload_encoding_stats():
+    return {"encoding": STT_UPLOAD_ENCODING, "encoders": {name: encoder.stats() for name, encoder in UPLOAD_ENCODERS.items()}}
@@ -1,18 +1,38 @@
-import requests
+import asyncio
 import logging
 import json 
+import os
 import time
-import openai
-from .secret_manager import Credentials  # Adjusted import to use the centralized Credentials class
+from .secret_manager import get_credentials
+from .tts_cache import voice_cache, prewarm_phrases
+from .http_pool import get_http_session, get_async_httpx_client, HTTP_TIMEOUT
+from .output_formats import openai_response_format, eleven_labs_output_format, transcode
+from .provider_routing import ProviderRegistry, LocalFailure
 
 # Ensure the logger uses the same configuration
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
-credentials = Credentials()  # Create a Credentials instance for centralized management
+credentials = get_credentials()  # Process-wide registry shared by all modules
 
-def get_voice_id(voice, secret_id="ElevenLabsVoiceIDs"):
-    voice_ids_json = credentials._fetch_secret(secret_id)  # Use centralized method to get secret
+# Text-to-speech providers in order of preference; requests go to the fastest healthy one
+TTS_PROVIDERS = [name.strip() for name in os.environ.get("TTS_PROVIDERS", "openai,elevenlabs").split(",") if name.strip()]
+ELEVEN_LABS_API_URL = os.environ.get("ELEVEN_LABS_API_URL", "https://api.elevenlabs.io/v1")
+
+# Models and voice used unless a caller asks for others; the voice cache keys on them too
+OPENAI_TTS_VOICE = "onyx"
+OPENAI_TTS_MODEL = "tts-1"
+ELEVEN_LABS_MODEL_ID = "eleven_multilingual_v2"
+
+ELEVEN_LABS_VOICE_SETTINGS = {
+    "similarity_boost": 0.8,
+    "stability": 0.9,
+    "style": 0.10,
+    "use_speaker_boost": False
+}
+
+def get_voice_id(voice):
+    voice_ids_json = credentials.get_elevenlabs_voice_ids()  # Cached by the registry, not fetched per call
     if not voice_ids_json:
         logger.error("Failed to retrieve voice IDs JSON from Google Secret Manager.")
         return None
@@ -24,22 +44,77 @@ def get_voice_id(voice, secret_id="ElevenLabsVoiceIDs"):
         logger.error(f"Failed to decode voice IDs JSON: {e}")
         return None
 
-def generate_voice_file_openai(text, voice="onyx", model="tts-1", output_file="output_voice.mp3"):
-    api_key = credentials.get_openai_api_key()  # Use centralized method to get API key
-    if not api_key:
-        logger.error("Failed to retrieve API key for OpenAI voice generation")
+# What providers are asked for when the requested format has to be transcoded locally
+OPENAI_TRANSCODE_SOURCE = "wav"
+ELEVEN_LABS_TRANSCODE_SOURCE = "pcm_24000"
+ELEVEN_LABS_TRANSCODE_INPUT = ['-f', 's16le', '-ar', '24000', '-ac', '1']
+
+def _openai_cache_key(text, voice, model, output_format=None):
+    return voice_cache.make_key(text, "openai", voice, model, {"output": output_format} if output_format else None)
+
+def _eleven_labs_cache_key(text, voice, model_id, output_format=None):
+    settings = dict(ELEVEN_LABS_VOICE_SETTINGS, output=output_format) if output_format else ELEVEN_LABS_VOICE_SETTINGS
+    return voice_cache.make_key(text, "elevenlabs", voice, model_id, settings)
+
+class TranscodeError(LocalFailure):
+    """Provider audio could not be transcoded locally; the provider itself answered."""
+
+
+def _to_output_format(audio, output_format, native, input_args=()):
+    """Transcodes provider audio into `output_format` unless the provider produced it natively. Raises TranscodeError on failure."""
+    if native or not output_format:
+        return audio
+    voice_bytes = transcode(audio, output_format, input_args)
+    if voice_bytes is None:
+        raise TranscodeError(f"Failed to transcode voice to {output_format['format']}")
+    return voice_bytes
+
+def _cached_voice(cache_key):
+    if not voice_cache.enabled:
+        return None
+    voice_bytes = voice_cache.get(cache_key)
+    if voice_bytes is not None:
+        logger.info("Voice served from cache.")
+    return voice_bytes
+
+def synthesize_voice_openai(text, voice=OPENAI_TTS_VOICE, model=OPENAI_TTS_MODEL, output_format=None):
+    """OpenAI text-to-speech. Returns the audio bytes (MP3 unless `output_format` says otherwise) without touching the filesystem.
+
+    Returns None if the provider fails; raises TranscodeError if its audio cannot be converted to `output_format`.
+    """
+    cache_key = _openai_cache_key(text, voice, model, output_format)
+    cached_voice = _cached_voice(cache_key)
+    if cached_voice is not None:
+        return cached_voice
+
+    client = credentials.get_openai_client()  # Shared client over the pooled connections
+    if not client:
+        logger.error("Failed to load OpenAI client for voice generation")
         return None
 
     try:
-        client = openai.OpenAI(api_key=api_key)
-        response = client.audio.speech.create(model=model, voice=voice, input=text)
-        response.stream_to_file(output_file)
-        return output_file
+        response_format = openai_response_format(output_format)
+        response = client.audio.speech.create(model=model, voice=voice, input=text,
+                                              response_format=response_format or OPENAI_TRANSCODE_SOURCE)
     except Exception as e:
         logger.error(f"Error in generating voice file with OpenAI: {e}")
         return None
+    voice_bytes = _to_output_format(response.content, output_format, response_format)
+    if voice_cache.enabled and voice_bytes:
+        voice_cache.set(cache_key, voice_bytes)
+    return voice_bytes
+
+def generate_voice_file_openai(text, voice=OPENAI_TTS_VOICE, model=OPENAI_TTS_MODEL, output_file="output_voice.mp3"):
+    voice_bytes = synthesize_voice_openai(text, voice, model)
+    if not voice_bytes:
+        return None
+
+    with open(output_file, 'wb') as file:
+        file.write(voice_bytes)
+    return output_file
     
-def generate_voice_file_eleven_labs(text, voice, model_id="eleven_multilingual_v2", output_file="output_voice.mp3"):
+def _eleven_labs_request(text, voice, model_id, stream=False, provider_format=None):
+    """Builds the URL, payload and headers for an Eleven Labs text-to-speech call."""
     api_key = credentials.get_elevenlabs_api_key()  # Use centralized method to get API key
     if not api_key:
         logger.error("Failed to retrieve API key for Eleven Labs voice generation")
@@ -50,25 +125,248 @@ def generate_voice_file_eleven_labs(text, voice, model_id="eleven_multilingual_v
         logger.error(f"Failed to retrieve voice ID for {voice}")
         return None
 
-    url = f"https://api.elevenlabs.io/v1/text-to-speech/{voice_id}"
+    url = f"{ELEVEN_LABS_API_URL}/text-to-speech/{voice_id}"
+    if stream:
+        url += "/stream"
+    if provider_format:
+        url += f"?output_format={provider_format}"
     payload = {
         "model_id": model_id,
         "text": text,
-        "voice_settings": {
-            "similarity_boost": 0.8,
-            "stability": 0.9,
-            "style": 0.10,
-            "use_speaker_boost": False
-        }
+        "voice_settings": ELEVEN_LABS_VOICE_SETTINGS
     }
     headers = {"Content-Type": "application/json", "xi-api-key": api_key}
+    return url, payload, headers
+
+def synthesize_voice_eleven_labs(text, voice, model_id=ELEVEN_LABS_MODEL_ID, output_format=None):
+    """Eleven Labs text-to-speech. Returns the audio bytes (MP3 unless `output_format` says otherwise) without touching the filesystem.
+
+    Returns None if the provider fails; raises TranscodeError if its audio cannot be converted to `output_format`.
+    """
+    cache_key = _eleven_labs_cache_key(text, voice, model_id, output_format)
+    cached_voice = _cached_voice(cache_key)
+    if cached_voice is not None:
+        return cached_voice
+
+    native_format = eleven_labs_output_format(output_format)
+    provider_format = native_format or (ELEVEN_LABS_TRANSCODE_SOURCE if output_format else None)
+    eleven_labs_request = _eleven_labs_request(text, voice, model_id, provider_format=provider_format)
+    if not eleven_labs_request:
+        return None
+    url, payload, headers = eleven_labs_request
 
     try:
-        response = requests.post(url, json=payload, headers=headers)
+        response = get_http_session().post(url, json=payload, headers=headers, timeout=HTTP_TIMEOUT)
         response.raise_for_status()
-        with open(output_file, 'wb') as file:
-            file.write(response.content)
-        return output_file
     except Exception as e:
         logger.error(f"Error in generating voice file with Eleven Labs: {e}")
         return None
+    voice_bytes = _to_output_format(response.content, output_format, native_format, ELEVEN_LABS_TRANSCODE_INPUT)
+    if voice_cache.enabled and voice_bytes:
+        voice_cache.set(cache_key, voice_bytes)
+    return voice_bytes
+
+def generate_voice_file_eleven_labs(text, voice, model_id=ELEVEN_LABS_MODEL_ID, output_file="output_voice.mp3"):
+    voice_bytes = synthesize_voice_eleven_labs(text, voice, model_id)
+    if not voice_bytes:
+        return None
+
+    with open(output_file, 'wb') as file:
+        file.write(voice_bytes)
+    return output_file
+
+def stream_voice_openai(text, voice=OPENAI_TTS_VOICE, model=OPENAI_TTS_MODEL, chunk_size=4096):
+    """Yields MP3 chunks from OpenAI text-to-speech as they are synthesized. Returns whether the stream completed."""
+    cache_key = _openai_cache_key(text, voice, model)
+    cached_voice = _cached_voice(cache_key)
+    if cached_voice is not None:
+        yield cached_voice
+        return True
+
+    client = credentials.get_openai_client()
+    if not client:
+        logger.error("Failed to load OpenAI client for voice streaming")
+        return False
+
+    try:
+        with client.audio.speech.with_streaming_response.create(model=model, voice=voice, input=text) as response:
+            chunks = []
+            for chunk in response.iter_bytes(chunk_size):
+                chunks.append(chunk)
+                yield chunk
+        if voice_cache.enabled and chunks:
+            voice_cache.set(cache_key, b"".join(chunks))
+        return bool(chunks)
+    except Exception as e:
+        logger.error(f"Error in streaming voice with OpenAI: {e}")
+        return False
+
+def stream_voice_eleven_labs(text, voice, model_id=ELEVEN_LABS_MODEL_ID, chunk_size=4096):
+    """Yields MP3 chunks from the Eleven Labs streaming endpoint as they arrive. Returns whether the stream completed."""
+    cache_key = _eleven_labs_cache_key(text, voice, model_id)
+    cached_voice = _cached_voice(cache_key)
+    if cached_voice is not None:
+        yield cached_voice
+        return True
+
+    eleven_labs_request = _eleven_labs_request(text, voice, model_id, stream=True)
+    if not eleven_labs_request:
+        return False
+    url, payload, headers = eleven_labs_request
+
+    try:
+        with get_http_session().post(url, json=payload, headers=headers, stream=True, timeout=HTTP_TIMEOUT) as response:
+            response.raise_for_status()
+            chunks = []
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                if chunk:
+                    chunks.append(chunk)
+                    yield chunk
+        if voice_cache.enabled and chunks:
+            voice_cache.set(cache_key, b"".join(chunks))
+        return bool(chunks)
+    except Exception as e:
+        logger.error(f"Error in streaming voice with Eleven Labs: {e}")
+        return False
+
+async def synthesize_voice_openai_async(text, voice=OPENAI_TTS_VOICE, model=OPENAI_TTS_MODEL, output_format=None):
+    """Async OpenAI text-to-speech for the ASGI app. Returns the audio bytes (MP3 unless `output_format` says otherwise)."""
+    cache_key = _openai_cache_key(text, voice, model, output_format)
+    cached_voice = _cached_voice(cache_key)
+    if cached_voice is not None:
+        return cached_voice
+
+    client = credentials.get_async_openai_client()
+    if not client:
+        logger.error("Failed to load async OpenAI client for voice generation")
+        return None
+
+    try:
+        response_format = openai_response_format(output_format)
+        response = await client.audio.speech.create(model=model, voice=voice, input=text,
+                                                    response_format=response_format or OPENAI_TRANSCODE_SOURCE)
+    except Exception as e:
+        logger.error(f"Error in generating voice with OpenAI (async): {e}")
+        return None
+    voice_bytes = await asyncio.to_thread(_to_output_format, response.content, output_format, response_format)
+    if voice_cache.enabled and voice_bytes:
+        voice_cache.set(cache_key, voice_bytes)
+    return voice_bytes
+
+async def synthesize_voice_eleven_labs_async(text, voice, model_id=ELEVEN_LABS_MODEL_ID, output_format=None):
+    """Async Eleven Labs text-to-speech for the ASGI app. Returns the audio bytes (MP3 unless `output_format` says otherwise)."""
+    cache_key = _eleven_labs_cache_key(text, voice, model_id, output_format)
+    cached_voice = _cached_voice(cache_key)
+    if cached_voice is not None:
+        return cached_voice
+
+    native_format = eleven_labs_output_format(output_format)
+    provider_format = native_format or (ELEVEN_LABS_TRANSCODE_SOURCE if output_format else None)
+    eleven_labs_request = _eleven_labs_request(text, voice, model_id, provider_format=provider_format)
+    if not eleven_labs_request:
+        return None
+    url, payload, headers = eleven_labs_request
+
+    try:
+        response = await get_async_httpx_client().post(url, json=payload, headers=headers, timeout=30)
+        response.raise_for_status()
+    except Exception as e:
+        logger.error(f"Error in generating voice with Eleven Labs (async): {e}")
+        return None
+    voice_bytes = await asyncio.to_thread(_to_output_format, response.content, output_format, native_format,
+                                          ELEVEN_LABS_TRANSCODE_INPUT)
+    if voice_cache.enabled and voice_bytes:
+        voice_cache.set(cache_key, voice_bytes)
+    return voice_bytes
+
+def prewarm_voice_cache(phrases=None):
+    """Synthesizes the fixed phrases (default voice and model) so they are served from the cache."""
+    if not voice_cache.enabled:
+        return
+    voice_cache.prewarm(phrases or prewarm_phrases(), synthesize_voice_openai)
+
+def _probe_openai():
+    client = credentials.get_openai_client()
+    return bool(client and client.models.retrieve(OPENAI_TTS_MODEL))
+
+def _probe_eleven_labs():
+    api_key = credentials.get_elevenlabs_api_key()
+    if not api_key:
+        return False
+    get_http_session().get(f"{ELEVEN_LABS_API_URL}/models", headers={"xi-api-key": api_key}, timeout=5).raise_for_status()
+    return True
+
+TTS_CALLS = {"openai": synthesize_voice_openai, "elevenlabs": synthesize_voice_eleven_labs}
+# Values a request's tts_provider may take: a provider to pin, or auto to route
+TTS_PROVIDER_CHOICES = {"auto", *TTS_CALLS}
+tts_registry = ProviderRegistry("tts", [name for name in TTS_PROVIDERS if name in TTS_CALLS],
+                                probes={"openai": _probe_openai, "elevenlabs": _probe_eleven_labs})
+
+def _tts_candidates(provider):
+    """The providers a request may use: the one it pinned, or every configured one."""
+    return [provider] if provider in TTS_CALLS else tts_registry.providers
+
+def _cached_tts_voice(text, voice, candidates, output_format):
+    # A cache hit is not a provider call; serve it without routing so it does not skew the latency estimates
+    for name in candidates:
+        cache_key = (_openai_cache_key(text, OPENAI_TTS_VOICE, OPENAI_TTS_MODEL, output_format) if name == "openai"
+                     else _eleven_labs_cache_key(text, voice, ELEVEN_LABS_MODEL_ID, output_format))
+        cached_voice = _cached_voice(cache_key)
+        if cached_voice is not None:
+            return cached_voice
+    return None
+
+def synthesize_voice(text, voice, language=None, output_format=None, provider=None):
+    """Text-to-speech on `provider` if given, otherwise on the fastest healthy provider for `language`.
+
+    `voice` is the Eleven Labs voice name; OpenAI uses its default voice.
+    """
+    candidates = _tts_candidates(provider)
+    cached_voice = _cached_tts_voice(text, voice, candidates, output_format)
+    if cached_voice is not None:
+        return cached_voice
+    calls = {
+        "openai": lambda: synthesize_voice_openai(text, output_format=output_format),
+        "elevenlabs": lambda: synthesize_voice_eleven_labs(text, voice, output_format=output_format),
+    }
+    try:
+        return tts_registry.call(language, {name: calls[name] for name in candidates})
+    except TranscodeError as e:
+        logger.error(f"Voice generation failed: {e}")
+        return None
+
+async def synthesize_voice_async(text, voice, language=None, output_format=None, provider=None):
+    """Async version of synthesize_voice for the ASGI app."""
+    candidates = _tts_candidates(provider)
+    cached_voice = _cached_tts_voice(text, voice, candidates, output_format)
+    if cached_voice is not None:
+        return cached_voice
+    calls = {
+        "openai": lambda: synthesize_voice_openai_async(text, output_format=output_format),
+        "elevenlabs": lambda: synthesize_voice_eleven_labs_async(text, voice, output_format=output_format),
+    }
+    try:
+        return await tts_registry.call_async(language, {name: calls[name] for name in candidates})
+    except TranscodeError as e:
+        logger.error(f"Voice generation failed: {e}")
+        return None
+
+def stream_voice(text, voice, provider, language=None, chunk_size=4096):
+    """Yields MP3 chunks from `provider`'s streaming endpoint and records the call in tts_registry like synthesize_voice does.
+
+    Streams cannot fail over mid-way, so the provider is chosen up front (see
+    tts_registry.best). Cache hits and streams the client abandons are not recorded.
+    """
+    provider = provider if provider in TTS_CALLS else "openai"
+    cached_voice = _cached_tts_voice(text, voice, [provider], None)
+    if cached_voice is not None:
+        yield cached_voice
+        return
+
+    start_time = time.time()
+    if provider == "elevenlabs":
+        ok = yield from stream_voice_eleven_labs(text, voice, chunk_size=chunk_size)
+    else:
+        ok = yield from stream_voice_openai(text, chunk_size=chunk_size)
+    if provider in tts_registry.providers:
+        tts_registry.record(provider, language, time.time() - start_time, ok)
@@ -0,0 +1,87 @@
+"""Synthetic audio for the tests: WAV tones and noise, and minimal FLAC, Ogg, WebM, MP4 and MP3 headers."""
+import io
+import math
+import random
+import struct
+import wave
+
+
+def wav_bytes(samples, sample_rate=16000, channels=1):
+    """16-bit PCM WAV of float `samples` in [-1, 1], interleaved if `channels` > 1."""
+    output = io.BytesIO()
+    with wave.open(output, "wb") as wav_file:
+        wav_file.setnchannels(channels)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(struct.pack(f"<{len(samples)}h", *(int(max(-1.0, min(1.0, sample)) * 32767) for sample in samples)))
+    return output.getvalue()
+
+
+def tone(seconds, sample_rate=16000, frequency=220, amplitude=0.3):
+    return [amplitude * math.sin(2 * math.pi * frequency * index / sample_rate) for index in range(int(seconds * sample_rate))]
+
+
+def silence(seconds, sample_rate=16000):
+    return [0.0] * int(seconds * sample_rate)
+
+
+def noise(seconds, sample_rate=16000, amplitude=0.01, seed=0):
+    generator = random.Random(seed)
+    return [generator.uniform(-amplitude, amplitude) for _ in range(int(seconds * sample_rate))]
+
+
+def flac_header(sample_rate=44100, channels=2, total_samples=441000):
+    packed = sample_rate << 44 | (channels - 1) << 41 | 15 << 36 | total_samples
+    streaminfo = struct.pack(">HH", 4096, 4096) + b"\x00" * 6 + packed.to_bytes(8, "big") + b"\x00" * 16
+    return b"fLaC" + b"\x80" + len(streaminfo).to_bytes(3, "big") + streaminfo
+
+
+def ogg_page(packet, granule=0, sequence=0):
+    return (b"OggS" + bytes([0, 0]) + struct.pack("<qIII", granule, 1, sequence, 0)
+            + bytes([1, len(packet)]) + packet)
+
+
+def ogg_opus(seconds=2.0, pre_skip=312):
+    head = b"OpusHead" + bytes([1, 1]) + struct.pack("<HIhB", pre_skip, 48000, 0, 0)
+    return ogg_page(head) + ogg_page(b"\x00" * 10, granule=int(seconds * 48000) + pre_skip, sequence=1)
+
+
+def _ebml(element_id, body):
+    size = len(body)
+    return element_id.to_bytes((element_id.bit_length() + 7) // 8, "big") + (1 << 56 | size).to_bytes(8, "big") + body
+
+
+def webm_opus(seconds=2.0):
+    header = _ebml(0x1A45DFA3, _ebml(0x4282, b"webm"))
+    info = _ebml(0x1549A966, _ebml(0x2AD7B1, (1_000_000).to_bytes(3, "big")) + _ebml(0x4489, struct.pack(">d", seconds * 1000)))
+    audio = _ebml(0xE1, _ebml(0xB5, struct.pack(">d", 48000.0)) + _ebml(0x9F, bytes([2])))
+    tracks = _ebml(0x1654AE6B, _ebml(0xAE, _ebml(0x83, bytes([2])) + _ebml(0x86, b"A_OPUS") + audio))
+    # MediaRecorder writes the segment with an unknown size
+    return header + b"\x18\x53\x80\x67\x01\xff\xff\xff\xff\xff\xff\xff" + info + tracks
+
+
+MP3_FRAME_HEADER = 0xFFFB9064  # MPEG-1 layer III, 128 kbit/s, 44.1 kHz, joint stereo
+MP3_FRAME_LENGTH = 417  # 144 * 128000 / 44100
+
+
+def mp3_frames(count):
+    return (struct.pack(">I", MP3_FRAME_HEADER) + b"\x00" * (MP3_FRAME_LENGTH - 4)) * count
+
+
+def _box(box_type, body):
+    return struct.pack(">I", 8 + len(body)) + box_type + body
+
+
+def _full_box(box_type, body, version=0):
+    return _box(box_type, bytes([version, 0, 0, 0]) + body)
+
+
+def m4a_aac(seconds=3.0, sample_rate=44100, channels=1):
+    """An M4A (as Safari records) with one AAC sound track; durations are in mdhd at the sample rate's timescale."""
+    mdhd = _full_box(b"mdhd", struct.pack(">IIII", 0, 0, sample_rate, int(seconds * sample_rate)) + bytes(4))
+    hdlr = _full_box(b"hdlr", bytes(4) + b"soun" + bytes(12) + b"SoundHandler\x00")
+    entry = _box(b"mp4a", bytes(6) + struct.pack(">H", 1) + bytes(8) + struct.pack(">HHII", channels, 16, 0, sample_rate << 16))
+    stsd = _full_box(b"stsd", struct.pack(">I", 1) + entry)
+    trak = _box(b"trak", _box(b"mdia", mdhd + hdlr + _box(b"minf", _box(b"stbl", stsd))))
+    mvhd = _full_box(b"mvhd", struct.pack(">IIII", 0, 0, 1000, 0) + bytes(80))
+    return _box(b"ftyp", b"M4A " + bytes(4) + b"M4A isomiso2") + _box(b"moov", mvhd + trak) + _box(b"mdat", bytes(512))
@@ -0,0 +1,20 @@
+"""A WebSocket echo app for running under gunicorn in tests/test_gunicorn_config.py."""
+from flask import Flask
+from flask_sock import Sock
+
+app = Flask(__name__)
+sock = Sock(app)
+
+
+@app.route('/ping')
+def ping():
+    return "pong"
+
+
+@sock.route('/echo')
+def echo(ws):
+    while True:
+        message = ws.receive()
+        if message is None:
+            break
+        ws.send(message)
@@ -0,0 +1,70 @@
+import os
+import pytest
+from src.audio_delivery import AudioStore
+
+
+@pytest.fixture(params=["memory", "directory"])
+def store_factory(request, tmp_path):
+    def make(**kwargs):
+        return AudioStore(directory=str(tmp_path) if request.param == "directory" else None, **kwargs)
+    return make
+
+
+def test_round_trip(store_factory):
+    store = store_factory()
+    audio_id = store.put(b"voice", "audio/mpeg")
+    assert store.get(audio_id) == (b"voice", "audio/mpeg")
+    assert store.get("unknown") is None
+
+
+def test_expired(store_factory):
+    store = store_factory(ttl=-1)
+    assert store.get(store.put(b"voice", "audio/mpeg")) is None
+
+
+def test_oldest_dropped_over_max_bytes(store_factory):
+    store = store_factory(max_bytes=10)
+    first = store.put(b"123456", "audio/mpeg")
+    second = store.put(b"123456", "audio/mpeg")
+    assert store.get(first) is None
+    assert store.get(second) == (b"123456", "audio/mpeg")
+
+
+def test_directory_is_shared_between_stores(tmp_path):
+    # Two workers pointed at the same directory
+    audio_id = AudioStore(directory=str(tmp_path)).put(b"voice", "audio/ogg")
+    assert AudioStore(directory=str(tmp_path)).get(audio_id) == (b"voice", "audio/ogg")
+
+
+@pytest.mark.parametrize("audio_id", ["../secret", "", "a/b", "x" * 65])
+def test_directory_rejects_unsafe_ids(tmp_path, audio_id):
+    assert AudioStore(directory=str(tmp_path)).get(audio_id) is None
+
+
+def test_directory_created_on_first_put(tmp_path):
+    directory = tmp_path / "audio"
+    store = AudioStore(directory=str(directory))
+    assert not directory.exists()
+    assert store.get("unknown") is None
+    assert store.get(store.put(b"voice", "audio/mpeg")) == (b"voice", "audio/mpeg")
+
+
+def test_directory_sweeps_are_throttled(tmp_path, monkeypatch):
+    store = AudioStore(max_bytes=10, directory=str(tmp_path), purge_interval=60)
+    sweeps = []
+    purge_files = store._purge_files
+    monkeypatch.setattr(store, "_purge_files", lambda: sweeps.append(1) or purge_files())
+    store.put(b"1", "audio/mpeg")
+    store.put(b"2", "audio/mpeg")
+    assert len(sweeps) == 1  # The first put; the second is within the interval and budget
+    store.put(b"123456789", "audio/mpeg")
+    assert len(sweeps) == 2  # Over max_bytes, so it sweeps anyway
+
+
+def test_directory_expiry_read_from_mtime(tmp_path):
+    store = AudioStore(ttl=60, directory=str(tmp_path), purge_interval=0)
+    old = store.put(b"voice", "audio/mpeg")
+    past = os.path.getmtime(tmp_path / f"{old}.json") - 120
+    os.utime(tmp_path / f"{old}.json", (past, past))
+    store.put(b"voice", "audio/mpeg")
+    assert not (tmp_path / f"{old}.audio").exists()
@@ -0,0 +1,71 @@
+import struct
+import pytest
+from src.audio_headers import sniff_audio
+from audio_samples import MP3_FRAME_HEADER, flac_header, m4a_aac, mp3_frames, ogg_opus, silence, tone, wav_bytes, webm_opus
+
+
+def test_wav():
+    info = sniff_audio(wav_bytes(tone(1.5, 48000), 48000, channels=1))
+    assert info == {"container": "wav", "codec": "pcm_s16le", "sample_rate": 48000, "channels": 1, "duration_us": 1_500_000}
+
+
+def test_stereo_wav_duration_counts_frames_not_samples():
+    info = sniff_audio(wav_bytes(silence(2.0, 16000), 16000, channels=2))
+    assert info["channels"] == 2
+    assert info["duration_us"] == 1_000_000
+
+
+def test_flac():
+    info = sniff_audio(flac_header(sample_rate=44100, channels=2, total_samples=441000))
+    assert (info["container"], info["codec"], info["sample_rate"], info["channels"]) == ("flac", "flac", 44100, 2)
+    assert info["duration_us"] == 10_000_000
+
+
+def test_ogg_opus_duration_excludes_pre_skip():
+    info = sniff_audio(ogg_opus(seconds=2.0))
+    assert (info["container"], info["codec"], info["sample_rate"]) == ("ogg", "opus", 48000)
+    assert info["duration_us"] == 2_000_000
+
+
+def test_webm_opus_with_unknown_size_segment():
+    info = sniff_audio(webm_opus(seconds=2.5))
+    assert (info["container"], info["codec"], info["sample_rate"], info["channels"]) == ("webm", "opus", 48000, 2)
+    assert info["duration_us"] == 2_500_000
+
+
+def test_mp3_duration_from_bitrate():
+    info = sniff_audio(mp3_frames(100))
+    assert (info["container"], info["codec"], info["sample_rate"], info["channels"]) == ("mp3", "mp3", 44100, 2)
+    assert info["duration_us"] == pytest.approx(100 * 1152 / 44100 * 1_000_000, rel=0.01)
+
+
+def test_mp3_after_id3_tag():
+    tag = b"ID3\x04\x00\x00\x00\x00\x00\x0a" + b"\x00" * 10
+    assert sniff_audio(tag + mp3_frames(10))["container"] == "mp3"
+
+
+def test_m4a_is_not_mistaken_for_mp3():
+    info = sniff_audio(m4a_aac(seconds=3.0, sample_rate=44100, channels=1))
+    assert info == {"container": "mp4", "codec": "aac", "sample_rate": 44100, "channels": 1, "duration_us": 3_000_000}
+
+
+def test_one_frame_sync_is_not_mp3():
+    # A stray 0xFFE sync followed by garbage, and a lone frame with nothing after it
+    assert sniff_audio(bytes(100) + b"\xff\xfb\x90\x64" + bytes(100) + b"\xff\x00" * 300) is None
+    assert sniff_audio(mp3_frames(1)) is None
+
+
+def test_second_frame_must_agree():
+    other = struct.pack(">I", MP3_FRAME_HEADER & ~(0x3 << 10) | 0x1 << 10)  # 48 kHz
+    frame = mp3_frames(1)
+    assert sniff_audio(frame + other + bytes(400)) is None
+
+
+@pytest.mark.parametrize("data", [b"", b"not audio at all", bytes(4096)])
+def test_unrecognized(data):
+    assert sniff_audio(data) is None
+
+
+def test_truncated_headers_do_not_raise():
+    assert sniff_audio(webm_opus()[:30])["container"] == "webm"
+    assert sniff_audio(wav_bytes(tone(0.1))[:44])["container"] == "wav"
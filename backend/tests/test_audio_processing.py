@@ -0,0 +1,51 @@
+import logging
+from src import audio_processing
+from audio_samples import silence, tone, wav_bytes, webm_opus
+
+
+def test_vad_on_wav():
+    assert not audio_processing.contains_speech(wav_bytes(silence(1.0)))
+    assert audio_processing.contains_speech(wav_bytes(tone(1.0)))
+
+
+def test_vad_decodes_compressed_uploads(monkeypatch):
+    decoded = []
+
+    def ffmpeg(audio_bytes, trim_silence=True):
+        decoded.append(trim_silence)
+        return wav_bytes(silence(1.0))
+
+    monkeypatch.setattr(audio_processing, "_convert_audio_bytes_with_ffmpeg", ffmpeg)
+    speech, audio = audio_processing.check_speech(webm_opus(seconds=1.0))
+    assert not speech
+    # Trimming before the check would hide how much of the upload is silence
+    assert decoded == [False]
+    # STT gets the decoded audio rather than decoding the upload again
+    assert audio == wav_bytes(silence(1.0))
+
+
+def test_long_compressed_uploads_are_not_decoded(monkeypatch):
+    def ffmpeg(audio_bytes, trim_silence=True):
+        raise AssertionError("a long upload was decoded for the voice activity check")
+
+    monkeypatch.setattr(audio_processing, "_convert_audio_bytes_with_ffmpeg", ffmpeg)
+    upload = webm_opus(seconds=30.0)
+    assert audio_processing.check_speech(upload) == (True, upload)
+    # Without a duration in the header the size decides
+    unknown_duration = b"\x1a\x45\xdf\xa3" + bytes(audio_processing.VAD_DECODE_MAX_BYTES)
+    assert audio_processing.check_speech(unknown_duration) == (True, unknown_duration)
+
+
+def test_vad_skipped_when_compressed_upload_cannot_be_decoded(monkeypatch, caplog):
+    monkeypatch.setattr(audio_processing, "_convert_audio_bytes_with_ffmpeg", lambda audio_bytes, trim_silence=True: None)
+    with caplog.at_level(logging.WARNING, logger="src.audio_processing"):
+        assert audio_processing.contains_speech(webm_opus())
+    assert "Voice activity check skipped" in caplog.text
+
+
+def test_missing_ffmpeg_is_a_failed_conversion(monkeypatch):
+    def missing(*args, **kwargs):
+        raise FileNotFoundError("ffmpeg")
+
+    monkeypatch.setattr(audio_processing.subprocess, "run", missing)
+    assert audio_processing._convert_audio_bytes_with_ffmpeg(webm_opus()) is None
@@ -0,0 +1,87 @@
+import asyncio
+import io
+import pytest
+
+pytest.importorskip("quart")
+import app
+import asgi
+from werkzeug.datastructures import FileStorage
+from src.audio_delivery import AudioStore
+
+
+def test_asgi_audio_honours_if_none_match(tmp_path, monkeypatch):
+    monkeypatch.setattr(asgi, "audio_store", AudioStore(directory=str(tmp_path)))
+
+    async def fetch():
+        client = asgi.app.test_client()
+        audio_id = asgi.audio_store.put(b"0123456789", "audio/mpeg")
+        first = await client.get(f"/audio/{audio_id}")
+        again = await client.get(f"/audio/{audio_id}", headers={"If-None-Match": first.headers["ETag"]})
+        partial = await client.get(f"/audio/{audio_id}", headers={"Range": "bytes=2-4"})
+        return first, again, partial, await partial.get_data()
+
+    first, again, partial, partial_body = asyncio.run(fetch())
+    assert first.status_code == 200
+    assert again.status_code == 304
+    assert (partial.status_code, partial_body) == (206, b"234")
+
+
+@pytest.mark.parametrize("path", ["/process-audio", "/process-audio-stream"])
+def test_flask_rejects_unknown_tts_provider(path):
+    response = app.app.test_client().post(path, data={"audio": (io.BytesIO(b"RIFF"), "tap.wav"), "tts_provider": "polly"},
+                                          content_type="multipart/form-data")
+    assert response.status_code == 400
+
+
+def test_asgi_rejects_unknown_tts_provider():
+    async def post():
+        return await asgi.app.test_client().post("/process-audio", form={"tts_provider": "polly"},
+                                                 files={"audio": FileStorage(io.BytesIO(b"RIFF"), "tap.wav")})
+
+    assert asyncio.run(post()).status_code == 400
+
+
+def test_empty_upload_is_a_bad_request():
+    response = app.app.test_client().post("/process-audio", data={"audio": (io.BytesIO(b""), "empty.webm")},
+                                          content_type="multipart/form-data")
+    assert response.status_code == 400
+
+
+@pytest.fixture
+def batch_submissions(monkeypatch):
+    """Shrinks the upload limits and records what each app hands to batch_jobs.submit."""
+    submissions = []
+
+    def submit(files, options):
+        submissions.append([(filename, type(audio).__name__, audio.read()) for filename, audio in files])
+        return {"id": "job", "status": "queued"}
+
+    for module in (app, asgi):
+        monkeypatch.setattr(module.batch_jobs, "submit", submit)
+        monkeypatch.setattr(module, "BATCH_MAX_UPLOAD_BYTES", 4 * 1024 * 1024)
+        monkeypatch.setitem(module.app.config, "MAX_CONTENT_LENGTH", 1024 * 1024)
+    return submissions
+
+
+def test_flask_batch_uploads_have_their_own_limit_and_are_spooled(batch_submissions):
+    client = app.app.test_client()
+    recording = b"x" * (2 * 1024 * 1024)
+    response = client.post("/batch-jobs", data={"audio": (io.BytesIO(recording), "visit.webm")}, content_type="multipart/form-data")
+    assert response.status_code == 202
+    [[(filename, stream_type, audio)]] = batch_submissions
+    assert (filename, audio) == ("visit.webm", recording)
+    assert stream_type != "BytesIO"  # Spooled to disk, not held in memory
+
+    response = client.post("/process-audio", data={"audio": (io.BytesIO(recording), "tap.webm")}, content_type="multipart/form-data")
+    assert response.status_code == 413
+
+
+def test_asgi_batch_uploads_have_their_own_limit(batch_submissions):
+    recording = b"x" * (2 * 1024 * 1024)
+
+    async def post(path):
+        return await asgi.app.test_client().post(path, files={"audio": FileStorage(io.BytesIO(recording), "visit.webm")})
+
+    assert asyncio.run(post("/batch-jobs")).status_code == 202
+    assert batch_submissions[0][0][2] == recording
+    assert asyncio.run(post("/process-audio")).status_code == 413
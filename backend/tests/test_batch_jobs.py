@@ -0,0 +1,144 @@
+import importlib
+import pytest
+
+# src re-exports the `batch_jobs` object under the module's name
+batch_jobs = importlib.import_module("src.batch_jobs")
+
+
+@pytest.fixture
+def allowed(monkeypatch):
+    monkeypatch.setattr(batch_jobs, "BATCH_CALLBACK_HOSTS", {"hooks.example.com"})
+
+
+def test_callbacks_disabled_without_an_allowlist(monkeypatch):
+    monkeypatch.setattr(batch_jobs, "BATCH_CALLBACK_HOSTS", set())
+    assert batch_jobs.batch_options({})["callback_url"] is None
+    with pytest.raises(ValueError):
+        batch_jobs.batch_options({"callback_url": "https://hooks.example.com/done"})
+
+
+def test_allowed_callback(allowed):
+    options = batch_jobs.batch_options({"callback_url": "https://Hooks.Example.com:8443/done"})
+    assert options["callback_url"] == "https://Hooks.Example.com:8443/done"
+
+
+@pytest.mark.parametrize("callback_url", [
+    "http://hooks.example.com/done",
+    "https://169.254.169.254/latest/meta-data",
+    "https://localhost/admin",
+    "https://hooks.example.com@10.0.0.1/done",
+    "https://hooks.example.com.evil.net/done",
+    "https://hooks.example.com:bad/done",
+    "file:///etc/passwd",
+])
+def test_rejected_callbacks(allowed, callback_url):
+    with pytest.raises(ValueError):
+        batch_jobs.batch_options({"callback_url": callback_url})
+
+
+def test_stored_callback_is_checked_again_when_the_job_finishes(tmp_path, monkeypatch):
+    posted = []
+
+    class Session:
+        def post(self, url, **kwargs):
+            posted.append((url, kwargs))
+
+    monkeypatch.setattr(batch_jobs, "get_http_session", Session)
+    jobs = batch_jobs.BatchJobs(root=str(tmp_path), workers=0)
+    monkeypatch.setattr(jobs, "start", lambda: None)
+    monkeypatch.setattr(batch_jobs, "BATCH_CALLBACK_HOSTS", {"hooks.example.com"})
+    job = jobs.submit([], {"callback_url": "https://hooks.example.com/done"})
+    assert [url for url, _ in posted] == ["https://hooks.example.com/done"]
+    assert posted[0][1]["allow_redirects"] is False
+    assert jobs.get(job["id"])["status"] == batch_jobs.COMPLETED
+
+    # The allowlist changed after this job was stored
+    monkeypatch.setattr(batch_jobs, "BATCH_CALLBACK_HOSTS", set())
+    jobs.submit([], {"callback_url": "https://hooks.example.com/done"})
+    assert len(posted) == 1
+
+
+def test_split_text_keeps_sentences_whole():
+    text = "First sentence here. Second one! " + "word " * 30 + "end."
+    segments = batch_jobs.split_text(text, 40)
+    assert segments[0] == "First sentence here. Second one!"
+    assert all(len(segment) <= 40 for segment in segments)
+    assert " ".join(segments).split() == text.split()
+
+
+@pytest.fixture
+def pipeline(tmp_path, monkeypatch):
+    """A BatchJobs whose items are processed by calling _process, with the providers stubbed."""
+    monkeypatch.setattr(batch_jobs, "get_audio_info", lambda audio_bytes: None)
+    monkeypatch.setattr(batch_jobs, "normalize_audio_bytes", lambda audio_bytes: audio_bytes)
+    monkeypatch.setattr(batch_jobs, "check_speech", lambda audio_bytes: (True, audio_bytes))
+    monkeypatch.setattr(batch_jobs, "transcribe_audio", lambda audio_bytes, lang: audio_bytes.decode())
+    monkeypatch.setattr(batch_jobs, "translate_transcription", lambda text, *args, **kwargs: f"gpt:{text}")
+    jobs = batch_jobs.BatchJobs(root=str(tmp_path), workers=0)
+    monkeypatch.setattr(jobs, "start", lambda: None)
+    return jobs
+
+
+def run_job(jobs, transcript, synthesize_voice=False):
+    options = batch_jobs.batch_options({"synthesize_voice": str(synthesize_voice)})
+    job = jobs.submit([("visit.wav", transcript.encode())], options)
+    jobs._process(job["id"], 0)
+    return jobs.get(job["id"])
+
+
+def test_voice_failure_keeps_the_text(pipeline, monkeypatch):
+    monkeypatch.setattr(batch_jobs, "synthesize_voice", lambda *args: None)
+    item = run_job(pipeline, "Hello there.", synthesize_voice=True)["items"][0]
+    assert item["status"] == batch_jobs.DONE
+    assert item["result"]["translated_text"] == "gpt:Hello there."
+    assert item["result"]["voice"] is False
+    assert item["result"]["voice_error"] == "Voice generation failed"
+
+
+def test_long_transcript_is_translated_and_spoken_in_segments(pipeline, monkeypatch):
+    monkeypatch.setattr(batch_jobs, "BATCH_TRANSLATE_SEGMENT_CHARS", 30)
+    monkeypatch.setattr(batch_jobs, "BATCH_TTS_MAX_CHARS", 40)
+    batches, spoken = [], []
+    # The second segment's batch fails and falls back to GPT
+    monkeypatch.setattr(batch_jobs, "translate_texts",
+                        lambda texts, *args: batches.append(texts) or [f"nmt:{text}" if i != 1 else None for i, text in enumerate(texts)])
+    monkeypatch.setattr(batch_jobs, "synthesize_voice", lambda text, *args: spoken.append(text) or b"mp3")
+
+    job = run_job(pipeline, "The tooth hurts a lot. Since last week. When I eat cold things.", synthesize_voice=True)
+    result = job["items"][0]["result"]
+    assert batches == [["The tooth hurts a lot.", "Since last week.", "When I eat cold things."]]
+    assert result["translated_text"] == "nmt:The tooth hurts a lot. gpt:Since last week. nmt:When I eat cold things."
+    assert all(len(text) <= 40 for text in spoken) and len(spoken) > 1
+    assert result["voice"] is True
+    assert pipeline.voice(job["id"], 0)[0] == b"mp3" * len(spoken)
+
+
+def test_completed_jobs_expire_and_are_not_reread(pipeline, monkeypatch):
+    job_id = run_job(pipeline, "Hello there.")["id"]
+    reads = []
+    read_job = pipeline._read_job
+    monkeypatch.setattr(pipeline, "_read_job", lambda job_id: reads.append(job_id) or read_job(job_id))
+
+    pipeline.resume()
+    assert reads == [] and pipeline.get(job_id) is not None
+
+    monkeypatch.setattr(batch_jobs, "BATCH_RETENTION_SECONDS", 0)
+    pipeline.resume()
+    assert pipeline.get(job_id) is None
+
+
+def test_expired_jobs_found_on_startup_are_deleted(pipeline, tmp_path, monkeypatch):
+    job_id = run_job(pipeline, "Hello there.")["id"]
+    monkeypatch.setattr(batch_jobs, "BATCH_RETENTION_SECONDS", 0)
+    restarted = batch_jobs.BatchJobs(root=str(tmp_path), workers=0)
+    monkeypatch.setattr(restarted, "start", lambda: None)
+    restarted.resume()
+    assert restarted.get(job_id) is None
+
+
+def test_one_idle_worker_rescans_per_interval(pipeline):
+    pipeline.resume()
+    assert not pipeline._rescan_due()
+    pipeline._last_scan -= batch_jobs.BATCH_RESCAN_INTERVAL
+    assert pipeline._rescan_due()
+    assert not pipeline._rescan_due()
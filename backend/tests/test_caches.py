@@ -0,0 +1,88 @@
+from src.translation_cache import TranslationCache, normalize_text
+from src.tts_cache import AudioCache
+
+
+def test_normalize_text():
+    assert normalize_text("  Hello   World. ") == "hello world"
+    assert normalize_text("Ｈｅｌｌｏ") == "hello"
+
+
+def test_translation_key_keeps_questions_apart():
+    key = TranslationCache.make_key
+    assert key("Does it hurt", "en-US", "ko", "patient") == key("does it  hurt.", "en-US", "ko", "patient")
+    assert key("Does it hurt", "en-US", "ko", "patient") != key("Does it hurt?", "en-US", "ko", "patient")
+    assert key("Does it hurt", "en-US", "ko", "patient") != key("Does it hurt", "en-US", "es", "patient")
+
+
+def test_translation_cache_lru():
+    cache = TranslationCache(max_entries=2)
+    cache.set("a", "A")
+    cache.set("b", "B")
+    cache.get("a")
+    cache.set("c", "C")
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == ("A", None, "C")
+
+
+def test_translation_cache_ttl():
+    cache = TranslationCache(ttl=-1)
+    cache.set("a", "A")
+    assert cache.get("a") is None
+
+
+def test_translation_cache_persists(tmp_path):
+    path = str(tmp_path / "translations.db")
+    TranslationCache(path=path).set("a", "A")
+    cache = TranslationCache(path=path)
+    assert cache.get("a") == "A"
+    assert cache.stats()["disk_hits"] == 1
+
+
+def test_audio_cache_bounded_by_bytes():
+    cache = AudioCache(max_bytes=10)
+    cache.set("a", b"12345")
+    cache.set("b", b"12345")
+    cache.set("c", b"12345")
+    assert cache.get("a") is None
+    assert bytes(cache.get("c")) == b"12345"
+    assert cache.stats()["bytes"] == 10
+
+
+def test_audio_cache_skips_entries_larger_than_memory():
+    cache = AudioCache(max_bytes=4)
+    cache.set("a", b"12345")
+    assert cache.get("a") is None
+
+
+def test_audio_cache_disk_tier(tmp_path):
+    AudioCache(max_bytes=0, directory=str(tmp_path)).set("a", b"audio")
+    cache = AudioCache(max_bytes=0, directory=str(tmp_path))
+    audio = cache.get("a")
+    assert isinstance(audio, memoryview)
+    assert bytes(audio) == b"audio"
+
+
+def test_audio_cache_disk_eviction(tmp_path):
+    cache = AudioCache(max_bytes=0, directory=str(tmp_path), max_disk_bytes=8)
+    cache.set("a", b"1234")
+    cache.set("b", b"1234")
+    cache.set("c", b"1234")
+    assert cache.get("a") is None
+    assert not (tmp_path / "a.audio").exists()
+    assert bytes(cache.get("c")) == b"1234"
+
+
+def test_audio_cache_key_covers_settings():
+    key = AudioCache.make_key
+    assert key("hi", "openai", "onyx", "tts-1") == key("hi", "openai", "onyx", "tts-1", {})
+    assert key("hi", "openai", "onyx", "tts-1") != key("hi", "openai", "onyx", "tts-1", {"format": "wav"})
+
+
+def test_short_turns_are_cached_despite_context(monkeypatch):
+    from src import transcription
+    monkeypatch.setattr(transcription, "translation_cache", TranslationCache(max_entries=10))
+    context = [{"person_type": "doctor", "text": "Let's take a look."}]
+    short_key = transcription._translation_cache_key("Open wide, please.", "doctor", "en-US", "ko", context)
+    assert short_key == transcription._translation_cache_key("Open wide, please.", "doctor", "en-US", "ko", [])
+    long_text = "The crown on your upper left molar has a small crack we should replace soon."
+    assert transcription._translation_cache_key(long_text, "doctor", "en-US", "ko", context) is None
+    assert transcription._translation_cache_key(long_text, "doctor", "en-US", "ko", []) is not None
@@ -0,0 +1,131 @@
+import importlib
+import time
+import types
+from src.conversation_buffer import ConversationBuffer
+
+# src re-exports the `conversation_buffer` object under the module's name
+buffer_module = importlib.import_module("src.conversation_buffer")
+
+
+def turn(text):
+    return {"id": text, "text": text}
+
+
+def test_recent_turns_oldest_first():
+    written = []
+    buffer = ConversationBuffer(written.extend, flush_interval=0)
+    for text in ["one", "two", "three", "four"]:
+        buffer.append("s", turn(text))
+    assert [entry["text"] for entry in buffer.recent("s", 3)] == ["two", "three", "four"]
+    assert buffer.flush()
+    assert [entry["text"] for _, entry in written] == ["one", "two", "three", "four"]
+
+
+def test_hydrate_keeps_pending_turns():
+    buffer = ConversationBuffer(lambda batch: None, flush_interval=10)
+    buffer.append("s", turn("pending"))
+    buffer._sessions.clear()
+    buffer.hydrate("s", [turn("stored")])
+    assert [entry["text"] for entry in buffer.recent("s")] == ["stored", "pending"]
+
+
+def test_least_recently_used_session_is_dropped():
+    buffer = ConversationBuffer(lambda batch: None, max_sessions=2)
+    buffer.hydrate("a", [turn("one")])
+    buffer.hydrate("b", [turn("one")])
+    buffer.recent("a")
+    buffer.hydrate("c", [turn("one")])
+    assert buffer.hydrated("a") and buffer.hydrated("c")
+    assert not buffer.hydrated("b")
+
+
+def test_failed_writes_are_retried():
+    attempts = []
+
+    def flaky(batch):
+        attempts.append(batch)
+        if len(attempts) == 1:
+            raise RuntimeError("unavailable")
+
+    buffer = ConversationBuffer(flaky, flush_interval=0)
+    buffer.append("s", turn("one"))
+    assert buffer.flush()
+    assert len(attempts) == 2
+
+
+def test_clear_drops_queued_writes():
+    written = []
+    buffer = ConversationBuffer(written.extend, flush_interval=10)
+    buffer.append("s", turn("one"))
+    buffer.clear("s")
+    assert buffer.recent("s") == []
+    assert buffer.flush(timeout=0.1)
+    assert written == []
+
+
+def fake_clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(buffer_module, "time", types.SimpleNamespace(time=lambda: now[0], sleep=time.sleep))
+    return now
+
+
+def test_stale_session_is_refreshed_once(monkeypatch):
+    now = fake_clock(monkeypatch)
+    buffer = ConversationBuffer(lambda batch: None, max_age=30)
+    buffer.hydrate("s", [turn("one")])
+    buffer.hydrate("s", [turn("one"), turn("ignored")])
+    assert not buffer.claim_refresh("s")
+    assert [entry["text"] for entry in buffer.recent("s")] == ["one"]
+
+    # Another worker recorded a turn in the meantime; the old turns are served until the refresh lands
+    now[0] += 30
+    assert buffer.claim_refresh("s")
+    assert not buffer.claim_refresh("s")
+    assert [entry["text"] for entry in buffer.recent("s")] == ["one"]
+    buffer.hydrate("s", [turn("one"), turn("from another worker")])
+    assert [entry["text"] for entry in buffer.recent("s")] == ["one", "from another worker"]
+    assert not buffer.claim_refresh("s")
+
+
+def test_failed_refresh_can_be_claimed_again(monkeypatch):
+    now = fake_clock(monkeypatch)
+    buffer = ConversationBuffer(lambda batch: None, max_age=30)
+    buffer.hydrate("s", [turn("one")])
+    now[0] += 30
+    assert buffer.claim_refresh("s")
+    buffer.end_refresh("s")
+    assert buffer.claim_refresh("s")
+
+
+def test_refresh_keeps_turns_added_while_reading(monkeypatch):
+    now = fake_clock(monkeypatch)
+    written = []
+    buffer = ConversationBuffer(written.extend, flush_interval=10, max_age=30)
+    buffer.hydrate("s", [turn("one")])
+    now[0] += 30
+    assert buffer.claim_refresh("s")
+    buffer.append("s", turn("written"))
+    buffer._pending.clear()  # Written before the refresh's read finished, but not part of it
+    buffer._writing = [("s", 1, turn("writing"))]
+    buffer.append("s", turn("pending"))
+    buffer.hydrate("s", [turn("one")])
+    assert [entry["text"] for entry in buffer.recent("s", 10)] == ["one", "written", "writing", "pending"]
+
+
+def test_refresh_racing_a_clear_is_dropped(monkeypatch):
+    now = fake_clock(monkeypatch)
+    buffer = ConversationBuffer(lambda batch: None, max_age=30)
+    buffer.hydrate("s", [turn("one")])
+    now[0] += 30
+    assert buffer.claim_refresh("s")
+    buffer.clear("s")
+    buffer.hydrate("s", [turn("one")])  # Read before the stored turns were deleted
+    assert buffer.recent("s") == []
+
+
+def test_without_max_age_a_session_is_read_once():
+    buffer = ConversationBuffer(lambda batch: None)
+    buffer.hydrate("s", [turn("one")])
+    assert not buffer.claim_refresh("s")
+    buffer.hydrate("s", [turn("two")])
+    assert [entry["text"] for entry in buffer.recent("s")] == ["one"]
@@ -0,0 +1,29 @@
+from src.glossary import TermMatcher, relevant_dental_terms
+
+
+def test_full_phrase_case_insensitive():
+    assert relevant_dental_terms("We will need a ROOT CANAL on that tooth") == ["root canal"]
+
+
+def test_plurals():
+    assert relevant_dental_terms("Two implants and three fillings") == ["filling", "implant"]
+
+
+def test_dental_prefix_is_optional():
+    assert "dental plaque" in relevant_dental_terms("There is some plaque near the gum line")
+
+
+def test_word_boundaries():
+    assert relevant_dental_terms("The crowning achievement") == []
+    assert relevant_dental_terms("preimplant") == []
+
+
+def test_glossary_order_and_no_duplicates():
+    matcher = TermMatcher(["braces", "crown", "braces"])
+    assert matcher.terms == ("braces", "crown")
+    assert matcher.find("crown, braces, crown") == ["braces", "crown"]
+
+
+def test_overlapping_terms():
+    matcher = TermMatcher(["dental pulp", "dental pulp test"])
+    assert matcher.find("The dental pulp test came back fine") == ["dental pulp", "dental pulp test"]
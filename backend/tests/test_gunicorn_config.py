@@ -0,0 +1,62 @@
+import importlib.util
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+import pytest
+
+pytest.importorskip("gunicorn")
+pytest.importorskip("flask_sock")
+from websockets.sync.client import connect
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORKER_TIMEOUT = 2
+
+
+def load_config():
+    spec = importlib.util.spec_from_file_location("gunicorn_conf", os.path.join(BACKEND_DIR, "gunicorn.conf.py"))
+    config = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(config)
+    return config
+
+
+def free_port():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+@pytest.fixture
+def server():
+    config = load_config()
+    port = free_port()
+    # The configured worker model with a short timeout, serving a plain echo WebSocket
+    process = subprocess.Popen([sys.executable, "-m", "gunicorn", "-k", config.worker_class, "--threads", str(config.threads),
+                                "--timeout", str(WORKER_TIMEOUT), "-b", f"127.0.0.1:{port}", "live_session_app:app"],
+                               cwd=os.path.dirname(os.path.abspath(__file__)), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 15
+    while True:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/ping", timeout=1)
+            break
+        except OSError:
+            if time.time() > deadline or process.poll() is not None:
+                process.kill()
+                pytest.skip("gunicorn did not start")
+            time.sleep(0.2)
+    yield port
+    process.terminate()
+    process.wait(10)
+
+
+def test_live_session_outlasts_the_worker_timeout_without_blocking_the_worker(server):
+    with connect(f"ws://127.0.0.1:{server}/echo") as websocket:
+        session_start = time.time()
+        while time.time() - session_start < WORKER_TIMEOUT * 2.5:
+            websocket.send("frame")
+            assert websocket.recv(timeout=5) == "frame"
+            # Other requests are served while the session is open
+            assert urllib.request.urlopen(f"http://127.0.0.1:{server}/ping", timeout=5).read() == b"pong"
+            time.sleep(0.5)
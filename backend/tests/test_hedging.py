@@ -0,0 +1,55 @@
+import time
+from src.hedging import HedgedTranscriber
+from src.provider_routing import ProviderRegistry
+
+
+def accepts_any(audio_info):
+    return True
+
+
+def provider(transcript, delay=0.0):
+    def transcribe(audio_bytes, input_lang):
+        time.sleep(delay)
+        return transcript
+    return transcribe, accepts_any
+
+
+def hedger(providers, delay=0.05):
+    registry = ProviderRegistry("stt-test", list(providers), explore_rate=0)
+    return HedgedTranscriber(providers, registry, min_delay=delay, max_delay=delay, timeout=5)
+
+
+def test_fast_primary_is_not_hedged():
+    stt = hedger({"a": provider("from a"), "b": provider("from b")})
+    assert stt.transcribe(b"audio", "en") == "from a"
+    assert stt.hedges == 0
+    assert stt.stats()["providers"]["b"]["calls"] == 0
+
+
+def test_slow_primary_is_hedged():
+    stt = hedger({"a": provider("from a", delay=0.5), "b": provider("from b")})
+    assert stt.transcribe(b"audio", "en") == "from b"
+    assert stt.hedges == 1
+
+
+def test_failed_primary_is_hedged_at_once():
+    stt = hedger({"a": provider(None), "b": provider("from b")}, delay=2.0)
+    start = time.time()
+    assert stt.transcribe(b"audio", "en") == "from b"
+    assert time.time() - start < 1.0
+
+
+def test_every_provider_failing():
+    assert hedger({"a": provider(None), "b": provider(None)}).transcribe(b"audio", "en") is None
+
+
+def test_providers_that_cannot_take_the_upload_are_skipped():
+    stt = hedger({"a": (provider("from a")[0], lambda audio_info: False), "b": provider("from b")})
+    assert stt.transcribe(b"audio", "en") == "from b"
+
+
+def test_hedge_delay_follows_the_latency_percentile():
+    stt = hedger({"a": provider("from a")})
+    stt.min_delay, stt.max_delay = 0.0, 10.0
+    stt._stats["a"].latencies.extend([0.1] * 10 + [2.0] * 10)
+    assert stt.hedge_delay("a") == 2.0
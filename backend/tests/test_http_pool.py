@@ -0,0 +1,28 @@
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import pytest
+import requests
+from src import http_pool
+
+
+class Stalled(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.server.release.wait(5)  # Accepts the request but never answers in time
+
+    def log_message(self, *args):
+        pass
+
+
+def test_session_applies_a_default_timeout(monkeypatch):
+    monkeypatch.setattr(http_pool, "HTTP_TIMEOUT", 0.2)
+    monkeypatch.setattr(http_pool, "_session", None)
+    server = HTTPServer(("127.0.0.1", 0), Stalled)
+    server.release = threading.Event()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        with pytest.raises(requests.Timeout):
+            http_pool.get_http_session().get(f"http://127.0.0.1:{server.server_port}/")
+    finally:
+        server.release.set()
+        server.shutdown()
+        monkeypatch.setattr(http_pool, "_session", None)
@@ -0,0 +1,66 @@
+import io
+import wave
+from src.pcm import contains_speech, decode_wav, normalize_wav, resample
+from audio_samples import noise, silence, tone, wav_bytes
+
+
+def test_decode_wav_shapes_channels():
+    samples, sample_rate = decode_wav(wav_bytes(tone(0.5, 48000) * 2, 48000, channels=2))
+    assert sample_rate == 48000
+    assert samples.shape == (24000, 2)
+    assert abs(samples).max() <= 1.0
+
+
+def test_decode_wav_rejects_other_formats():
+    assert decode_wav(b"OggS" + bytes(100)) is None
+    assert decode_wav(b"") is None
+
+
+def test_resample_length():
+    samples, _ = decode_wav(wav_bytes(tone(1.0, 48000), 48000))
+    assert len(resample(samples[:, 0], 48000, 16000)) == 16000
+
+
+def test_normalize_wav_outputs_16k_mono_and_trims_silence():
+    upload = wav_bytes(silence(1.0, 48000) + tone(1.0, 48000) + silence(1.0, 48000), 48000)
+    with wave.open(io.BytesIO(normalize_wav(upload))) as wav_file:
+        assert (wav_file.getframerate(), wav_file.getnchannels(), wav_file.getsampwidth()) == (16000, 1, 2)
+        seconds = wav_file.getnframes() / wav_file.getframerate()
+    assert 1.0 <= seconds < 1.5
+
+
+def test_normalize_wav_of_silence_is_empty():
+    with wave.open(io.BytesIO(normalize_wav(wav_bytes(silence(1.0))))) as wav_file:
+        assert wav_file.getnframes() == 0
+
+
+def test_vad_silence():
+    assert not contains_speech(wav_bytes(silence(2.0)))
+
+
+def test_vad_tone():
+    assert contains_speech(wav_bytes(tone(1.0)))
+
+
+def test_vad_hiss_is_not_speech():
+    # Loud enough to pass the energy threshold, but crosses zero like noise
+    assert not contains_speech(wav_bytes(noise(2.0, amplitude=0.02)))
+
+
+def test_vad_too_short():
+    assert not contains_speech(wav_bytes(silence(1.0) + tone(0.1) + silence(1.0)))
+
+
+def test_resample_to_zero_samples():
+    resampled = resample(tone(1 / 48000, 48000), 48000)
+    assert len(resampled) == 0 and resampled.dtype.name == "float32"
+    assert normalize_wav(wav_bytes(tone(1 / 48000, 48000), 48000)) is not None
+
+
+def test_streamed_wav_with_zero_data_size_reads_to_the_end():
+    audio = bytearray(wav_bytes(tone(1.0)))
+    data_offset = audio.index(b"data")
+    audio[data_offset + 4:data_offset + 8] = bytes(4)
+    samples, _ = decode_wav(bytes(audio))
+    assert len(samples) == 16000
+    assert contains_speech(bytes(audio))
@@ -0,0 +1,127 @@
+import pytest
+from src.provider_routing import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, LatencyEstimate, LocalFailure, ProviderRegistry
+
+
+def registry(*providers, probes=None):
+    return ProviderRegistry("test", providers, probes=probes, explore_rate=0)
+
+
+def trip(routing, name, language="en"):
+    for _ in range(routing._breakers[name].failures):
+        routing.record(name, language, 0.1, False)
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(failures=3)
+    assert not breaker.record(False)
+    assert not breaker.record(False)
+    assert breaker.record(False)
+    assert breaker.state == OPEN
+
+
+def test_breaker_success_resets_the_count():
+    breaker = CircuitBreaker(failures=2)
+    breaker.record(False)
+    breaker.record(True)
+    breaker.record(False)
+    assert breaker.state == CLOSED
+
+
+def test_half_open_failure_reopens():
+    breaker = CircuitBreaker()
+    breaker.state = HALF_OPEN
+    assert breaker.record(False)
+    assert breaker.state == OPEN
+
+
+def test_latency_estimate_weighs_errors():
+    estimate = LatencyEstimate(alpha=0.5)
+    assert estimate.score() == float("inf")
+    estimate.update(1.0, True)
+    estimate.update(3.0, True)
+    assert estimate.latency == 2.0
+    estimate.update(10.0, False)
+    assert estimate.latency == 2.0
+    assert estimate.score() == pytest.approx(4.0)
+
+
+def test_preference_order_until_measured():
+    assert registry("a", "b").rank("en") == ["a", "b"]
+
+
+def test_fastest_first_per_language():
+    routing = registry("a", "b")
+    routing.record("a", "en", 1.0, True)
+    routing.record("b", "en", 0.2, True)
+    routing.record("a", "ko", 0.2, True)
+    routing.record("b", "ko", 1.0, True)
+    assert routing.rank("en") == ["b", "a"]
+    assert routing.rank("ko") == ["a", "b"]
+
+
+def test_open_provider_is_skipped_until_probed(monkeypatch):
+    routing = registry("a", "b", probes={"a": lambda: True})
+    trip(routing, "a")
+    assert routing.rank("en") == ["b"]
+
+    routing._breakers["a"].cooldown = 0
+    routing.probe_open_breakers()
+    assert routing._breakers["a"].state == HALF_OPEN
+    # The half-open provider gets exactly one trial request
+    assert routing.rank("en") == ["a", "b"]
+    assert routing.rank("en") == ["b"]
+    routing.record("a", "en", 0.1, True)
+    assert routing._breakers["a"].state == CLOSED
+
+
+def test_failed_probe_keeps_breaker_open():
+    routing = registry("a", "b", probes={"a": lambda: False})
+    trip(routing, "a")
+    routing._breakers["a"].cooldown = 0
+    routing.probe_open_breakers()
+    assert routing._breakers["a"].state == OPEN
+
+
+def test_release_returns_an_unused_trial():
+    routing = registry("a", "b")
+    routing._breakers["a"].state = HALF_OPEN
+    assert routing.rank("en")[0] == "a"
+    routing.release("a")
+    assert routing.rank("en")[0] == "a"
+
+
+def test_every_provider_open_still_tries_them():
+    routing = registry("a", "b")
+    trip(routing, "a")
+    trip(routing, "b")
+    assert routing.rank("en") == ["a", "b"]
+
+
+def test_call_fails_over_and_records():
+    routing = registry("a", "b")
+
+    def broken(text):
+        raise RuntimeError("down")
+
+    assert routing.call("en", {"a": broken, "b": lambda text: text.upper()}, "hi") == "HI"
+    assert routing._breakers["a"].consecutive_failures == 1
+    assert routing.rank("en") == ["b", "a"]
+
+
+def test_call_all_fail():
+    assert registry("a").call("en", {"a": lambda: None}) is None
+
+
+def test_local_failure_is_not_the_providers():
+    routing = registry("a", "b")
+    tried = []
+
+    def answered_but_unusable():
+        tried.append("a")
+        raise LocalFailure("could not post-process")
+
+    with pytest.raises(LocalFailure):
+        routing.call("en", {"a": answered_but_unusable, "b": lambda: tried.append("b")})
+    assert tried == ["a"]
+    assert routing._breakers["a"].consecutive_failures == 0
+    assert routing.stats()["a"]["languages"]["en"]["samples"] == 0
@@ -0,0 +1,20 @@
+import threading
+import time
+from websockets.sync.server import serve
+from src.streaming_transcription import LiveTranscriber
+
+
+def test_send_after_deepgram_closed_the_session():
+    # A server that hangs up as soon as the client connects, like Deepgram after an error
+    with serve(lambda connection: connection.close(), "127.0.0.1", 0) as server:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        port = server.socket.getsockname()[1]
+        transcriber = LiveTranscriber("en-US", api_key="test", url=f"ws://127.0.0.1:{port}/v1/listen")
+        assert transcriber.start()
+
+        deadline = time.time() + 5
+        while transcriber.send(b"\x00" * 320):
+            assert time.time() < deadline, "send kept succeeding on a closed session"
+            time.sleep(0.01)
+        assert transcriber.finish(timeout=1) == ""
+        server.shutdown()
@@ -0,0 +1,32 @@
+from src.translation import _merge_batches, pack_translation_batches
+
+
+def test_pack_by_segment_count():
+    assert pack_translation_batches(["a"] * 5, max_segments=2, max_chars=100) == [[0, 1], [2, 3], [4]]
+
+
+def test_pack_by_characters():
+    assert pack_translation_batches(["aaa", "bbb", "ccc"], max_segments=10, max_chars=6) == [[0, 1], [2]]
+
+
+def test_pack_skips_empty_segments():
+    assert pack_translation_batches(["a", "", "b"], max_segments=10, max_chars=100) == [[0, 2]]
+
+
+def test_pack_oversized_segment_gets_its_own_batch():
+    assert pack_translation_batches(["a", "x" * 50, "b"], max_segments=10, max_chars=10) == [[0], [1], [2]]
+
+
+def test_pack_nothing():
+    assert pack_translation_batches(["", ""]) == []
+
+
+def test_merge_restores_order():
+    texts = ["a", "", "b", "c"]
+    assert _merge_batches(texts, [[0, 2], [3]], [["A", "B"], ["C"]]) == ["A", "", "B", "C"]
+
+
+def test_merge_failed_or_short_batches_are_none():
+    texts = ["a", "b", "c"]
+    assert _merge_batches(texts, [[0], [1, 2]], [None, ["B"]]) == [None, None, None]
+    assert _merge_batches(texts, [[0], [1, 2]], [["A"], None]) == ["A", None, None]
@@ -0,0 +1,104 @@
+import asyncio
+import importlib
+import threading
+import time
+import pytest
+
+# src re-exports the `translation_race` object under the module's name
+race = importlib.import_module("src.translation_race")
+
+
+def engine(translation, delay=0.0, release=None):
+    def translate(*args):
+        if release is not None:
+            release.wait()
+        time.sleep(delay)
+        return translation
+    return translate
+
+
+def async_engine(translation, delay=0.0):
+    async def translate(*args):
+        await asyncio.sleep(delay)
+        return translation
+    return translate
+
+
+@pytest.fixture
+def engines(monkeypatch):
+    monkeypatch.setattr(race, "cached_gpt_translation", lambda *args: None)
+    monkeypatch.setattr(race, "TRANSLATION_NMT_TIMEOUT", 0.3)
+
+    def use(gpt, nmt):
+        monkeypatch.setattr(race, "post_process_using_gpt", gpt)
+        monkeypatch.setattr(race, "translate_text", nmt)
+    return use
+
+
+def test_gpt_within_budget(engines):
+    engines(engine("gpt"), engine("nmt"))
+    assert race.race_translation("hello", "patient", "en-US", "ko", budget=1.0) == "gpt"
+
+
+def test_nmt_when_gpt_misses_the_budget(engines):
+    engines(engine("gpt", delay=1.0), engine("nmt"))
+    assert race.race_translation("hello", "patient", "en-US", "ko", budget=0.05) == "nmt"
+
+
+def test_gpt_when_nmt_fails(engines):
+    engines(engine("gpt", delay=0.1), engine(None))
+    assert race.race_translation("hello", "patient", "en-US", "ko", budget=0.05) == "gpt"
+
+
+def test_stuck_nmt_does_not_hang_a_finished_gpt(engines):
+    stuck = threading.Event()
+    engines(engine("gpt", delay=0.1), engine("nmt", release=stuck))
+    start = time.time()
+    try:
+        assert race.race_translation("hello", "patient", "en-US", "ko", budget=0.05) == "gpt"
+        assert time.time() - start < 0.3
+    finally:
+        stuck.set()
+
+
+def test_both_stuck_times_out(engines):
+    stuck = threading.Event()
+    engines(engine("gpt", release=stuck), engine("nmt", release=stuck))
+    start = time.time()
+    try:
+        assert race.race_translation("hello", "patient", "en-US", "ko", budget=0.05) is None
+        assert time.time() - start < 1.0
+    finally:
+        stuck.set()
+
+
+def test_cached_translation_skips_the_race(monkeypatch):
+    calls = []
+    monkeypatch.setattr(race, "cached_gpt_translation", lambda *args: "cached")
+    monkeypatch.setattr(race, "translate_text", lambda *args: calls.append(args))
+    assert race.race_translation("hello", "patient", "en-US", "ko") == "cached"
+    assert calls == []
+
+
+def test_async_stuck_nmt_does_not_hang_a_finished_gpt(monkeypatch):
+    monkeypatch.setattr(race, "cached_gpt_translation", lambda *args: None)
+    monkeypatch.setattr(race, "TRANSLATION_NMT_TIMEOUT", 0.3)
+    monkeypatch.setattr(race, "post_process_using_gpt_async", async_engine("gpt", delay=0.1))
+    monkeypatch.setattr(race, "translate_text_async", async_engine("nmt", delay=30))
+
+    async def run():
+        start = time.time()
+        result = await race.race_translation_async("hello", "patient", "en-US", "ko", budget=0.05)
+        return result, time.time() - start
+
+    result, elapsed = asyncio.run(run())
+    assert result == "gpt"
+    assert elapsed < 0.3
+
+
+def test_async_both_stuck_times_out(monkeypatch):
+    monkeypatch.setattr(race, "cached_gpt_translation", lambda *args: None)
+    monkeypatch.setattr(race, "TRANSLATION_NMT_TIMEOUT", 0.2)
+    monkeypatch.setattr(race, "post_process_using_gpt_async", async_engine("gpt", delay=30))
+    monkeypatch.setattr(race, "translate_text_async", async_engine("nmt", delay=30))
+    assert asyncio.run(race.race_translation_async("hello", "patient", "en-US", "ko", budget=0.05)) is None
@@ -0,0 +1,83 @@
+import pytest
+from src import voice_generation
+from src.output_formats import parse_output_format
+from src.provider_routing import ProviderRegistry
+
+
+class Speech:
+    content = b"RIFF provider audio"
+
+
+class Client:
+    class audio:
+        class speech:
+            @staticmethod
+            def create(**kwargs):
+                return Speech()
+
+
+@pytest.fixture
+def routing(monkeypatch):
+    registry = ProviderRegistry("tts-test", ["openai", "elevenlabs"], explore_rate=0)
+    monkeypatch.setattr(voice_generation, "tts_registry", registry)
+    monkeypatch.setattr(voice_generation, "_cached_voice", lambda cache_key: None)
+    return registry
+
+
+def test_transcode_failure_is_not_a_provider_failure(routing, monkeypatch):
+    monkeypatch.setattr(voice_generation.credentials, "get_openai_client", lambda: Client())
+    monkeypatch.setattr(voice_generation, "transcode", lambda *args: None)
+    eleven_labs = []
+    monkeypatch.setattr(voice_generation, "synthesize_voice_eleven_labs", lambda *args, **kwargs: eleven_labs.append(args))
+
+    output_format = parse_output_format("mp3", bitrate=64)  # Needs a local transcode
+    assert voice_generation.synthesize_voice("hello", "Jarvis", "en", output_format=output_format, provider="openai") is None
+    assert routing._breakers["openai"].consecutive_failures == 0
+    assert routing.stats()["openai"]["languages"]["en"]["samples"] == 0
+    assert eleven_labs == []
+
+
+def test_stream_voice_records_the_outcome(routing, monkeypatch):
+    def stream(text, chunk_size=4096):
+        yield b"one"
+        yield b"two"
+        return True
+
+    monkeypatch.setattr(voice_generation, "stream_voice_openai", stream)
+    assert b"".join(voice_generation.stream_voice("hello", "Jarvis", "openai", "en")) == b"onetwo"
+    assert routing.stats()["openai"]["languages"]["en"]["samples"] == 1
+
+
+def test_stream_voice_records_a_failed_stream(routing, monkeypatch):
+    def stream(text, voice, chunk_size=4096):
+        yield b"partial"
+        return False
+
+    monkeypatch.setattr(voice_generation, "stream_voice_eleven_labs", stream)
+    list(voice_generation.stream_voice("hello", "Jarvis", "elevenlabs", "en"))
+    assert routing._breakers["elevenlabs"].consecutive_failures == 1
+
+
+def test_abandoned_stream_is_not_recorded(routing, monkeypatch):
+    def stream(text, chunk_size=4096):
+        yield b"one"
+        yield b"two"
+        return True
+
+    monkeypatch.setattr(voice_generation, "stream_voice_openai", stream)
+    chunks = voice_generation.stream_voice("hello", "Jarvis", "openai", "en")
+    next(chunks)
+    chunks.close()  # The client went away
+    assert routing.stats()["openai"]["languages"] == {}
+
+
+@pytest.mark.parametrize("provider, synthesize", [
+    ("openai", lambda: voice_generation.synthesize_voice_openai("hello")),
+    ("elevenlabs", lambda: voice_generation.synthesize_voice_eleven_labs("hello", "Jarvis")),
+])
+def test_routed_cache_lookup_matches_the_provider_defaults(monkeypatch, provider, synthesize):
+    looked_up = []
+    monkeypatch.setattr(voice_generation, "_cached_voice", lambda cache_key: looked_up.append(cache_key) or b"cached")
+    assert synthesize() == b"cached"
+    assert voice_generation._cached_tts_voice("hello", "Jarvis", [provider], None) == b"cached"
+    assert looked_up[0] == looked_up[1]
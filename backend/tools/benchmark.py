@@ -0,0 +1,327 @@
+"""Offline stage-level benchmarks against simulated providers.
+
+Starts the fake providers (fakes/) in a child process, points the backend at
+them, and times each stage of the pipeline on its own plus the whole
+/process-audio request. Text stages are driven by the sentence pairs in
+training/data.tsv, audio stages by a synthetic tone. No network access or
+credentials are needed.
+
+    python tools/benchmark.py
+    python tools/benchmark.py --profile realistic --iterations 50 --concurrency 8
+    python tools/benchmark.py --stages translate,tts --failure-rate 0.05
+    python tools/benchmark.py --save-baseline baseline.json
+    python tools/benchmark.py --baseline baseline.json --tolerance 0.2
+
+Reports p50/p95/p99 latency, throughput, errors and peak memory allocated per
+call (measured in a separate sequential pass with tracemalloc). With
+--baseline, exits with status 1 if a stage's p95 or allocations regressed by
+more than the tolerance.
+"""
+import argparse
+import io
+import json
+import logging
+import math
+import multiprocessing
+import os
+import platform
+import struct
+import sys
+import tempfile
+import time
+import tracemalloc
+import wave
+from concurrent.futures import ThreadPoolExecutor
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from fakes.corpus import load_sentence_pairs
+from fakes.profiles import PROFILES
+
+# Calls per stage in the allocation pass; tracemalloc slows everything down
+ALLOCATION_CALLS = 10
+
+# Differences below this are noise whatever the tolerance says
+MIN_REGRESSION_MS = 2.0
+MIN_REGRESSION_KIB = 16.0
+
+# Secrets the backend reads, served from LOCAL_SECRETS_FILE
+FAKE_SECRETS = {
+    "OpenAI_API_KEY": "fake-openai-key",
+    "ElevenLabsAPIKey": "fake-elevenlabs-key",
+    "DeepgramTestAPIKey": "fake-deepgram-key",
+    "ElevenLabsVoiceIDs": json.dumps({"Jarvis": "fake-voice"}),
+}
+
+
+def _serve_fakes(profile, failure_rate, seed, connection):
+    """Child process: runs both fake servers and sends their ports back."""
+    from fakes import google_grpc, http_providers
+    from fakes.corpus import Corpus
+    from fakes.profiles import build_profiles
+    corpus = Corpus()
+    http_server = http_providers.run_server(corpus=corpus, profiles=build_profiles(profile, failure_rate, seed))
+    grpc_server, grpc_port, _ = google_grpc.run_server(corpus=corpus, profiles=build_profiles(profile, failure_rate, seed + 100))
+    connection.send((http_server.server_port, grpc_port))
+    connection.recv()  # Until the parent is done
+
+
+def start_fakes(profile, failure_rate, seed):
+    """Starts the fakes in a fresh interpreter; returns (process, connection, http port, gRPC port)."""
+    context = multiprocessing.get_context("spawn")
+    parent_connection, child_connection = context.Pipe()
+    process = context.Process(target=_serve_fakes, args=(profile, failure_rate, seed, child_connection), daemon=True)
+    process.start()
+    http_port, grpc_port = parent_connection.recv()
+    return process, parent_connection, http_port, grpc_port
+
+
+def configure_backend(http_port, grpc_port):
+    """Points src/ at the fakes. Must run before src is imported, since it reads its settings at import."""
+    secrets_file = tempfile.NamedTemporaryFile("w", suffix=".json", delete=False)
+    json.dump(FAKE_SECRETS, secrets_file)
+    secrets_file.close()
+    http_base = f"http://localhost:{http_port}/v1"
+    os.environ.update({
+        "LOCAL_SECRETS_FILE": secrets_file.name,
+        "DEEPGRAM_API_URL": f"{http_base}/listen",
+        "OPENAI_BASE_URL": http_base,
+        "ELEVEN_LABS_API_URL": http_base,
+        "TRANSLATE_API_ENDPOINT": f"localhost:{grpc_port}",
+        "FIRESTORE_EMULATOR_HOST": f"localhost:{grpc_port}",
+        "GOOGLE_CLOUD_PROJECT": "local",
+        # Measure the providers, not the caches in front of them
+        "TRANSLATION_CACHE_SIZE": "0",
+        "TTS_CACHE_BYTES": "0",
+        # Time the Firestore write, not the window in which turns are batched up
+        "CONVERSATION_FLUSH_INTERVAL": "0",
+        # Deterministic routing: always the best-ranked provider
+        "PROVIDER_EXPLORE_RATE": "0",
+    })
+    return secrets_file.name
+
+
+def tone_wav(seconds=3.0, sample_rate=48000, channels=2):
+    """A WAV of a tone that swells and fades like speech, in the format browsers upload."""
+    frames = []
+    for index in range(int(seconds * sample_rate)):
+        t = index / sample_rate
+        envelope = 0.5 - 0.5 * math.cos(2 * math.pi * t / seconds)
+        sample = int(12000 * envelope * math.sin(2 * math.pi * 220 * t))
+        frames.append(struct.pack("<" + "h" * channels, *([sample] * channels)))
+    output = io.BytesIO()
+    with wave.open(output, "wb") as wav_file:
+        wav_file.setnchannels(channels)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(b"".join(frames))
+    return output.getvalue()
+
+
+def build_stages(pairs, upload):
+    """(name, setup, call) per stage. `call(index)` returns something falsy on failure; `setup(calls)` runs first."""
+    import app as flask_app
+    import src
+    from src import conversation
+    from src.audio_processing import contains_speech, get_audio_info, normalize_audio_bytes
+    from src.transcription import post_process_using_gpt, stream_post_process_using_gpt, transcribe_audio_whisper_raw
+    from src.translation_race import race_translation
+    from src.voice_generation import synthesize_voice_eleven_labs, synthesize_voice_openai
+
+    normalized = normalize_audio_bytes(upload)
+    english = [source for source, _ in pairs]
+    korean = [target for _, target in pairs]
+    run_id = os.getpid()
+    cold_sessions = []
+
+    def seed_cold_sessions(calls):
+        # Sessions with stored turns that this process has never read
+        cold_sessions[:] = [f"bench-{run_id}-cold-{len(cold_sessions) + index}" for index in range(calls)]
+        conversation._write_conversations([(session_id, conversation._new_conversation(text, person_type))
+                                           for session_id in cold_sessions
+                                           for text, person_type in zip(english[:3], ["doctor", "patient", "doctor"])])
+
+    def seed_warm_session(calls):
+        for text in english[:3]:
+            src.add_conversation(text, "patient", f"bench-{run_id}-warm")
+        src.get_last_three_conversations(f"bench-{run_id}-warm")
+
+    def add_and_flush(index):
+        src.add_conversation(english[index % len(english)], "patient", f"bench-{run_id}-flush")
+        conversation.conversation_buffer.flush()
+        return True
+
+    def process_audio(index):
+        response = flask_app.app.test_client().post("/process-audio", data={
+            "audio": (io.BytesIO(upload), "clip.wav"), "input_lang": "en-US", "output_lang": "ko",
+            "voice": "Jarvis", "mode": "patient", "session_id": f"bench-{run_id}-pipeline-{index % 8}",
+        })
+        return response.status_code == 200
+
+    sentence = lambda texts, index: texts[index % len(texts)]
+    return [
+        ("audio.sniff", None, lambda index: get_audio_info(upload)),
+        ("audio.normalize", None, lambda index: normalize_audio_bytes(upload)),
+        ("audio.vad", None, lambda index: contains_speech(normalized)),
+        ("stt.deepgram", None, lambda index: src.transcribe_audio_deepgram_local(normalized, "en-US")),
+        ("stt.whisper", None, lambda index: transcribe_audio_whisper_raw(normalized, "en-US")),
+        ("stt.routed", None, lambda index: src.transcribe_audio(normalized, "en-US")),
+        ("translate.gpt", None, lambda index: post_process_using_gpt(sentence(english, index), "patient", "en-US", "ko")),
+        ("translate.gpt_stream", None,
+         lambda index: "".join(stream_post_process_using_gpt(sentence(english, index), "patient", "en-US", "ko"))),
+        ("translate.nmt", None, lambda index: src.translate_text(sentence(english, index), "en", "ko")),
+        ("translate.race", None, lambda index: race_translation(sentence(english, index), "patient", "en-US", "ko")),
+        ("translate.batch", None, lambda index: all(src.translate_texts(english, "en", "ko"))),
+        ("tts.openai", None, lambda index: synthesize_voice_openai(sentence(korean, index))),
+        ("tts.elevenlabs", None, lambda index: synthesize_voice_eleven_labs(sentence(korean, index), "Jarvis")),
+        ("tts.routed", None, lambda index: src.synthesize_voice(sentence(korean, index), "Jarvis", "ko")),
+        ("conversation.add", None, lambda index: src.add_conversation(sentence(english, index), "patient", f"bench-{run_id}-add") or True),
+        ("conversation.flush", None, add_and_flush),
+        ("conversation.history_warm", seed_warm_session, lambda index: src.get_last_three_conversations(f"bench-{run_id}-warm")),
+        ("conversation.history_cold", seed_cold_sessions,
+         lambda index: src.get_last_three_conversations(cold_sessions[index % len(cold_sessions)])),
+        ("pipeline.process_audio", None, process_audio),
+    ]
+
+
+def _timed(call, index):
+    start = time.perf_counter()
+    try:
+        ok = bool(call(index))
+    except Exception:
+        ok = False
+    return time.perf_counter() - start, ok
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an ascending list."""
+    return sorted_values[max(0, math.ceil(fraction * len(sorted_values)) - 1)]
+
+
+def measure_latency(setup, call, iterations, concurrency):
+    if setup:
+        setup(iterations)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(lambda index: _timed(call, index), range(iterations)))
+    wall_seconds = time.perf_counter() - start
+    latencies = sorted(seconds * 1000 for seconds, _ in results)
+    return {
+        "p50_ms": percentile(latencies, 0.50),
+        "p95_ms": percentile(latencies, 0.95),
+        "p99_ms": percentile(latencies, 0.99),
+        "ops_per_second": iterations / wall_seconds,
+        "errors": sum(1 for _, ok in results if not ok),
+    }
+
+
+def measure_allocations(setup, call, calls=ALLOCATION_CALLS):
+    """Median peak of memory allocated during one call, in KiB. Background threads' allocations count too."""
+    if setup:
+        setup(calls)
+    peaks = []
+    tracemalloc.start()
+    try:
+        for index in range(calls):
+            before, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            _timed(call, index)
+            peaks.append((tracemalloc.get_traced_memory()[1] - before) / 1024)
+    finally:
+        tracemalloc.stop()
+    return {"alloc_kib": sorted(peaks)[len(peaks) // 2]}
+
+
+def compare(results, baseline, tolerance):
+    """{stage: [regression messages]} for the stages that got slower or hungrier than the baseline."""
+    regressions = {}
+    for stage, result in results.items():
+        reference = baseline.get("stages", {}).get(stage)
+        if not reference:
+            continue
+        messages = []
+        if result["p95_ms"] > reference["p95_ms"] * (1 + tolerance) and result["p95_ms"] - reference["p95_ms"] > MIN_REGRESSION_MS:
+            messages.append(f"p95 {reference['p95_ms']:.1f} -> {result['p95_ms']:.1f} ms")
+        if result["alloc_kib"] > reference["alloc_kib"] * (1 + tolerance) and result["alloc_kib"] - reference["alloc_kib"] > MIN_REGRESSION_KIB:
+            messages.append(f"allocations {reference['alloc_kib']:.0f} -> {result['alloc_kib']:.0f} KiB")
+        if result["errors"] > reference["errors"]:
+            messages.append(f"errors {reference['errors']} -> {result['errors']}")
+        if messages:
+            regressions[stage] = messages
+    return regressions
+
+
+def print_report(results, baseline):
+    reference = baseline.get("stages", {}) if baseline else {}
+    print(f"{'stage':<28}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'ops/s':>10}{'errors':>8}{'alloc KiB':>11}" + ("  p95 vs baseline" if baseline else ""))
+    for stage, result in results.items():
+        line = (f"{stage:<28}{result['p50_ms']:>10.1f}{result['p95_ms']:>10.1f}{result['p99_ms']:>10.1f}"
+                f"{result['ops_per_second']:>10.1f}{result['errors']:>8}{result['alloc_kib']:>11.0f}")
+        if stage in reference and reference[stage]["p95_ms"]:
+            line += f"  {(result['p95_ms'] / reference[stage]['p95_ms'] - 1) * 100:+.0f}%"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="instant", help="latency profile of the fake providers")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="fraction of provider calls that fail")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--iterations", type=int, default=30, help="timed calls per stage")
+    parser.add_argument("--concurrency", type=int, default=1, help="calls in flight at once")
+    parser.add_argument("--stages", help="comma-separated stage name prefixes to run (default: all)")
+    parser.add_argument("--baseline", help="baseline JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative regression against the baseline")
+    parser.add_argument("--save-baseline", help="write the results to this path as a new baseline")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    parser.add_argument("--verbose", action="store_true", help="keep the backend's INFO logs")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logging.disable(logging.INFO)
+
+    process, connection, http_port, grpc_port = start_fakes(args.profile, args.failure_rate, args.seed)
+    secrets_path = configure_backend(http_port, grpc_port)
+    try:
+        pairs = load_sentence_pairs()
+        stages = build_stages(pairs, tone_wav())
+        prefixes = [prefix.strip() for prefix in args.stages.split(",")] if args.stages else None
+        results = {}
+        for name, setup, call in stages:
+            if prefixes and not any(name.startswith(prefix) for prefix in prefixes):
+                continue
+            _timed(call, 0)  # Warm-up: imports, clients and connections are not what is measured
+            results[name] = {**measure_latency(setup, call, args.iterations, args.concurrency),
+                             **measure_allocations(setup, call)}
+    finally:
+        connection.send("stop")
+        process.join(timeout=5)
+        os.unlink(secrets_path)
+
+    report = {
+        "meta": {"profile": args.profile, "failure_rate": args.failure_rate, "iterations": args.iterations,
+                 "concurrency": args.concurrency, "python": platform.python_version(), "machine": platform.machine()},
+        "stages": results,
+    }
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as file:
+            json.dump(report, file, indent=2)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+    regressions = compare(results, baseline, args.tolerance) if baseline else {}
+
+    if args.json:
+        print(json.dumps({**report, "regressions": regressions}, indent=2))
+    else:
+        print_report(results, baseline)
+        for stage, messages in regressions.items():
+            print(f"REGRESSION {stage}: {'; '.join(messages)}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""Import-time and first-request latency report for the backend.
+
+Each measurement runs in a fresh interpreter so nothing is already imported:
+
+    python tools/startup_report.py
+    python tools/startup_report.py --module asgi --path /cache-stats --top 20
+
+Reports the wall time to import the app, the slowest modules from
+`python -X importtime`, which provider SDKs were loaded by the import alone,
+and the latency of the first request served by the freshly imported app.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROVIDER_SDKS = ["openai", "deepgram", "google.cloud.secretmanager", "google.cloud.speech_v1p1beta1",
+                 "google.cloud.translate_v3", "google.cloud.firestore", "grpc"]
+
+IMPORT_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+import_seconds = time.perf_counter() - start
+print("REPORT", json.dumps({{"import_seconds": import_seconds, "loaded_sdks": [m for m in {sdks!r} if m in sys.modules]}}))
+"""
+
+FIRST_REQUEST_PROBE = """
+import asyncio, json, time
+import {module}
+app = {module}.app
+start = time.perf_counter()
+client = app.test_client()
+response = client.get({path!r})
+if asyncio.iscoroutine(response):
+    response = asyncio.run(response)
+print("REPORT", json.dumps({{"first_request_seconds": time.perf_counter() - start, "status": response.status_code}}))
+"""
+
+
+def run_probe(code, extra_args=()):
+    result = subprocess.run([sys.executable, *extra_args, "-c", code], cwd=BACKEND_DIR, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise SystemExit(f"Probe failed:\n{result.stderr}")
+    return result
+
+
+def probe_report(code):
+    # The app may log to stdout too, so pick out the probe's own line
+    for line in run_probe(code).stdout.splitlines():
+        if line.startswith("REPORT "):
+            return json.loads(line[len("REPORT "):])
+    raise SystemExit("Probe printed no report")
+
+
+def slowest_imports(module, top):
+    """Parses `python -X importtime` output into (cumulative microseconds, module) pairs."""
+    stderr = run_probe(f"import {module}", ["-X", "importtime"]).stderr
+    timings = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        timings.append((int(cumulative), name.strip()))
+    return sorted(timings, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="app", help="app module to import (app or asgi)")
+    parser.add_argument("--path", default="/cache-stats", help="path of the first request")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    import_report = probe_report(IMPORT_PROBE.format(module=args.module, sdks=PROVIDER_SDKS))
+    request_report = probe_report(FIRST_REQUEST_PROBE.format(module=args.module, path=args.path))
+    imports = slowest_imports(args.module, args.top)
+
+    if args.json:
+        print(json.dumps({**import_report, **request_report,
+                          "slowest_imports": [{"module": name, "cumulative_us": us} for us, name in imports]}, indent=2))
+        return
+
+    print(f"Import of {args.module}: {import_report['import_seconds'] * 1000:.0f} ms")
+    print(f"Provider SDKs loaded at import: {', '.join(import_report['loaded_sdks']) or 'none'}")
+    print(f"First request GET {args.path}: {request_report['first_request_seconds'] * 1000:.0f} ms (status {request_report['status']})")
+    print(f"\nSlowest imports (cumulative):")
+    for us, name in imports:
+        print(f"  {us / 1000:8.1f} ms  {name}")
+
+
+if __name__ == '__main__':
+    main()